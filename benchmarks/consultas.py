@@ -0,0 +1,284 @@
+"""
+Presupuestos de llamadas al backend por operación y por render de página.
+
+Un patrón N+1 (una consulta por cancha, por día o por fila) no falla: solo
+hace más lenta la página a medida que crecen los datos. Este script envuelve
+el cliente con ClienteTrazado (components.trazas), cuenta las idas y
+vueltas al backend (cada execute() de una consulta o RPC) de cada operación
+y de cada paso de benchmarks.reruns, y las compara con un presupuesto fijo.
+Se cuentan las llamadas reales: las páginas siguientes de una lectura
+paginada por cursor también cuentan, porque crecen con las filas leídas.
+
+Se ejecuta sobre bases generadas con benchmarks.datos de varios tamaños
+(reservas:clientes:canchas). Falla si alguna operación supera su
+presupuesto en algún tamaño o si hace más llamadas con más datos:
+    python -m benchmarks.consultas
+    python -m benchmarks.consultas --tamanos 2000:300:12,20000:3000:80 --paginas Gestion_Canchas
+
+Termina con código 1 si algún presupuesto no se cumple. Los mismos
+presupuestos se verifican con pytest (tests/test_presupuesto_consultas.py).
+Si un cambio necesita de verdad más llamadas, se actualiza el presupuesto en
+el mismo commit.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, time as hora, timedelta
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from benchmarks.datos import generar_base
+from benchmarks.reruns import escenarios, recorrer
+from components.auditoria import obtener_escritor
+from components.backend_local import ClienteLocal
+from components.database import (
+    usar_cliente,
+    crear_reserva,
+    crear_reservas_serie,
+    crear_horarios_cancha,
+    registrar_auditoria,
+    fuente_auditoria,
+    obtener_estadisticas_canchas,
+    obtener_ingresos_diarios,
+    obtener_reservas_por_estado,
+    obtener_top_clientes,
+    obtener_fidelizacion_clientes
+)
+from components.disponibilidad import obtener_indice, fechas_serie
+from components.trazas import ClienteTrazado
+
+# Llamadas máximas por operación, sin importar el tamaño de los datos
+PRESUPUESTO_OPERACIONES: Dict[str, int] = {
+    'obtener_estadisticas_canchas': 1,
+    'obtener_ingresos_diarios': 1,
+    'obtener_reservas_por_estado': 1,
+    'obtener_top_clientes': 1,
+    'obtener_fidelizacion_clientes': 1,
+    'índice de disponibilidad: carga': 1,
+    'índice de disponibilidad: 100 verificaciones': 0,
+    'crear_reserva': 1,
+    'crear_reservas_serie (8 fechas)': 1,
+    'crear_horarios_cancha (7 días)': 2,
+    'registrar_auditoria x50': 1,
+}
+
+# Llamadas máximas por paso de benchmarks.reruns.escenarios()
+PRESUPUESTO_PAGINAS: Dict[str, Dict[str, int]] = {
+    'Reservas': {
+        'carga inicial': 5,
+        'buscar cliente': 3,
+        'cambiar rango de fechas': 3,
+        'página siguiente': 3,
+        'filtrar por estado': 3,
+        'elegir cancha': 3,
+        'crear reserva': 6,
+        'confirmar reserva': 7,
+    },
+    'Reportes': {
+        'carga inicial': 8,
+        'cambiar fecha inicio': 8,
+        'elegir cancha del mapa': 8,
+        'cambiar formato de exportación': 8,
+    },
+    'Auditoria': {
+        'carga inicial': 2,
+        'filtrar por acción': 2,
+        'página siguiente': 2,
+        'ampliar rango de fechas': 2,
+    },
+    'Gestion_Canchas': {
+        'carga inicial': 2,
+        'buscar cancha': 2,
+    },
+    'Gestion_Clientes': {
+        'carga inicial': 1,
+        'buscar cliente': 1,
+        'mostrar inactivos': 1,
+    },
+}
+
+Caso = Tuple[str, Callable[[], Any], Optional[Callable[[], Any]]]
+
+def casos(cliente: ClienteLocal) -> List[Caso]:
+    """
+    Operaciones a contar: (nombre, función, preparación). La preparación se
+    ejecuta antes y sus llamadas no cuentan (por ejemplo la lectura de
+    auditoria_fuentes, que se hace una vez por proceso).
+    """
+    hoy = date.today()
+    anio = (hoy - timedelta(days=365), hoy)
+    id_cancha = cliente.table('canchas').select('id').order('id').limit(1).execute().data[0]['id']
+    id_cliente = cliente.table('clientes').select('id').order('id').limit(1).execute().data[0]['id']
+    indice = obtener_indice()
+    # Fechas sin reservas generadas (los datos sintéticos terminan hoy)
+    libre = hoy + timedelta(days=400)
+    canchas_nuevas = []
+
+    def nueva_cancha():
+        tipo = cliente.table('tipos_cancha').select('id').limit(1).execute().data[0]['id']
+        canchas_nuevas.append(cliente.table('canchas').insert({
+            'nombre': 'Cancha presupuesto', 'id_tipo': tipo, 'ubicacion': 'Norte', 'capacidad_maxima': 10
+        }).execute().data[0]['id'])
+
+    def verificar():
+        for i in range(100):
+            indice.verificar(id_cancha, hoy + timedelta(days=i % 30), hora(8 + i % 13), hora(9 + i % 13))
+
+    def auditar():
+        for i in range(50):
+            registrar_auditoria('presupuesto', 'reservas', 'UPDATE', f'Cambio {i}', {'id': i, 'estado': 'a'}, {'id': i, 'estado': 'b'})
+        obtener_escritor().vaciar()
+
+    return [
+        ('obtener_estadisticas_canchas', lambda: obtener_estadisticas_canchas(*anio), None),
+        ('obtener_ingresos_diarios', lambda: obtener_ingresos_diarios(*anio), None),
+        ('obtener_reservas_por_estado', lambda: obtener_reservas_por_estado(*anio), None),
+        ('obtener_top_clientes', lambda: obtener_top_clientes(*anio), None),
+        ('obtener_fidelizacion_clientes', lambda: obtener_fidelizacion_clientes(*anio), None),
+        ('índice de disponibilidad: carga', lambda: indice.asegurar_ventana(hoy), indice.invalidar),
+        ('índice de disponibilidad: 100 verificaciones', verificar, lambda: indice.asegurar_ventana(hoy)),
+        (
+            'crear_reserva',
+            lambda: crear_reserva(id_cliente, id_cancha, libre, hora(10), hora(11)),
+            lambda: fuente_auditoria('reservas')
+        ),
+        (
+            'crear_reservas_serie (8 fechas)',
+            lambda: crear_reservas_serie(
+                id_cliente, id_cancha, fechas_serie(libre + timedelta(days=1), libre + timedelta(days=50)), hora(12), hora(13)
+            ),
+            None
+        ),
+        (
+            'crear_horarios_cancha (7 días)',
+            lambda: (crear_horarios_cancha(canchas_nuevas[-1], list(range(1, 8)), hora(8), hora(22), 'presupuesto'),
+                     obtener_escritor().vaciar()),
+            nueva_cancha
+        ),
+        ('registrar_auditoria x50', auditar, lambda: obtener_escritor().vaciar()),
+    ]
+
+def contar_operaciones(base: str) -> Dict[str, Dict[str, Any]]:
+    """Llamadas y errores de cada operación sobre una copia de la base."""
+    directorio = tempfile.mkdtemp(prefix='consultas_')
+    copia = os.path.join(directorio, 'datos.db')
+    shutil.copyfile(base, copia)
+    cliente = ClienteLocal(copia)
+    trazas: List[Dict[str, Any]] = []
+    usar_cliente(ClienteTrazado(cliente, destino=trazas.append))
+    obtener_indice().invalidar()
+    try:
+        contados = {}
+        for nombre, funcion, preparar in casos(cliente):
+            if preparar is not None:
+                preparar()
+            antes = len(trazas)
+            error = None
+            try:
+                funcion()
+            except Exception as e:
+                error = str(e)
+            llamadas = trazas[antes:]
+            contados[nombre] = {
+                'llamadas': len(llamadas),
+                'detalle': [f"{t['tabla']} {t['operacion']} {t['forma']}".strip() for t in llamadas],
+                'errores': [error] if error else []
+            }
+        return contados
+    finally:
+        # Las entradas de auditoría pendientes se escriben en la copia, no en el backend configurado
+        obtener_escritor().vaciar()
+        usar_cliente(None)
+        obtener_indice().invalidar()
+        cliente.cerrar()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+def contar_paginas(base: str, paginas: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Llamadas de cada paso de benchmarks.reruns (un recorrido por página)."""
+    todos = escenarios()
+    contados = {}
+    for pagina in paginas:
+        for medido in recorrer(pagina, todos[pagina], base):
+            contados[f"{pagina}: {medido['paso']}"] = medido
+    return contados
+
+def verificar(resultados: Dict[int, Dict[str, Dict[str, Any]]], presupuestos: Dict[str, int]) -> List[str]:
+    """
+    Compara las llamadas de cada caso con su presupuesto en cada tamaño y
+    entre tamaños consecutivos.
+
+    Returns:
+        Lista de fallas (vacía si se cumplen todos los presupuestos)
+    """
+    fallas = []
+    anteriores: Dict[str, Tuple[int, int]] = {}
+    for reservas, contados in resultados.items():
+        for nombre, medido in contados.items():
+            if medido.get('omitido'):
+                continue
+            presupuesto = presupuestos.get(nombre)
+            if medido['errores']:
+                fallas.append(f"{reservas:,} reservas · {nombre}: error {medido['errores'][0][:120]}")
+            if presupuesto is not None and medido['llamadas'] > presupuesto:
+                detalle = ''.join(f"\n      {d}" for d in medido.get('detalle', []))
+                fallas.append(
+                    f"{reservas:,} reservas · {nombre}: {medido['llamadas']} llamadas (presupuesto {presupuesto}){detalle}"
+                )
+            if nombre in anteriores and medido['llamadas'] > anteriores[nombre][1]:
+                fallas.append(
+                    f"{nombre}: {anteriores[nombre][1]} llamadas con {anteriores[nombre][0]:,} reservas y "
+                    f"{medido['llamadas']} con {reservas:,} (crece con los datos)"
+                )
+            anteriores[nombre] = (reservas, medido['llamadas'])
+    return fallas
+
+def _celda(medido: Dict[str, Any]) -> str:
+    if medido.get('omitido'):
+        return 'omitido'
+    return str(medido.get('llamadas', '-'))
+
+def _tamanos(texto: str) -> List[Tuple[int, int, int]]:
+    return [tuple(int(n) for n in t.split(':')) for t in texto.split(',') if t.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--tamanos', type=_tamanos, default=[(2000, 300, 12), (20000, 3000, 80)],
+        help='Bases a generar como reservas:clientes:canchas, separadas por coma'
+    )
+    parser.add_argument('--paginas', help='Páginas separadas por coma (por defecto todas; "" para ninguna)')
+    parser.add_argument('--datos', default='datos_benchmark', help='Directorio de las bases generadas')
+    args = parser.parse_args()
+
+    paginas = list(PRESUPUESTO_PAGINAS) if args.paginas is None else [p for p in args.paginas.split(',') if p]
+    presupuestos = dict(PRESUPUESTO_OPERACIONES)
+    for pagina in paginas:
+        presupuestos.update({f"{pagina}: {paso}": n for paso, n in PRESUPUESTO_PAGINAS[pagina].items()})
+
+    os.makedirs(args.datos, exist_ok=True)
+    resultados: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    for reservas, clientes, canchas in args.tamanos:
+        base = os.path.join(args.datos, f"consultas_{reservas}_canchas_{canchas}_clientes_{clientes}.db")
+        if not os.path.exists(base):
+            print(f"Generando {base}...")
+            generar_base(base, reservas, clientes, canchas, meses=6, auditoria=2000)
+        resultados[reservas] = {**contar_operaciones(base), **contar_paginas(base, paginas)}
+
+    tamanos = list(resultados)
+    print(f"\n{'caso':<58} {'presupuesto':>11} " + ' '.join(f"{t:>10,}" for t in tamanos))
+    for nombre, presupuesto in presupuestos.items():
+        valores = [resultados[t].get(nombre, {}) for t in tamanos]
+        celdas = ' '.join(f"{_celda(v):>10}" for v in valores)
+        print(f"{nombre:<58} {presupuesto:>11} {celdas}")
+
+    fallas = verificar(resultados, presupuestos)
+    if fallas:
+        print(f"\n{len(fallas)} presupuestos no cumplidos:")
+        for falla in fallas:
+            print(f"  - {falla}")
+        sys.exit(1)
+    print("\nTodos los presupuestos se cumplen")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+Generador de datos sintéticos para el backend local.
+
+Arma una base SQLite (components.backend_local) con el esquema de
+script_supabase.txt y volúmenes realistas: miles de clientes, cientos de
+canchas y hasta millones de reservas. Las reservas siguen la demanda de un
+complejo deportivo:
+- estacionalidad por mes (más demanda en verano, menos en invierno)
+- más demanda los viernes y fines de semana
+- picos a la salida del trabajo (18 a 21 h) y poca demanda a la mañana
+- clientes con frecuencias muy distintas (pocos habituales, muchos ocasionales)
+- estados según la fecha (completadas y canceladas en el pasado, pendientes y
+  confirmadas en el futuro)
+
+Las reservas nunca se solapan: se generan sobre la grilla de horas de cada
+cancha y día. También se genera bitácora (altas, cambios de estado y
+sesiones) para medir la página de Auditoría.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.datos --salida datos_benchmark.db --reservas 1000000
+    RESERVAS_BACKEND=local RESERVAS_DB_LOCAL=datos_benchmark.db streamlit run app.py
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from components.backend_local import ClienteLocal
+
+# Demanda relativa por mes (enero = 0) y por día de la semana (lunes = 0)
+DEMANDA_MES = np.array([1.3, 1.25, 1.0, 0.9, 0.8, 0.7, 0.75, 0.8, 0.9, 1.0, 1.1, 1.2])
+DEMANDA_DIA = np.array([0.8, 0.8, 0.85, 0.9, 1.15, 1.3, 1.1])
+
+# Horario de funcionamiento de las canchas generadas y demanda por hora de inicio
+HORA_APERTURA = 8
+HORA_CIERRE = 22
+DEMANDA_HORA = np.array([0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.5, 0.55, 0.7, 0.85, 1.0, 1.0, 0.95, 0.75])
+
+# Exponente de la distribución de reservas entre clientes (Zipf)
+EXPONENTE_CLIENTES = 0.9
+
+TIPOS_CANCHA = ['Fútbol 11', 'Fútbol 7', 'Pádel', 'Básquet']
+SECTORES = ['Sector Norte', 'Sector Sur', 'Sector Este', 'Sector Oeste', 'Sector Centro']
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Sofía', 'Diego', 'Valentina', 'Jorge', 'Camila',
+           'Andrés', 'Lucía', 'Pedro', 'Daniela', 'Miguel', 'Gabriela', 'José', 'Paula', 'Fernando', 'Elena']
+APELLIDOS = ['Pérez', 'González', 'Rodríguez', 'Martínez', 'López', 'García', 'Sánchez', 'Romero',
+             'Torres', 'Flores', 'Rivera', 'Gómez', 'Díaz', 'Vargas', 'Castro', 'Ortiz', 'Morales', 'Ramos']
+
+# Filas por executemany (acota la memoria con millones de reservas)
+FILAS_POR_LOTE = 200000
+
+def rango_fechas(meses: int, dias_futuros: int = 60) -> tuple:
+    """Rango de la base generada: `meses` hacia atrás y `dias_futuros` hacia adelante."""
+    hoy = date.today()
+    return hoy - timedelta(days=int(meses * 30.44)), hoy + timedelta(days=dias_futuros)
+
+def _insertar(con, sql: str, filas):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= FILAS_POR_LOTE:
+            con.executemany(sql, lote)
+            lote = []
+    if lote:
+        con.executemany(sql, lote)
+
+def generar_base(
+    ruta: str,
+    reservas: int = 100000,
+    clientes: int = 5000,
+    canchas: int = 200,
+    meses: int = 24,
+    auditoria: int = 50000,
+    semilla: int = 42
+) -> dict:
+    """
+    Genera (o regenera) una base local con datos sintéticos.
+
+    Los datos de prueba del script (tipos, usuarios, canchas y clientes
+    iniciales) se conservan; se agregan canchas y clientes hasta llegar a los
+    totales pedidos y se reemplazan reservas y bitácora.
+
+    Args:
+        ruta: Archivo SQLite de destino (se borra si existe)
+        reservas: Reservas aproximadas a generar
+        clientes: Total de clientes
+        canchas: Total de canchas
+        meses: Meses de historia hasta hoy (además de 60 días hacia adelante)
+        auditoria: Registros de bitácora
+        semilla: Semilla del generador aleatorio
+
+    Returns:
+        Dict con los totales generados y el tiempo de generación
+    """
+    inicio = time.perf_counter()
+    for archivo in [ruta, ruta + '-wal', ruta + '-shm']:
+        if os.path.exists(archivo):
+            os.remove(archivo)
+
+    rng = np.random.default_rng(semilla)
+    cliente = ClienteLocal(ruta)
+    desde, hasta = rango_fechas(meses)
+    hoy = date.today()
+
+    with cliente.carga_masiva() as con:
+        con.execute('DELETE FROM reservas')
+        con.execute('DELETE FROM auditoria_bitacora')
+
+        # Canchas y horarios (08 a 22 todos los días)
+        tipos = {f['nombre']: (f['id'], f['precio_por_hora']) for f in con.execute('SELECT id, nombre, precio_por_hora FROM tipos_cancha')}
+        existentes = con.execute('SELECT COUNT(*) FROM canchas').fetchone()[0]
+        tipos_nuevas = rng.choice(len(TIPOS_CANCHA), size=max(canchas - existentes, 0), p=[0.2, 0.35, 0.3, 0.15])
+        _insertar(con, 'INSERT INTO canchas (nombre, id_tipo, ubicacion, capacidad_maxima) VALUES (?, ?, ?, ?)', (
+            (f"{TIPOS_CANCHA[t]} {existentes + i + 1}", tipos[TIPOS_CANCHA[t]][0], SECTORES[i % len(SECTORES)], 22)
+            for i, t in enumerate(tipos_nuevas)
+        ))
+        con.execute(
+            f"""INSERT OR IGNORE INTO horarios_disponibles (id_cancha, dia_semana, hora_inicio, hora_fin)
+                SELECT c.id, d.dia, '{HORA_APERTURA:02d}:00:00', '{HORA_CIERRE:02d}:00:00'
+                FROM canchas c, (SELECT 1 AS dia UNION ALL SELECT 2 UNION ALL SELECT 3
+                                 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6
+                                 UNION ALL SELECT 7) d"""
+        )
+        filas_canchas = con.execute('SELECT c.id, t.precio_por_hora FROM canchas c JOIN tipos_cancha t ON t.id = c.id_tipo ORDER BY c.id').fetchall()
+        ids_cancha = np.array([f[0] for f in filas_canchas])
+        precios = np.array([f[1] for f in filas_canchas], dtype=float)
+
+        # Clientes
+        existentes = con.execute('SELECT COUNT(*) FROM clientes').fetchone()[0]
+        _insertar(con, 'INSERT INTO clientes (nombre, apellido, telefono, email, documento) VALUES (?, ?, ?, ?, ?)', (
+            (
+                NOMBRES[i % len(NOMBRES)],
+                APELLIDOS[(i // len(NOMBRES)) % len(APELLIDOS)],
+                f"09{i:08d}",
+                f"cliente{i}@benchmark.com",
+                f"B{i:09d}"
+            )
+            for i in range(existentes, clientes)
+        ))
+        ids_cliente = np.array([f[0] for f in con.execute('SELECT id FROM clientes ORDER BY id')])
+
+        # Reservas: probabilidad de ocupación por cancha, día y hora de inicio
+        fechas = np.arange(np.datetime64(desde), np.datetime64(hasta + timedelta(days=1)))
+        meses_fecha = fechas.astype('datetime64[M]').astype(int) % 12
+        dias_fecha = (fechas.astype('int64') + 3) % 7  # 1970-01-01 fue jueves
+        demanda_cancha = rng.uniform(0.6, 1.4, size=len(ids_cancha))
+        peso = (demanda_cancha[:, None, None]
+                * (DEMANDA_MES[meses_fecha] * DEMANDA_DIA[dias_fecha])[None, :, None]
+                * DEMANDA_HORA[None, None, :])
+        probabilidad = np.minimum(peso * (reservas / peso.sum()), 0.9)
+        inicios = rng.random(peso.shape, dtype=np.float32) < probabilidad
+        # Una reserva de dos horas ocupa también la hora siguiente, si nadie empieza en ella
+        siguiente_libre = np.zeros_like(inicios)
+        siguiente_libre[..., :-1] = ~inicios[..., 1:]
+        dos_horas = inicios & siguiente_libre & (rng.random(peso.shape, dtype=np.float32) < 0.35)
+        del peso, probabilidad, siguiente_libre
+
+        posicion_cancha, posicion_fecha, hora = np.nonzero(inicios)
+        duracion = np.where(dos_horas[posicion_cancha, posicion_fecha, hora], 2, 1)
+        del inicios, dos_horas
+        total = len(hora)
+
+        rangos = np.arange(1, len(ids_cliente) + 1, dtype=float) ** -EXPONENTE_CLIENTES
+        cliente_reserva = ids_cliente[rng.permutation(len(ids_cliente))][
+            rng.choice(len(ids_cliente), size=total, p=rangos / rangos.sum())
+        ]
+        dia_reserva = fechas[posicion_fecha]
+        pasada = dia_reserva < np.datetime64(hoy)
+        sorteo = rng.random(total)
+        estado = np.where(
+            pasada,
+            np.where(sorteo < 0.1, 'cancelada', np.where(sorteo < 0.13, 'confirmada', 'completada')),
+            np.where(sorteo < 0.05, 'cancelada', np.where(sorteo < 0.4, 'pendiente', 'confirmada'))
+        )
+        monto = np.round(duracion * precios[posicion_cancha], 2)
+        anticipo = np.where(rng.random(total) < 0.4, np.round(monto / 2, 2), 0.0)
+        hora_inicio = hora + HORA_APERTURA
+        # created_at: entre 30 días y unas horas antes de la fecha reservada
+        creada = (dia_reserva.astype('datetime64[s]')
+                  - (rng.integers(3600, 30 * 86400, size=total)).astype('timedelta64[s]'))
+
+        # Orden por fecha y hora (como se cargan en la realidad)
+        orden = np.lexsort((hora, posicion_fecha))
+        textos_fecha = dia_reserva.astype(str)
+        textos_creada = creada.astype(str)
+        _insertar(con, """INSERT INTO reservas (id_cliente, id_cancha, fecha, hora_inicio, hora_fin, estado,
+                                               monto_total, anticipo, created_at, updated_at)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
+            (
+                int(cliente_reserva[i]),
+                int(ids_cancha[posicion_cancha[i]]),
+                textos_fecha[i],
+                f"{hora_inicio[i]:02d}:00:00",
+                f"{hora_inicio[i] + duracion[i]:02d}:00:00",
+                estado[i],
+                float(monto[i]),
+                float(anticipo[i]),
+                textos_creada[i],
+                textos_creada[i]
+            )
+            for i in orden
+        ))
+
+        # Bitácora: altas y cambios de estado de reservas, sesiones de usuarios
+        ids_reserva = np.array([f[0] for f in con.execute('SELECT id FROM reservas ORDER BY id')])
+        generar_bitacora(con, rng, ids_reserva, auditoria, desde, hoy)
+
+    cliente.cerrar()
+    return {
+        'reservas': total,
+        'clientes': len(ids_cliente),
+        'canchas': len(ids_cancha),
+        'auditoria': auditoria,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'segundos': round(time.perf_counter() - inicio, 2)
+    }
+
+def generar_bitacora(con, rng: np.random.Generator, ids_reserva: np.ndarray, cantidad: int, desde: date, hasta: date):
+    """Registros de auditoría repartidos en el rango, con diferencias en los UPDATE."""
+    if cantidad <= 0:
+        return
+    usuarios = ['admin@reservas.com', 'operador@reservas.com', 'consultor@reservas.com']
+    acciones = rng.choice(['INSERT', 'UPDATE', 'LOGIN', 'LOGOUT'], size=cantidad, p=[0.45, 0.35, 0.1, 0.1])
+    segundos = (np.datetime64(hasta) - np.datetime64(desde)).astype('timedelta64[s]').astype(np.int64)
+    momentos = np.sort(np.datetime64(desde, 's') + rng.integers(0, segundos, size=cantidad).astype('timedelta64[s]'))
+    reserva = ids_reserva[rng.integers(0, len(ids_reserva), size=cantidad)] if len(ids_reserva) else np.zeros(cantidad, int)
+    usuario = rng.integers(0, 2, size=cantidad)
+
+    def fila(i):
+        accion = acciones[i]
+        momento = str(momentos[i])
+        if accion in ('LOGIN', 'LOGOUT'):
+            return (usuarios[usuario[i]], momento, None, 'Chrome', '192.168.1.10', 'PC-RECEPCION', None, None,
+                    accion, f"{accion.title()} de {usuarios[usuario[i]]}", None, None, momento)
+        id_reserva = int(reserva[i])
+        if accion == 'INSERT':
+            nuevos = json.dumps({'id': id_reserva, 'estado': 'pendiente'})
+            return (usuarios[usuario[i]], None, None, None, None, None, 'reservas', id_reserva, accion,
+                    f"Reserva creada: ID {id_reserva}", None, nuevos, momento)
+        return (usuarios[usuario[i]], None, None, None, None, None, 'reservas', id_reserva, accion,
+                f"Reserva actualizada: ID {id_reserva} - Estado: pendiente -> confirmada",
+                json.dumps({'id': id_reserva, 'estado': 'pendiente'}),
+                json.dumps({'id': id_reserva, 'estado': 'confirmada'}), momento)
+
+    _insertar(con, """INSERT INTO auditoria_bitacora (nombre_usuario, hora_inicio_ingreso, hora_salida, navegador,
+                                                      ip_acceso, nombre_maquina, tabla_afectada, id_registro,
+                                                      tipo_accion, descripcion_detallada, datos_anteriores,
+                                                      datos_nuevos, created_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (fila(i) for i in range(cantidad)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--salida', default='datos_benchmark.db', help='Archivo SQLite a generar')
+    parser.add_argument('--reservas', type=int, default=100000, help='Reservas aproximadas')
+    parser.add_argument('--clientes', type=int, default=5000, help='Total de clientes')
+    parser.add_argument('--canchas', type=int, default=200, help='Total de canchas')
+    parser.add_argument('--meses', type=int, default=24, help='Meses de historia')
+    parser.add_argument('--auditoria', type=int, default=50000, help='Registros de bitácora')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    resumen = generar_base(
+        args.salida, args.reservas, args.clientes, args.canchas, args.meses, args.auditoria, args.semilla
+    )
+    print(f"{args.salida}: {resumen['reservas']:,} reservas, {resumen['clientes']:,} clientes, "
+          f"{resumen['canchas']} canchas, {resumen['auditoria']:,} registros de bitácora "
+          f"({resumen['desde']} a {resumen['hasta']}) en {resumen['segundos']:.1f} s")
+
+if __name__ == '__main__':
+    main()
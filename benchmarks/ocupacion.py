@@ -0,0 +1,46 @@
+"""
+Benchmark del cálculo de ocupación por día de la semana y hora.
+
+Mide components.ocupacion.calcular_ocupacion sobre reservas sintéticas de un
+año (el rango de meses que puede pedir la página de Reportes).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.ocupacion --filas 200000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.transformaciones import generar_reservas
+from components.ocupacion import calcular_ocupacion, mapa_calor
+
+CANCHAS = 20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=200000, help='Reservas sintéticas')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones (se toma la mejor)')
+    args = parser.parse_args()
+
+    reservas = pd.DataFrame(generar_reservas(args.filas))[['id_cancha', 'fecha', 'hora_inicio', 'hora_fin']]
+    horarios = pd.DataFrame([
+        {'id_cancha': c, 'dia_semana': d, 'hora_inicio': '08:00:00', 'hora_fin': '22:00:00'}
+        for c in range(1, CANCHAS + 1) for d in range(1, 8)
+    ])
+    desde = date.today()
+    hasta = desde + timedelta(days=364)
+
+    mejor = float('inf')
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        ocupacion = calcular_ocupacion(list(range(1, CANCHAS + 1)), horarios, reservas, desde, hasta)
+        mapa_calor(ocupacion)
+        mejor = min(mejor, time.perf_counter() - inicio)
+
+    print(f"Reservas: {args.filas:,} en {CANCHAS} canchas, {desde} a {hasta}")
+    print(f"Ocupación + mapa de calor: {mejor * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
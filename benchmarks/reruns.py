@@ -0,0 +1,272 @@
+"""
+Latencia de reruns de las páginas, de punta a punta y sin navegador.
+
+Cada interacción en Streamlit vuelve a ejecutar el script completo de la
+página. Este arnés ejecuta las páginas con streamlit.testing.v1.AppTest
+contra una base local generada con benchmarks.datos y repite interacciones
+reales (buscar, cambiar fechas, pasar de página, confirmar una reserva...).
+Por cada interacción mide el tiempo del rerun y cuenta las llamadas al
+backend (consultas y RPC ejecutadas), y reporta p50/p95 por paso y por
+página.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.reruns --repeticiones 10
+    python -m benchmarks.reruns --paginas Reservas,Reportes --comparar benchmarks/resultados/<anterior>.json
+
+Con --comparar el proceso termina con código 1 si el p95 de algún paso
+empeoró más que --tolerancia, para usarlo antes de desplegar.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.datos import generar_base
+from benchmarks.suite import DIRECTORIO_RESULTADOS, version_codigo
+from components.backend_local import ClienteLocal
+from components.database import usar_cliente
+from components.disponibilidad import obtener_indice
+from components.trazas import ClienteTrazado, lecturas
+
+DIRECTORIO_PAGINAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pages')
+
+# Usuario con el que se abren las páginas (como si hubiera iniciado sesión)
+USUARIO = {'id': 1, 'nombre': 'Administrador', 'email': 'admin@reservas.com', 'rol': 'admin'}
+
+class Sesion:
+    """Una página abierta en AppTest, con ayudas para interactuar por etiqueta."""
+
+    def __init__(self, pagina: str, trazas: List[Dict[str, Any]]):
+        self.at = AppTest.from_file(os.path.join(DIRECTORIO_PAGINAS, f"{pagina}.py"), default_timeout=120)
+        self.at.session_state['autenticado'] = True
+        self.at.session_state['usuario'] = dict(USUARIO)
+        # Trazas de components.trazas de todas las llamadas al backend de la sesión
+        self.trazas = trazas
+        # Índices elegidos por etiqueta de selectbox (ver _normalizar)
+        self._elegidos: Dict[str, int] = {}
+
+    def _widget(self, tipo: str, etiqueta: str):
+        for widget in getattr(self.at, tipo):
+            if widget.label == etiqueta:
+                return widget
+        return None
+
+    def _normalizar(self):
+        """
+        AppTest (1.29) no puede volver a enviar un selectbox con format_func
+        cuyas opciones no son texto (por ejemplo dicts de clientes): se fija
+        su índice antes de cada rerun.
+        """
+        for selectbox in self.at.selectbox:
+            try:
+                selectbox.index
+            except ValueError:
+                selectbox.select_index(self._elegidos.get(selectbox.label, selectbox.proto.default))
+
+    def correr(self) -> Dict[str, Any]:
+        """Ejecuta el rerun y devuelve su duración y llamadas al backend."""
+        self._normalizar()
+        antes = len(self.trazas)
+        inicio = time.perf_counter()
+        self.at.run()
+        segundos = time.perf_counter() - inicio
+        llamadas = self.trazas[antes:]
+        return {
+            'ms': segundos * 1000,
+            'llamadas': len(llamadas),
+            # Sin las páginas siguientes de lecturas paginadas (ver components.trazas.lecturas)
+            'lecturas': len(lecturas(llamadas)),
+            'ms_backend': sum(t['ms'] for t in llamadas),
+            'errores': [e.value for e in self.at.error] + [e.message for e in self.at.exception]
+        }
+
+    # --- Interacciones (devuelven False si el widget no está en la página) ---
+
+    def escribir(self, etiqueta: str, texto: str) -> bool:
+        widget = self._widget('text_input', etiqueta)
+        return widget is not None and widget.input(texto) is not None
+
+    def fecha(self, etiqueta: str, valor) -> bool:
+        widget = self._widget('date_input', etiqueta)
+        return widget is not None and widget.set_value(valor) is not None
+
+    def elegir(self, etiqueta: str, indice: int) -> bool:
+        widget = self._widget('selectbox', etiqueta)
+        if widget is None or indice >= len(widget.options):
+            return False
+        self._elegidos[etiqueta] = indice
+        widget.select_index(indice)
+        return True
+
+    def marcar(self, etiqueta: str) -> bool:
+        widget = self._widget('checkbox', etiqueta)
+        return widget is not None and widget.check() is not None
+
+    def pulsar(self, etiqueta: str) -> bool:
+        widget = self._widget('button', etiqueta)
+        return widget is not None and widget.click() is not None
+
+def escenarios() -> Dict[str, List[Tuple[str, Optional[Callable[[Sesion], bool]]]]]:
+    """Interacciones por página, en orden. El primer paso es la carga inicial."""
+    hoy = date.today()
+    return {
+        'Reservas': [
+            ('carga inicial', None),
+            ('buscar cliente', lambda s: s.escribir("🔍 Buscar por cliente", "Juan")),
+            ('cambiar rango de fechas', lambda s: s.fecha("Rango de fechas", (hoy, hoy + timedelta(days=14)))),
+            ('página siguiente', lambda s: s.pulsar("Siguiente ➡️")),
+            ('filtrar por estado', lambda s: s.elegir("Estado", 2)),
+            ('elegir cancha', lambda s: s.elegir("Cancha", 1)),
+            ('crear reserva', lambda s: s.pulsar("💾 Crear Reserva")),
+            ('confirmar reserva', lambda s: s.pulsar("✅ Sí, Confirmar")),
+        ],
+        'Reportes': [
+            ('carga inicial', None),
+            ('cambiar fecha inicio', lambda s: s.fecha("Fecha inicio", hoy - timedelta(days=90))),
+            ('elegir cancha del mapa', lambda s: s.elegir("Cancha", 1)),
+            ('cambiar formato de exportación', lambda s: s.elegir("Formato", 2)),
+        ],
+        'Auditoria': [
+            ('carga inicial', None),
+            ('filtrar por acción', lambda s: s.elegir("Tipo de Acción", 2)),
+            ('página siguiente', lambda s: s.pulsar("Siguiente ➡️")),
+            ('ampliar rango de fechas', lambda s: s.fecha("Rango de fechas", (hoy - timedelta(days=30), hoy))),
+        ],
+        'Gestion_Canchas': [
+            ('carga inicial', None),
+            ('buscar cancha', lambda s: s.escribir("🔍 Buscar cancha por nombre o ubicación", "Pádel")),
+        ],
+        'Gestion_Clientes': [
+            ('carga inicial', None),
+            ('buscar cliente', lambda s: s.escribir("🔍 Buscar por nombre, apellido o documento", "María")),
+            ('mostrar inactivos', lambda s: s.marcar("Mostrar inactivos")),
+        ],
+    }
+
+def recorrer(pagina: str, pasos, base: str) -> List[Dict[str, Any]]:
+    """Ejecuta una vez todos los pasos de una página sobre una copia de la base."""
+    directorio = tempfile.mkdtemp(prefix='reruns_')
+    copia = os.path.join(directorio, 'datos.db')
+    shutil.copyfile(base, copia)
+    cliente = ClienteLocal(copia)
+    trazas = []
+    usar_cliente(ClienteTrazado(cliente, destino=trazas.append))
+    obtener_indice().invalidar()
+    try:
+        sesion = Sesion(pagina, trazas)
+        medidos = []
+        for nombre, accion in pasos:
+            if accion is not None and not accion(sesion):
+                medidos.append({'paso': nombre, 'omitido': True})
+                continue
+            medidos.append({'paso': nombre, **sesion.correr()})
+        return medidos
+    finally:
+        usar_cliente(None)
+        cliente.cerrar()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+def resumir(muestras: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """p50/p95 de tiempo y promedio de llamadas al backend de un paso."""
+    validas = [m for m in muestras if not m.get('omitido')]
+    if not validas:
+        return {'omitido': True}
+    tiempos = np.array([m['ms'] for m in validas])
+    return {
+        'muestras': len(validas),
+        'p50_ms': round(float(np.percentile(tiempos, 50)), 1),
+        'p95_ms': round(float(np.percentile(tiempos, 95)), 1),
+        'llamadas': round(float(np.mean([m['llamadas'] for m in validas])), 1),
+        'ms_backend': round(float(np.mean([m['ms_backend'] for m in validas])), 1),
+        'errores': sorted({e for m in validas for e in m['errores']})
+    }
+
+def comparar(actual: Dict[str, Any], anterior: Dict[str, Any], tolerancia: float) -> bool:
+    """Imprime los cocientes de p95 y devuelve True si algún paso empeoró más que la tolerancia."""
+    print(f"\nComparación con {anterior.get('version')} ({anterior.get('fecha')}):")
+    regresion = False
+    for pagina, pasos in actual['paginas'].items():
+        previos = anterior.get('paginas', {}).get(pagina, {})
+        for paso, medido in pasos.items():
+            previo = previos.get(paso, {})
+            if medido.get('omitido') or previo.get('omitido') or not previo.get('p95_ms'):
+                continue
+            cociente = medido['p95_ms'] / previo['p95_ms']
+            mas_llamadas = medido['llamadas'] > previo['llamadas']
+            marca = ''
+            if cociente > 1 + tolerancia or mas_llamadas:
+                regresion = True
+                marca = '  <-- regresión' + (f" ({previo['llamadas']} -> {medido['llamadas']} llamadas)" if mas_llamadas else '')
+            print(f"{pagina:<18} {paso:<32} p95 {cociente:>5.2f}x{marca}")
+    return regresion
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paginas', help='Páginas separadas por coma (por defecto todas)')
+    parser.add_argument('--repeticiones', type=int, default=5, help='Recorridos completos por página')
+    parser.add_argument('--reservas', type=int, default=20000)
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--canchas', type=int, default=50)
+    parser.add_argument('--datos', default='datos_benchmark', help='Directorio de las bases generadas')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto en benchmarks/resultados/)')
+    parser.add_argument('--comparar', help='Resultados anteriores (JSON) contra los que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='Empeoramiento de p95 aceptado (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    os.makedirs(args.datos, exist_ok=True)
+    base = os.path.join(args.datos, f"reruns_{args.reservas}_canchas_{args.canchas}_clientes_{args.clientes}.db")
+    if not os.path.exists(base):
+        print(f"Generando {base}...")
+        generar_base(base, args.reservas, args.clientes, args.canchas, meses=12, auditoria=20000)
+
+    todos = escenarios()
+    paginas = args.paginas.split(',') if args.paginas else list(todos)
+    resultados = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': version_codigo(),
+        'datos': {'reservas': args.reservas, 'clientes': args.clientes, 'canchas': args.canchas},
+        'repeticiones': args.repeticiones,
+        'paginas': {}
+    }
+    for pagina in paginas:
+        muestras: Dict[str, List[Dict[str, Any]]] = {}
+        for _ in range(args.repeticiones):
+            for medido in recorrer(pagina, todos[pagina], base):
+                muestras.setdefault(medido['paso'], []).append(medido)
+        resumen = {paso: resumir(m) for paso, m in muestras.items()}
+        resultados['paginas'][pagina] = resumen
+
+        print(f"\n=== {pagina} ===")
+        print(f"{'paso':<32} {'p50 ms':>9} {'p95 ms':>9} {'llamadas':>9} {'backend ms':>11}")
+        for paso, r in resumen.items():
+            if r.get('omitido'):
+                print(f"{paso:<32} {'(omitido: el widget no está en la página)':>40}")
+                continue
+            print(f"{paso:<32} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['llamadas']:>9.1f} {r['ms_backend']:>11.1f}")
+            for error in r['errores']:
+                print(f"    error: {error[:120]}")
+
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS,
+        f"reruns_{datetime.now():%Y%m%d_%H%M%S}_{(resultados['version'] or 'sin_version').replace('+', '_local')}.json"
+    )
+    os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            if comparar(resultados, json.load(archivo), args.tolerancia):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
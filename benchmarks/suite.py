@@ -0,0 +1,230 @@
+"""
+Suite de benchmarks de los caminos más usados, a varios tamaños de datos.
+
+Para cada tamaño genera (o reutiliza) una base local con benchmarks.datos,
+la fija como cliente del proceso (usar_cliente) y mide las funciones que
+ejecutan las páginas: verificación de disponibilidad, lista y exportación de
+reservas, estadísticas y reportes, transformaciones de Reportes y la carga
+de la bitácora. Cada caso se ejecuta varias veces y se guarda el mejor
+tiempo y la mediana.
+
+Los resultados se guardan en JSON (benchmarks/resultados/) con la versión
+del código, para comparar una versión con otra:
+    python -m benchmarks.suite --tamanos 10000,100000,1000000
+    python -m benchmarks.suite --comparar benchmarks/resultados/<anterior>.json
+
+El backend local emula PostgREST sobre SQLite en el mismo proceso: los
+tiempos sirven para comparar versiones y ver cómo escala cada camino, no
+como latencia absoluta contra Supabase (no incluyen la red).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, time as hora, timedelta
+from typing import Callable, Dict, Any, List, Optional
+
+from benchmarks.datos import generar_base
+from components.backend_local import ClienteLocal
+from components.database import (
+    usar_cliente,
+    consulta_reservas_completas,
+    obtener_reservas_completas,
+    obtener_estadisticas_canchas,
+    obtener_ingresos_diarios,
+    obtener_reservas_por_estado,
+    obtener_top_clientes,
+    obtener_fidelizacion_clientes
+)
+from components.auditoria import reconstruir_imagenes
+from components.disponibilidad import obtener_indice
+from components.ocupacion import cargar_datos, calcular_ocupacion, mapa_calor
+from components.transformaciones import normalizar_reservas
+from components.utils import obtener_pagina
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), 'resultados')
+
+ORDEN_RESERVAS = [('fecha', False), ('hora_inicio', False), ('id', False)]
+ORDEN_BITACORA = [('created_at', True), ('id', True)]
+
+# Verificaciones por medición del índice ya cargado (cada una tarda microsegundos)
+VERIFICACIONES = 1000
+
+def version_codigo() -> Optional[str]:
+    """Commit actual (con '+' si hay cambios sin confirmar), o None fuera de git."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        cambios = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return commit + ('+' if cambios else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def casos(cliente: ClienteLocal) -> Dict[str, Callable[[], Any]]:
+    """
+    Casos a medir sobre la base fijada. Cada función devuelve lo que
+    devuelve el código medido (para contar filas).
+    """
+    hoy = date.today()
+    mes = (hoy - timedelta(days=30), hoy)
+    anio = (hoy - timedelta(days=365), hoy)
+    id_cancha = cliente.table('canchas').select('id').order('id').limit(1).execute().data[0]['id']
+    indice = obtener_indice()
+    reservas_mes = obtener_reservas_completas(*mes).data
+    actualizacion = cliente.table('auditoria_bitacora')\
+        .select('id, tabla_afectada, id_registro, tipo_accion, datos_anteriores, datos_nuevos')\
+        .eq('tipo_accion', 'UPDATE')\
+        .order('id', desc=True)\
+        .limit(1)\
+        .execute().data
+
+    def verificar_fria():
+        indice.invalidar()
+        return indice.verificar(id_cancha, hoy + timedelta(days=3), hora(19), hora(20))
+
+    def verificar_caliente():
+        indice.asegurar_ventana(hoy)
+        for i in range(VERIFICACIONES):
+            indice.verificar(id_cancha, hoy + timedelta(days=i % 30), hora(8 + i % 13), hora(9 + i % 13))
+
+    def pagina_reservas():
+        return obtener_pagina(
+            consulta_reservas_completas(hoy, hoy + timedelta(days=30), conteo='estimated'), ORDEN_RESERVAS, None, 8
+        )[0]
+
+    def reportes_agregados():
+        obtener_ingresos_diarios(*anio)
+        obtener_reservas_por_estado(*anio)
+        obtener_fidelizacion_clientes(*anio)
+        return obtener_top_clientes(*anio).data
+
+    def ocupacion_mes():
+        datos = cargar_datos(*mes)
+        ocupacion = calcular_ocupacion(datos['canchas']['id'].tolist(), datos['horarios'], datos['reservas'], *mes)
+        return mapa_calor(ocupacion)
+
+    def pagina_bitacora():
+        consulta = cliente.table('auditoria_bitacora')\
+            .select('id, created_at, nombre_usuario, tipo_accion, tabla_afectada, descripcion_detallada', count='estimated')\
+            .gte('created_at', (hoy - timedelta(days=7)).isoformat())\
+            .lt('created_at', (hoy + timedelta(days=1)).isoformat())
+        return obtener_pagina(consulta, ORDEN_BITACORA, None, 50)[0]
+
+    return {
+        'verificar_disponibilidad (índice frío)': verificar_fria,
+        f'verificar_disponibilidad x{VERIFICACIONES} (índice cargado)': verificar_caliente,
+        'reservas: primera página (30 días)': pagina_reservas,
+        'obtener_reservas_completas (30 días)': lambda: obtener_reservas_completas(*mes).data,
+        'obtener_estadisticas_canchas (30 días)': lambda: obtener_estadisticas_canchas(*mes).data,
+        'obtener_estadisticas_canchas (365 días)': lambda: obtener_estadisticas_canchas(*anio).data,
+        'reportes agregados (365 días)': reportes_agregados,
+        'normalizar_reservas (30 días)': lambda: normalizar_reservas(reservas_mes),
+        'ocupación día x hora (30 días)': ocupacion_mes,
+        'auditoría: primera página (7 días)': pagina_bitacora,
+        'auditoría: reconstruir registro': lambda: reconstruir_imagenes(actualizacion[0]) if actualizacion else None,
+    }
+
+def medir(funcion: Callable[[], Any], repeticiones: int) -> Dict[str, Any]:
+    """Mejor tiempo y mediana (ms) de varias ejecuciones y filas devueltas."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'mejor_ms': round(min(tiempos), 3),
+        'mediana_ms': round(statistics.median(tiempos), 3),
+        'filas': len(resultado) if hasattr(resultado, '__len__') and not isinstance(resultado, tuple) else None
+    }
+
+def ruta_datos(directorio: str, reservas: int, args) -> str:
+    return os.path.join(
+        directorio,
+        f"reservas_{reservas}_canchas_{args.canchas}_clientes_{args.clientes}_meses_{args.meses}_semilla_{args.semilla}.db"
+    )
+
+def ejecutar(args) -> Dict[str, Any]:
+    """Genera los datos que falten y mide todos los casos en cada tamaño."""
+    os.makedirs(args.datos, exist_ok=True)
+    resultados = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': version_codigo(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': args.repeticiones,
+        'tamanos': {}
+    }
+    for reservas in args.tamanos:
+        ruta = ruta_datos(args.datos, reservas, args)
+        if args.regenerar or not os.path.exists(ruta):
+            print(f"Generando {ruta}...")
+            datos = generar_base(ruta, reservas, args.clientes, args.canchas, args.meses, args.auditoria, args.semilla)
+        else:
+            datos = {'reservas': reservas, 'reutilizada': True}
+
+        cliente = ClienteLocal(ruta)
+        usar_cliente(cliente)
+        try:
+            print(f"\n=== {reservas:,} reservas ===")
+            medidos = {}
+            for nombre, funcion in casos(cliente).items():
+                medidos[nombre] = medir(funcion, args.repeticiones)
+                print(f"{nombre:<55} {medidos[nombre]['mejor_ms']:>10.1f} ms  (mediana {medidos[nombre]['mediana_ms']:.1f})")
+            resultados['tamanos'][str(reservas)] = {'datos': datos, 'casos': medidos}
+        finally:
+            usar_cliente(None)
+            cliente.cerrar()
+    return resultados
+
+def comparar(actual: Dict[str, Any], anterior: Dict[str, Any]):
+    """Imprime el cociente actual / anterior del mejor tiempo de cada caso."""
+    print(f"\nComparación con {anterior.get('version')} ({anterior.get('fecha')}):")
+    for tamano, datos in actual['tamanos'].items():
+        previos = anterior.get('tamanos', {}).get(tamano, {}).get('casos', {})
+        for nombre, medido in datos['casos'].items():
+            if nombre in previos and previos[nombre]['mejor_ms'] > 0:
+                cociente = medido['mejor_ms'] / previos[nombre]['mejor_ms']
+                marca = '  <-- más lento' if cociente > 1.2 else ''
+                print(f"{int(tamano):>10,} {nombre:<55} {cociente:>6.2f}x{marca}")
+
+def _enteros(texto: str) -> List[int]:
+    return [int(t) for t in texto.split(',') if t.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=_enteros, default=[10000, 100000], help='Reservas por base, separadas por coma')
+    parser.add_argument('--clientes', type=int, default=5000)
+    parser.add_argument('--canchas', type=int, default=200)
+    parser.add_argument('--meses', type=int, default=24)
+    parser.add_argument('--auditoria', type=int, default=50000)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por caso')
+    parser.add_argument('--datos', default='datos_benchmark', help='Directorio de las bases generadas')
+    parser.add_argument('--regenerar', action='store_true', help='Generar las bases aunque existan')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto en benchmarks/resultados/)')
+    parser.add_argument('--comparar', help='Resultados anteriores (JSON) contra los que comparar')
+    args = parser.parse_args()
+
+    resultados = ejecutar(args)
+    salida = args.salida or os.path.join(
+        DIRECTORIO_RESULTADOS,
+        f"{datetime.now():%Y%m%d_%H%M%S}_{(resultados['version'] or 'sin_version').replace('+', '_local')}.json"
+    )
+    os.makedirs(os.path.dirname(salida) or '.', exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            comparar(resultados, json.load(archivo))
+
+if __name__ == '__main__':
+    main()
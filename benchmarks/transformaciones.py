@@ -0,0 +1,100 @@
+"""
+Benchmark de la normalización de reservas para reportes.
+
+Compara el procesamiento fila por fila que usaban los reportes
+(df.apply(..., axis=1) sobre los dicts embebidos y un bucle con strptime y
+datetime.combine por reserva) con components.transformaciones, sobre
+reservas sintéticas con la forma de la respuesta de PostgREST.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.transformaciones --filas 100000
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from components.transformaciones import normalizar_reservas
+
+def generar_reservas(cantidad: int, semilla: int = 42) -> list:
+    """Reservas con clientes(...) y canchas(...) embebidos, como las devuelve PostgREST."""
+    aleatorio = random.Random(semilla)
+    inicio = date.today()
+    filas = []
+    for i in range(cantidad):
+        hora = aleatorio.randint(8, 20)
+        minuto = aleatorio.choice([0, 15, 30, 45])
+        duracion = aleatorio.choice([60, 90, 120])
+        fin = hora * 60 + minuto + duracion
+        id_cliente = aleatorio.randint(1, 5000)
+        id_cancha = aleatorio.randint(1, 20)
+        filas.append({
+            'id': i + 1,
+            'id_cliente': id_cliente,
+            'id_cancha': id_cancha,
+            'fecha': (inicio + timedelta(days=aleatorio.randint(0, 364))).isoformat(),
+            'hora_inicio': f"{hora:02d}:{minuto:02d}:00",
+            'hora_fin': f"{fin // 60:02d}:{fin % 60:02d}:00",
+            'estado': aleatorio.choice(['pendiente', 'confirmada', 'cancelada', 'completada']),
+            'monto_total': round(duracion / 60 * 35.0, 2),
+            'clientes': {'nombre': f"Nombre{id_cliente}", 'apellido': f"Apellido{id_cliente}"},
+            'canchas': {'nombre': f"Cancha {id_cancha}"},
+        })
+    return filas
+
+def normalizar_fila_por_fila(filas: list) -> pd.DataFrame:
+    """Procesamiento anterior: apply por fila y strptime por reserva."""
+    df = pd.DataFrame(filas)
+    df['nombre_cliente'] = df.apply(
+        lambda x: f"{x['clientes']['nombre']} {x['clientes']['apellido']}"
+        if x.get('clientes') else "Cliente Desconocido",
+        axis=1
+    )
+    df['nombre_cancha'] = df.apply(
+        lambda x: x['canchas']['nombre'] if x.get('canchas') else "Cancha Desconocida",
+        axis=1
+    )
+    df['fecha'] = pd.to_datetime(df['fecha'])
+    horas = []
+    for reserva in filas:
+        hora_inicio = datetime.strptime(reserva['hora_inicio'], '%H:%M:%S').time()
+        hora_fin = datetime.strptime(reserva['hora_fin'], '%H:%M:%S').time()
+        horas.append((datetime.combine(date.today(), hora_fin) -
+                      datetime.combine(date.today(), hora_inicio)).seconds / 3600)
+    df['horas'] = horas
+    return df
+
+def medir(funcion, filas: list, repeticiones: int) -> tuple:
+    """Mejor tiempo (segundos) de varias ejecuciones y el último resultado."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(filas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=100000, help='Reservas sintéticas')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones por variante (se toma la mejor)')
+    args = parser.parse_args()
+
+    filas = generar_reservas(args.filas)
+    t_anterior, anterior = medir(normalizar_fila_por_fila, filas, args.repeticiones)
+    t_vectorizado, vectorizado = medir(normalizar_reservas, filas, args.repeticiones)
+
+    # Ambos caminos tienen que dar los mismos resultados
+    assert (anterior['nombre_cliente'] == vectorizado['nombre_cliente']).all()
+    assert (anterior['nombre_cancha'] == vectorizado['nombre_cancha']).all()
+    assert np.allclose(anterior['horas'], vectorizado['horas'])
+
+    print(f"Reservas: {args.filas:,}")
+    print(f"Fila por fila: {t_anterior * 1000:10.1f} ms")
+    print(f"Vectorizado:   {t_vectorizado * 1000:10.1f} ms")
+    print(f"Aceleración:   {t_anterior / t_vectorizado:10.1f}x")
+
+if __name__ == '__main__':
+    main()
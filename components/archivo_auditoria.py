@@ -0,0 +1,376 @@
+"""
+Retención y archivo frío de la bitácora de auditoría.
+
+auditoria_bitacora está particionada por mes. La tarea de retención
+(ejecutar_retencion, o `python -m components.archivo_auditoria` desde cron)
+exporta cada mes más antiguo que AUDITORIA_MESES_CALIENTES a un archivo
+Parquet comprimido con zstd en AUDITORIA_ARCHIVO y después elimina la
+partición, así la tabla caliente conserva solo los últimos meses.
+
+pagina_archivo() aplica a los archivos los mismos filtros y el mismo cursor
+que la página de Auditoría aplica a la tabla (los filtros se evalúan contra
+las estadísticas de cada grupo de filas de Parquet, sin leer el archivo
+completo).
+"""
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Tuple, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from components.database import obtener_cliente, leer_configuracion
+from components.utils import obtener_pagina
+
+# Filas leídas por consulta al exportar un mes
+FILAS_POR_LECTURA = 1000
+
+# Columnas con snapshots JSONB (se guardan como texto JSON)
+COLUMNAS_JSON = ['datos_anteriores', 'datos_nuevos']
+
+COLUMNAS_FECHA = ['hora_inicio_ingreso', 'hora_salida', 'created_at']
+
+ESQUEMA_ARCHIVO = pa.schema([
+    ('id', pa.int64()),
+    ('nombre_usuario', pa.string()),
+    ('hora_inicio_ingreso', pa.timestamp('us')),
+    ('hora_salida', pa.timestamp('us')),
+    ('navegador', pa.string()),
+    ('ip_acceso', pa.string()),
+    ('nombre_maquina', pa.string()),
+    ('tabla_afectada', pa.string()),
+    ('id_registro', pa.int64()),
+    ('tipo_accion', pa.string()),
+    ('descripcion_detallada', pa.string()),
+    ('datos_anteriores', pa.string()),
+    ('datos_nuevos', pa.string()),
+    ('created_at', pa.timestamp('us')),
+])
+
+_PATRON_ARCHIVO = re.compile(r'^auditoria_(\d{4})_(\d{2})\.parquet$')
+
+def directorio_archivo() -> str:
+    """Directorio de los archivos mensuales (AUDITORIA_ARCHIVO)."""
+    return leer_configuracion('AUDITORIA_ARCHIVO', 'archivo_auditoria')
+
+def meses_calientes() -> int:
+    """Meses que quedan en la base de datos, incluido el actual."""
+    return int(leer_configuracion('AUDITORIA_MESES_CALIENTES', '3'))
+
+def inicio_mes(fecha: date) -> date:
+    return fecha.replace(day=1)
+
+def sumar_meses(mes: date, cantidad: int) -> date:
+    """Primer día del mes que está `cantidad` meses antes/después de `mes`."""
+    total = mes.year * 12 + mes.month - 1 + cantidad
+    return date(total // 12, total % 12 + 1, 1)
+
+def ruta_mes(mes: date) -> str:
+    return os.path.join(directorio_archivo(), f"auditoria_{mes:%Y_%m}.parquet")
+
+def meses_archivados() -> List[date]:
+    """Meses que ya tienen archivo, ordenados."""
+    directorio = directorio_archivo()
+    if not os.path.isdir(directorio):
+        return []
+    meses = []
+    for nombre in os.listdir(directorio):
+        coincidencia = _PATRON_ARCHIVO.match(nombre)
+        if coincidencia:
+            meses.append(date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1))
+    return sorted(meses)
+
+def normalizar_registros(filas: List[dict]) -> pd.DataFrame:
+    """
+    Convierte filas de la bitácora a las columnas de ESQUEMA_ARCHIVO: fechas
+    como datetime y los snapshots JSONB como texto JSON (también lo usa la
+    exportación a CSV/Parquet).
+    """
+    df = pd.DataFrame(filas, columns=ESQUEMA_ARCHIVO.names)
+    for columna in COLUMNAS_FECHA:
+        df[columna] = pd.to_datetime(df[columna], errors='coerce')
+    for columna in COLUMNAS_JSON:
+        df[columna] = df[columna].map(
+            lambda v: None if v is None else json.dumps(v, ensure_ascii=False, default=str)
+        )
+    df['ip_acceso'] = df['ip_acceso'].map(lambda v: None if v is None else str(v))
+    return df
+
+def _a_tabla(filas: List[dict]) -> pa.Table:
+    """Convierte filas de la bitácora al esquema columnar del archivo."""
+    return pa.Table.from_pandas(normalizar_registros(filas), schema=ESQUEMA_ARCHIVO, preserve_index=False)
+
+def archivar_mes(mes: date) -> Tuple[str, int]:
+    """
+    Exporta a Parquet los registros de un mes leyendo la tabla por páginas.
+
+    Si el mes ya tenía archivo (registros que llegaron tarde) se combinan,
+    sin duplicar ids. El archivo se escribe con otro nombre y se renombra al
+    final, de modo que nunca queda un archivo a medio escribir.
+
+    Args:
+        mes: Cualquier fecha del mes a archivar
+
+    Returns:
+        Tuple con (ruta del archivo, registros exportados de la base)
+    """
+    mes = inicio_mes(mes)
+    siguiente = sumar_meses(mes, 1)
+    ruta = ruta_mes(mes)
+    os.makedirs(directorio_archivo(), exist_ok=True)
+
+    tablas = []
+    cursor = None
+    exportados = 0
+    while True:
+        consulta = obtener_cliente().table('auditoria_bitacora')\
+            .select('*')\
+            .gte('created_at', mes.isoformat())\
+            .lt('created_at', siguiente.isoformat())
+        filas, cursor, _ = obtener_pagina(consulta, [('created_at', False), ('id', False)], cursor, FILAS_POR_LECTURA)
+        if filas:
+            tablas.append(_a_tabla(filas))
+            exportados += len(filas)
+        if cursor is None:
+            break
+
+    if os.path.exists(ruta):
+        tablas.insert(0, pq.read_table(ruta, schema=ESQUEMA_ARCHIVO))
+    if not tablas:
+        return ruta, 0
+
+    tabla = pa.concat_tables(tablas)
+    if os.path.exists(ruta):
+        df = tabla.to_pandas().drop_duplicates('id', keep='last').sort_values(['created_at', 'id'])
+        tabla = pa.Table.from_pandas(df, schema=ESQUEMA_ARCHIVO, preserve_index=False)
+
+    temporal = ruta + '.tmp'
+    pq.write_table(tabla, temporal, compression='zstd', row_group_size=10000)
+    os.replace(temporal, ruta)
+    return ruta, exportados
+
+def ejecutar_retencion(hoy: Optional[date] = None) -> List[Tuple[date, int]]:
+    """
+    Archiva y elimina de la base los meses fuera del período caliente.
+
+    Después crea por adelantado las particiones de los próximos meses (si
+    eso falla, los meses viejos ya quedaron archivados). Cada mes se procesa
+    por separado: un mes que falla no impide archivar los demás, y al final
+    se informa qué meses fallaron.
+
+    Returns:
+        List[Tuple] con (mes, registros archivados) por cada mes procesado
+
+    Raises:
+        Exception: Si algún mes o la creación de particiones falló
+    """
+    hoy = hoy or date.today()
+    cliente = obtener_cliente()
+    corte = sumar_meses(inicio_mes(hoy), -(meses_calientes() - 1))
+    meses = cliente.rpc('meses_auditoria_anteriores', {'p_antes': corte.isoformat()}).execute()
+
+    procesados = []
+    fallas = []
+    for fila in meses.data or []:
+        mes = date.fromisoformat(str(fila['mes'])[:10])
+        try:
+            _, cantidad = archivar_mes(mes)
+            # Solo se elimina la partición cuando el archivo ya está escrito
+            cliente.rpc('eliminar_mes_auditoria', {'p_mes': mes.isoformat()}).execute()
+            procesados.append((mes, cantidad))
+        except Exception as e:
+            print(f"Error al archivar {mes:%Y-%m}: {str(e)}")  # Para debugging
+            fallas.append(f"{mes:%Y-%m}: {str(e)}")
+
+    try:
+        cliente.rpc('crear_particiones_auditoria', {'p_meses': 2}).execute()
+    except Exception as e:
+        print(f"Error al crear las particiones de auditoría: {str(e)}")  # Para debugging
+        fallas.append(f"particiones: {str(e)}")
+
+    if fallas:
+        archivados = ', '.join(f"{mes:%Y-%m}" for mes, _ in procesados) or 'ninguno'
+        raise Exception(
+            f"Error en la retención de auditoría ({'; '.join(fallas)}); meses archivados: {archivados}"
+        )
+    return procesados
+
+def _filtros_archivo(
+    fecha_inicio: date,
+    fecha_fin: date,
+    usuario: Optional[str],
+    tipo_accion: Optional[str]
+) -> Tuple[List[date], list]:
+    """Meses archivados que tocan el rango y filtros de Parquet equivalentes."""
+    meses = [
+        m for m in meses_archivados()
+        if m <= fecha_fin and sumar_meses(m, 1) > fecha_inicio
+    ]
+    filtros = [
+        ('created_at', '>=', pd.Timestamp(fecha_inicio)),
+        ('created_at', '<', pd.Timestamp(fecha_fin + timedelta(days=1))),
+    ]
+    if usuario:
+        filtros.append(('nombre_usuario', '=', usuario))
+    if tipo_accion:
+        filtros.append(('tipo_accion', '=', tipo_accion))
+    return meses, filtros
+
+def iterar_archivo(
+    fecha_inicio: date,
+    fecha_fin: date,
+    usuario: Optional[str] = None,
+    tipo_accion: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorre los registros archivados del rango mes por mes (del más antiguo
+    al más reciente), con los mismos filtros que pagina_archivo. Solo hay un
+    mes en memoria a la vez.
+
+    Yields:
+        pd.DataFrame de cada mes con registros, ordenado por created_at e id
+    """
+    meses, filtros = _filtros_archivo(fecha_inicio, fecha_fin, usuario, tipo_accion)
+    for mes in meses:
+        df = pq.read_table(ruta_mes(mes), filters=filtros, schema=ESQUEMA_ARCHIVO).to_pandas()
+        if not df.empty:
+            yield df.sort_values(['created_at', 'id'], ignore_index=True)
+
+def _a_filas(df: pd.DataFrame) -> List[dict]:
+    """Filas del archivo como las devuelve la tabla: fechas en ISO y None en lugar de NaN."""
+    for columna in COLUMNAS_FECHA:
+        if columna in df:
+            df[columna] = df[columna].map(lambda v: None if pd.isna(v) else v.isoformat())
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def pagina_archivo(
+    fecha_inicio: date,
+    fecha_fin: date,
+    usuario: Optional[str] = None,
+    tipo_accion: Optional[str] = None,
+    columnas: Optional[List[str]] = None,
+    cursor: Optional[dict] = None,
+    limite: int = 50
+) -> List[dict]:
+    """
+    Registros archivados posteriores al cursor, en el orden de la página de
+    Auditoría (created_at e id descendentes), para intercalarlos con la tabla.
+
+    Los meses se recorren del más reciente al más antiguo y la lectura se
+    corta al juntar `limite` filas; de cada mes se leen solo `columnas`.
+
+    Args:
+        fecha_inicio: Primer día (inclusive)
+        fecha_fin: Último día (inclusive)
+        usuario: Filtrar por nombre de usuario
+        tipo_accion: Filtrar por tipo de acción
+        columnas: Columnas a leer (todas si es None); debe incluir created_at e id
+        cursor: created_at e id de la última fila vista (None para la primera página)
+        limite: Cantidad máxima de filas
+
+    Returns:
+        List[Dict] con created_at (y las demás fechas) en formato ISO
+    """
+    meses, filtros = _filtros_archivo(fecha_inicio, fecha_fin, usuario, tipo_accion)
+    if cursor:
+        momento = pd.Timestamp(cursor['created_at'])
+        meses = [m for m in meses if m <= momento.date()]
+        # Keyset: created_at < c OR (created_at = c AND id < i)
+        filtros = [
+            filtros + [('created_at', '<', momento)],
+            filtros + [('created_at', '=', momento), ('id', '<', int(cursor['id']))],
+        ]
+
+    filas = []
+    for mes in reversed(meses):
+        df = pq.read_table(ruta_mes(mes), columns=columnas, filters=filtros, schema=ESQUEMA_ARCHIVO).to_pandas()
+        df = df.sort_values(['created_at', 'id'], ascending=False, ignore_index=True)
+        filas.extend(_a_filas(df.head(limite - len(filas))))
+        if len(filas) >= limite:
+            break
+    return filas
+
+def contar_archivo(
+    fecha_inicio: date,
+    fecha_fin: date,
+    usuario: Optional[str] = None,
+    tipo_accion: Optional[str] = None
+) -> int:
+    """Cantidad de registros archivados del rango (se lee solo la columna id)."""
+    meses, filtros = _filtros_archivo(fecha_inicio, fecha_fin, usuario, tipo_accion)
+    return sum(
+        pq.read_table(ruta_mes(m), columns=['id'], filters=filtros, schema=ESQUEMA_ARCHIVO).num_rows
+        for m in meses
+    )
+
+def detalle_archivado(id_registro: int, created_at) -> Optional[dict]:
+    """
+    Entrada archivada completa, con los snapshots JSON ya decodificados.
+
+    Solo se abre el archivo del mes de `created_at`.
+
+    Args:
+        id_registro: ID de la entrada de la bitácora
+        created_at: created_at de la entrada (ISO o datetime)
+
+    Returns:
+        Dict con las columnas de la bitácora, o None si no está archivada
+    """
+    ruta = ruta_mes(inicio_mes(pd.Timestamp(created_at).date()))
+    if not os.path.exists(ruta):
+        return None
+    df = pq.read_table(ruta, filters=[('id', '=', int(id_registro))], schema=ESQUEMA_ARCHIVO).to_pandas()
+    if df.empty:
+        return None
+    fila = _a_filas(df)[0]
+    for columna in COLUMNAS_JSON:
+        fila[columna] = json.loads(fila[columna]) if fila[columna] else None
+    return fila
+
+def leer_cambios_registro(tabla: str, id_registro: int, desde: datetime) -> List[dict]:
+    """
+    Lee los UPDATE y DELETE archivados de un registro desde `desde` (inclusive).
+
+    Solo se abren los meses archivados que terminan después de `desde`
+    (components.auditoria.reconstruir_imagenes los necesita para deshacer
+    los cambios posteriores a una entrada).
+
+    Args:
+        tabla: Tabla afectada
+        id_registro: ID del registro en esa tabla
+        desde: Instante a partir del cual leer (sin zona horaria)
+
+    Returns:
+        List[Dict] con id, created_at, tipo_accion y datos_anteriores (dict),
+        ordenada por created_at e id
+    """
+    meses = [m for m in meses_archivados() if sumar_meses(m, 1) > desde.date()]
+    if not meses:
+        return []
+
+    filtros = [
+        ('created_at', '>=', pd.Timestamp(desde)),
+        ('tabla_afectada', '=', tabla),
+        ('id_registro', '=', int(id_registro)),
+        ('tipo_accion', 'in', ['UPDATE', 'DELETE']),
+    ]
+    tablas = [pq.read_table(ruta_mes(m), filters=filtros, schema=ESQUEMA_ARCHIVO) for m in meses]
+    df = pa.concat_tables(tablas).to_pandas().sort_values(['created_at', 'id'], ignore_index=True)
+    return [
+        {
+            'id': int(fila.id),
+            'created_at': fila.created_at,
+            'tipo_accion': fila.tipo_accion,
+            'datos_anteriores': json.loads(fila.datos_anteriores) if fila.datos_anteriores else None
+        }
+        for fila in df.itertuples()
+    ]
+
+if __name__ == '__main__':
+    inicio = datetime.now()
+    for mes, cantidad in ejecutar_retencion():
+        print(f"{mes:%Y-%m}: {cantidad} registros archivados en {ruta_mes(mes)}")
+    print(f"Retención completada en {(datetime.now() - inicio).total_seconds():.1f} s")
@@ -0,0 +1,305 @@
+"""
+Escritura asíncrona de la bitácora de auditoría.
+
+registrar_auditoria() solo encola la entrada y vuelve enseguida; un hilo de
+fondo la inserta junto con otras en una sola petición (un lote se envía al
+llegar a TAMANO_LOTE entradas o al pasar SEGUNDOS_LOTE desde la primera).
+
+Si el backend no responde, el lote se guarda en un archivo JSONL local
+(AUDITORIA_SPOOL) y se reenvía cuando una escritura posterior tiene éxito,
+de modo que un fallo de la auditoría nunca interrumpe la operación del
+usuario ni se pierden entradas. Al terminar el proceso se vacía la cola.
+
+Los UPDATE se guardan como diferencias: datos_anteriores y datos_nuevos
+contienen solo los campos modificados (más 'id'). reconstruir_imagenes()
+rearma las filas completas antes y después del cambio a partir de la fila
+actual y de los UPDATE posteriores del mismo registro (en la tabla o ya
+archivados en Parquet).
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+import pandas as pd
+
+from components.database import obtener_cliente, leer_configuracion
+from components.metricas import contador, histograma, indicador
+from components.utils import filtro_keyset
+
+# Entradas máximas en memoria; si se llena, las nuevas van directo al spool
+TAMANO_COLA = 10000
+
+# Entradas por inserción
+TAMANO_LOTE = 200
+
+# Espera máxima (segundos) antes de enviar un lote incompleto
+SEGUNDOS_LOTE = 2.0
+
+# Intervalo mínimo (segundos) entre reintentos del spool
+SEGUNDOS_REINTENTO = 30.0
+
+# Métricas de la bitácora (components.metricas); los indicadores se leen al exponer
+AUDITORIA_ENTRADAS = contador('auditoria_entradas_total', 'Entradas de auditoría registradas', ('tipo_accion',))
+AUDITORIA_LOTES_SEGUNDOS = histograma(
+    'auditoria_lote_segundos', 'Duración de la escritura de lotes de auditoría', ('resultado',)
+)
+indicador(
+    'auditoria_cola_entradas', 'Entradas de auditoría encoladas sin escribir',
+    lambda: _escritor._cola.qsize() if _escritor else 0
+)
+indicador(
+    'auditoria_spool_entradas', 'Entradas de auditoría en el spool local esperando reenvío',
+    lambda: _escritor.pendientes_spool() if _escritor else 0
+)
+
+class EscritorAuditoria:
+    """Cola acotada + hilo que inserta la bitácora por lotes."""
+
+    def __init__(
+        self,
+        ruta_spool: str,
+        tamano_cola: int = TAMANO_COLA,
+        tamano_lote: int = TAMANO_LOTE,
+        segundos_lote: float = SEGUNDOS_LOTE
+    ):
+        self.ruta_spool = ruta_spool
+        self.tamano_lote = tamano_lote
+        self.segundos_lote = segundos_lote
+        self._cola: queue.Queue = queue.Queue(maxsize=tamano_cola)
+        self._lock_spool = threading.Lock()
+        self._detener = threading.Event()
+        self._ultimo_reintento = 0.0
+        self._hilo = threading.Thread(target=self._trabajar, name='escritor-auditoria', daemon=True)
+        self._hilo.start()
+
+    def registrar(self, entrada: Dict[str, Any]):
+        """Encola una entrada sin bloquear; si la cola está llena va al spool."""
+        try:
+            self._cola.put_nowait(entrada)
+        except queue.Full:
+            self._guardar_spool([entrada])
+
+    def vaciar(self, timeout: float = 10.0) -> bool:
+        """
+        Espera a que se escriban (o se guarden en el spool) las entradas encoladas.
+
+        Returns:
+            bool indicando si la cola quedó vacía antes del timeout
+        """
+        limite = time.monotonic() + timeout
+        while self._cola.unfinished_tasks:
+            if time.monotonic() > limite or not self._hilo.is_alive():
+                return False
+            time.sleep(0.01)
+        return True
+
+    def detener(self, timeout: float = 10.0):
+        """Vacía la cola y detiene el hilo (se llama al terminar el proceso)."""
+        self._detener.set()
+        self._hilo.join(timeout)
+
+    def pendientes_spool(self) -> int:
+        """Cantidad de entradas guardadas en el spool esperando reenvío."""
+        with self._lock_spool:
+            if not os.path.exists(self.ruta_spool):
+                return 0
+            with open(self.ruta_spool, encoding='utf-8') as archivo:
+                return sum(1 for linea in archivo if linea.strip())
+
+    # --- Hilo de escritura ---
+
+    def _trabajar(self):
+        while True:
+            lote = self._tomar_lote()
+            if lote:
+                self._escribir(lote)
+                for _ in lote:
+                    self._cola.task_done()
+            elif self._detener.is_set():
+                return
+
+    def _tomar_lote(self) -> List[Dict[str, Any]]:
+        """Espera la primera entrada y junta las siguientes hasta completar el lote."""
+        try:
+            lote = [self._cola.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.segundos_lote
+        while len(lote) < self.tamano_lote:
+            espera = limite - time.monotonic()
+            try:
+                if espera > 0 and not self._detener.is_set():
+                    lote.append(self._cola.get(timeout=espera))
+                else:
+                    # Vencido el plazo se agrega solo lo que ya está en la cola
+                    lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _escribir(self, lote: List[Dict[str, Any]]):
+        with AUDITORIA_LOTES_SEGUNDOS.medir(resultado='ok') as medicion:
+            try:
+                obtener_cliente().table('auditoria_bitacora').insert(lote, returning='minimal').execute()
+            except Exception as e:
+                print(f"Error al escribir auditoría, se guarda en {self.ruta_spool}: {str(e)}")  # Para debugging
+                medicion['resultado'] = 'spool'
+                self._guardar_spool(lote)
+                return
+        self._reenviar_spool()
+
+    # --- Spool local ---
+
+    def _guardar_spool(self, entradas: List[Dict[str, Any]]):
+        with self._lock_spool:
+            with open(self.ruta_spool, 'a', encoding='utf-8') as archivo:
+                for entrada in entradas:
+                    archivo.write(json.dumps(entrada, default=str, ensure_ascii=False) + '\n')
+
+    def _reenviar_spool(self):
+        """Reenvía el spool por lotes; lo que no se pudo enviar queda en el archivo."""
+        if time.monotonic() - self._ultimo_reintento < SEGUNDOS_REINTENTO:
+            return
+        self._ultimo_reintento = time.monotonic()
+        with self._lock_spool:
+            if not os.path.exists(self.ruta_spool):
+                return
+            with open(self.ruta_spool, encoding='utf-8') as archivo:
+                entradas = [json.loads(linea) for linea in archivo if linea.strip()]
+            enviadas = 0
+            try:
+                for i in range(0, len(entradas), self.tamano_lote):
+                    obtener_cliente().table('auditoria_bitacora')\
+                        .insert(entradas[i:i + self.tamano_lote], returning='minimal')\
+                        .execute()
+                    enviadas = i + self.tamano_lote
+            except Exception as e:
+                print(f"Error al reenviar el spool de auditoría: {str(e)}")  # Para debugging
+            restantes = entradas[enviadas:]
+            if restantes:
+                with open(self.ruta_spool, 'w', encoding='utf-8') as archivo:
+                    for entrada in restantes:
+                        archivo.write(json.dumps(entrada, default=str, ensure_ascii=False) + '\n')
+            else:
+                os.remove(self.ruta_spool)
+
+# =====================================================
+# DIFERENCIAS DE LOS UPDATE
+# =====================================================
+
+def calcular_diferencias(
+    anteriores: Optional[Dict[str, Any]],
+    nuevos: Optional[Dict[str, Any]]
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Reduce las imágenes de un UPDATE a los campos que cambiaron.
+
+    Args:
+        anteriores: Fila (o campos) antes del cambio
+        nuevos: Fila (o campos) después del cambio
+
+    Returns:
+        Tuple con (anteriores, nuevos) limitados a los campos modificados y 'id'
+    """
+    if anteriores is None or nuevos is None:
+        return anteriores, nuevos
+    campos = [c for c, valor in nuevos.items() if c not in anteriores or anteriores[c] != valor]
+    id_fila = nuevos.get('id', anteriores.get('id'))
+    antes = {c: anteriores[c] for c in campos if c in anteriores}
+    despues = {c: nuevos[c] for c in campos}
+    if id_fila is not None:
+        antes['id'] = despues['id'] = id_fila
+    return antes, despues
+
+def aplicar_diferencias(imagen: Dict[str, Any], cambios: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Devuelve una copia de `imagen` con los campos de `cambios` aplicados."""
+    return {**imagen, **(cambios or {})}
+
+def _instante(valor: Any) -> pd.Timestamp:
+    """created_at de la tabla o del archivo como Timestamp comparable (UTC, sin zona)."""
+    instante = pd.Timestamp(valor)
+    return instante.tz_convert(None) if instante.tzinfo else instante
+
+def reconstruir_imagenes(registro: Dict[str, Any]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Rearma las filas completas antes y después de un UPDATE de la bitácora.
+
+    Parte del estado actual del registro (o de la fila guardada en su DELETE,
+    si fue eliminado) y deshace, del más nuevo al más viejo, los UPDATE
+    posteriores a la entrada en el orden de la bitácora (created_at, id).
+    Los cambios posteriores que ya pasaron al archivo Parquet también
+    cuentan.
+
+    Args:
+        registro: Entrada de la bitácora (id, created_at, tabla_afectada,
+            id_registro, datos_anteriores y datos_nuevos)
+
+    Returns:
+        Dict con 'antes' y 'despues', o None si no hay con qué reconstruir
+    """
+    tabla, id_registro = registro.get('tabla_afectada'), registro.get('id_registro')
+    if not tabla or id_registro is None:
+        return None
+    from components.archivo_auditoria import leer_cambios_registro
+
+    cliente = obtener_cliente()
+    orden = [('created_at', False), ('id', False)]
+    posteriores = cliente.table('auditoria_bitacora')\
+        .select('id, created_at, tipo_accion, datos_anteriores')\
+        .eq('tabla_afectada', tabla)\
+        .eq('id_registro', id_registro)\
+        .or_(filtro_keyset(orden, registro))\
+        .in_('tipo_accion', ['UPDATE', 'DELETE'])\
+        .order('created_at')\
+        .order('id')\
+        .execute().data or []
+
+    # Cambios posteriores ya archivados (un mes puede estar en ambos lugares
+    # entre el archivo y la eliminación de la partición)
+    entrada = (_instante(registro['created_at']), registro['id'])
+    vistos = {p['id'] for p in posteriores}
+    archivados = [
+        a for a in leer_cambios_registro(tabla, id_registro, entrada[0].to_pydatetime())
+        if (_instante(a['created_at']), a['id']) > entrada and a['id'] not in vistos
+    ]
+    if archivados:
+        posteriores = sorted(archivados + posteriores, key=lambda p: (_instante(p['created_at']), p['id']))
+
+    eliminacion = next((i for i, p in enumerate(posteriores) if p['tipo_accion'] == 'DELETE'), None)
+    if eliminacion is not None:
+        estado = dict(posteriores[eliminacion]['datos_anteriores'] or {})
+        posteriores = posteriores[:eliminacion]
+    else:
+        actual = cliente.table(tabla).select('*').eq('id', id_registro).execute().data
+        if not actual:
+            return None
+        estado = actual[0]
+
+    for posterior in reversed(posteriores):
+        estado = aplicar_diferencias(estado, posterior['datos_anteriores'])
+    # Fechas y otros tipos no JSON como texto, igual que en la bitácora
+    despues = json.loads(json.dumps(aplicar_diferencias(estado, registro.get('datos_nuevos')), default=str))
+    return {
+        'antes': aplicar_diferencias(despues, registro.get('datos_anteriores')),
+        'despues': despues
+    }
+
+# Escritor compartido por todas las sesiones del proceso
+_escritor: Optional[EscritorAuditoria] = None
+_lock_escritor = threading.Lock()
+
+def obtener_escritor() -> EscritorAuditoria:
+    """Devuelve el escritor del proceso, creándolo (y su hilo) la primera vez."""
+    global _escritor
+    if _escritor is None:
+        with _lock_escritor:
+            if _escritor is None:
+                _escritor = EscritorAuditoria(
+                    leer_configuracion('AUDITORIA_SPOOL', 'auditoria_pendiente.jsonl')
+                )
+                atexit.register(_escritor.detener)
+    return _escritor
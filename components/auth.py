@@ -17,6 +17,12 @@ import streamlit as st
 import bcrypt
 from datetime import datetime
 from components.database import supabase, registrar_auditoria
+from components.metricas import histograma
+
+# Duración de los intentos de inicio de sesión por resultado (components.metricas)
+AUTENTICACION_SEGUNDOS = histograma(
+    'autenticacion_segundos', 'Duración de los intentos de inicio de sesión', ('resultado',)
+)
 
 def hash_password(password: str) -> str:
     """Genera un hash seguro de la contraseña usando bcrypt."""
@@ -29,43 +35,47 @@ def verify_password(password: str, hashed_password: str) -> bool:
 
 def autenticar(email: str, password: str):
     """Autentica un usuario contra la base de datos."""
-    try:
-        # Buscar usuario por email
-        response = supabase.table('usuarios')\
-            .select('*')\
-            .eq('email', email)\
-            .eq('activo', True)\
-            .execute()
-        
-        if not response.data:
-            return None, "Usuario no encontrado"
-        
-        usuario = response.data[0]
-        
-        # Verificar contraseña
-        if not verify_password(password, usuario['password_hash']):
-            return None, "Contraseña incorrecta"
-        
-        # Actualizar último acceso
-        supabase.table('usuarios')\
-            .update({'ultimo_acceso': datetime.now().isoformat()})\
-            .eq('id', usuario['id'])\
-            .execute()
-        
-        # Registrar en auditoría
-        registrar_auditoria(
-            email,
-            'usuarios',
-            'LOGIN',
-            f'Inicio de sesión exitoso del usuario {email}',
-            None,
-            None
-        )
-        
-        return usuario, None
-        
-    except Exception as e:
-        return None, f"Error de autenticación: {str(e)}"
+    with AUTENTICACION_SEGUNDOS.medir(resultado='error') as medicion:
+        try:
+            # Buscar usuario por email
+            response = supabase.table('usuarios')\
+                .select('*')\
+                .eq('email', email)\
+                .eq('activo', True)\
+                .execute()
+            
+            if not response.data:
+                medicion['resultado'] = 'usuario_no_encontrado'
+                return None, "Usuario no encontrado"
+            
+            usuario = response.data[0]
+            
+            # Verificar contraseña
+            if not verify_password(password, usuario['password_hash']):
+                medicion['resultado'] = 'contrasena_incorrecta'
+                return None, "Contraseña incorrecta"
+            
+            # Actualizar último acceso
+            supabase.table('usuarios')\
+                .update({'ultimo_acceso': datetime.now().isoformat()})\
+                .eq('id', usuario['id'])\
+                .execute()
+            
+            # Registrar en auditoría
+            registrar_auditoria(
+                email,
+                'usuarios',
+                'LOGIN',
+                f'Inicio de sesión exitoso del usuario {email}',
+                None,
+                None
+            )
+            
+            medicion['resultado'] = 'ok'
+            return usuario, None
+            
+        except Exception as e:
+            return None, f"Error de autenticación: {str(e)}"
 
 def registrar_usuario(nombre: str, email: str, password: str, rol: str):
     """Registra un nuevo usuario en el sistema."""
@@ -0,0 +1,1448 @@
+"""
+Backend de datos local (SQLite) con la misma interfaz que el cliente de Supabase.
+
+Implementa el subconjunto de PostgREST que usa la aplicación (table/from_,
+select con recursos embebidos, filtros, or_, order, limit, range, single,
+insert/update/delete, conteos y rpc) sobre una base SQLite que sigue el
+esquema de script_supabase.txt, incluidos los triggers de auditoría, los
+timestamps y la regla de no solapamiento de reservas.
+
+Se selecciona con RESERVAS_BACKEND=local (ver components/database.py) y sirve
+para pruebas, benchmarks y despliegues de una sola sede sin red.
+"""
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+# =====================================================
+# ESQUEMA (traducción de script_supabase.txt a SQLite)
+# =====================================================
+# Diferencias con PostgreSQL:
+# - SERIAL -> INTEGER PRIMARY KEY AUTOINCREMENT, DECIMAL -> REAL, JSONB/INET -> TEXT
+# - chk_fecha_futura se omite: SQLite no admite CURRENT_DATE en un CHECK
+# - La expresión regular del email usa la función regexp registrada en Python
+
+AHORA = "(strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))"
+
+ESQUEMA = f"""
+CREATE TABLE IF NOT EXISTS tipos_cancha (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(50) NOT NULL UNIQUE,
+    descripcion TEXT,
+    precio_por_hora DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+    created_at TIMESTAMP DEFAULT {AHORA},
+    updated_at TIMESTAMP DEFAULT {AHORA}
+);
+
+CREATE TABLE IF NOT EXISTS canchas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    id_tipo INT NOT NULL REFERENCES tipos_cancha(id) ON DELETE RESTRICT,
+    ubicacion TEXT,
+    capacidad_maxima INT DEFAULT 20,
+    disponible BOOLEAN DEFAULT TRUE,
+    observaciones TEXT,
+    created_at TIMESTAMP DEFAULT {AHORA},
+    updated_at TIMESTAMP DEFAULT {AHORA},
+    CONSTRAINT chk_capacidad CHECK (capacidad_maxima > 0)
+);
+
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    apellido VARCHAR(100) NOT NULL,
+    telefono VARCHAR(20),
+    email VARCHAR(150) UNIQUE,
+    documento VARCHAR(20) UNIQUE,
+    fecha_nacimiento DATE,
+    activo BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT {AHORA},
+    updated_at TIMESTAMP DEFAULT {AHORA},
+    CONSTRAINT chk_email CHECK (email IS NULL OR email REGEXP '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{{2,}}$')
+);
+
+CREATE TABLE IF NOT EXISTS reservas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_cliente INT NOT NULL REFERENCES clientes(id) ON DELETE CASCADE,
+    id_cancha INT NOT NULL REFERENCES canchas(id) ON DELETE CASCADE,
+    fecha DATE NOT NULL,
+    hora_inicio TIME NOT NULL,
+    hora_fin TIME NOT NULL,
+    estado VARCHAR(20) DEFAULT 'confirmada' CHECK (estado IN ('pendiente', 'confirmada', 'cancelada', 'completada')),
+    monto_total DECIMAL(10,2) NOT NULL DEFAULT 0.00,
+    anticipo DECIMAL(10,2) DEFAULT 0.00,
+    observaciones TEXT,
+    created_at TIMESTAMP DEFAULT {AHORA},
+    updated_at TIMESTAMP DEFAULT {AHORA},
+    CONSTRAINT chk_horas CHECK (hora_inicio < hora_fin),
+    CONSTRAINT chk_montos CHECK (anticipo <= monto_total AND monto_total >= 0)
+);
+
+CREATE TABLE IF NOT EXISTS horarios_disponibles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_cancha INT NOT NULL REFERENCES canchas(id) ON DELETE CASCADE,
+    dia_semana INT NOT NULL CHECK (dia_semana BETWEEN 1 AND 7),
+    hora_inicio TIME NOT NULL,
+    hora_fin TIME NOT NULL,
+    activo BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT {AHORA},
+    CONSTRAINT chk_horas_disponibles CHECK (hora_inicio < hora_fin),
+    UNIQUE(id_cancha, dia_semana, hora_inicio, hora_fin)
+);
+
+CREATE TABLE IF NOT EXISTS pagos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_reserva INT NOT NULL REFERENCES reservas(id) ON DELETE CASCADE,
+    monto DECIMAL(10,2) NOT NULL,
+    metodo_pago VARCHAR(30) NOT NULL CHECK (metodo_pago IN ('efectivo', 'tarjeta', 'transferencia', 'otro')),
+    fecha_pago TIMESTAMP DEFAULT {AHORA},
+    referencia VARCHAR(100),
+    observaciones TEXT,
+    CONSTRAINT chk_monto_positivo CHECK (monto > 0)
+);
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    email VARCHAR(150) UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    rol VARCHAR(30) NOT NULL CHECK (rol IN ('admin', 'operador_reservas', 'consultor')),
+    activo BOOLEAN DEFAULT TRUE,
+    ultimo_acceso TIMESTAMP,
+    created_at TIMESTAMP DEFAULT {AHORA},
+    updated_at TIMESTAMP DEFAULT {AHORA}
+);
+
+CREATE TABLE IF NOT EXISTS auditoria_bitacora (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre_usuario VARCHAR(100) NOT NULL,
+    hora_inicio_ingreso TIMESTAMP,
+    hora_salida TIMESTAMP,
+    navegador TEXT,
+    ip_acceso INET,
+    nombre_maquina VARCHAR(100),
+    tabla_afectada VARCHAR(50),
+    id_registro INTEGER,
+    tipo_accion VARCHAR(20) CHECK (tipo_accion IN ('INSERT', 'UPDATE', 'DELETE', 'SELECT', 'LOGIN', 'LOGOUT')),
+    descripcion_detallada TEXT,
+    datos_anteriores JSONB,
+    datos_nuevos JSONB,
+    created_at TIMESTAMP DEFAULT {AHORA}
+);
+
+-- Fuente de auditoría por tabla (igual que en PostgreSQL)
+CREATE TABLE IF NOT EXISTS auditoria_fuentes (
+    tabla TEXT PRIMARY KEY,
+    fuente TEXT NOT NULL CHECK (fuente IN ('trigger', 'aplicacion'))
+);
+
+INSERT OR IGNORE INTO auditoria_fuentes (tabla, fuente) VALUES
+('clientes', 'trigger'),
+('reservas', 'trigger');
+
+CREATE INDEX IF NOT EXISTS idx_reservas_fecha ON reservas(fecha, hora_inicio, id);
+CREATE INDEX IF NOT EXISTS idx_reservas_cliente ON reservas(id_cliente, fecha);
+CREATE INDEX IF NOT EXISTS idx_reservas_cancha ON reservas(id_cancha, fecha, estado);
+CREATE INDEX IF NOT EXISTS idx_reservas_estado ON reservas(estado);
+CREATE INDEX IF NOT EXISTS idx_clientes_email ON clientes(email);
+CREATE INDEX IF NOT EXISTS idx_clientes_documento ON clientes(documento);
+CREATE INDEX IF NOT EXISTS idx_auditoria_usuario ON auditoria_bitacora(nombre_usuario, created_at);
+CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON auditoria_bitacora(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_auditoria_tabla ON auditoria_bitacora(tabla_afectada);
+
+-- Resúmenes diarios de reservas para los reportes (los mantienen los
+-- triggers tr_resumen_reservas_*, creados en _crear_esquema)
+CREATE TABLE IF NOT EXISTS resumen_diario_canchas (
+    fecha DATE NOT NULL,
+    id_cancha INT NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    reservas INT NOT NULL DEFAULT 0,
+    horas DECIMAL(12,2) NOT NULL DEFAULT 0,
+    ingresos DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_cancha, estado)
+);
+
+CREATE TABLE IF NOT EXISTS resumen_diario_clientes (
+    fecha DATE NOT NULL,
+    id_cliente INT NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    reservas INT NOT NULL DEFAULT 0,
+    horas DECIMAL(12,2) NOT NULL DEFAULT 0,
+    ingresos DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, id_cliente, estado)
+);
+
+-- Regla de no solapamiento (equivale a excl_reservas_solapamiento; SQLite no
+-- tiene restricciones de exclusión, los triggers buscan en idx_reservas_cancha)
+CREATE TRIGGER IF NOT EXISTS tr_reservas_sin_solapamiento_insert
+BEFORE INSERT ON reservas
+WHEN COALESCE(NEW.estado, 'confirmada') <> 'cancelada'
+BEGIN
+    SELECT RAISE(ABORT, 'Ya existe una reserva en ese horario')
+    WHERE EXISTS (
+        SELECT 1 FROM reservas
+        WHERE id_cancha = NEW.id_cancha
+        AND fecha = NEW.fecha
+        AND estado <> 'cancelada'
+        AND hora_inicio < NEW.hora_fin
+        AND hora_fin > NEW.hora_inicio
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_reservas_sin_solapamiento_update
+BEFORE UPDATE OF id_cancha, fecha, hora_inicio, hora_fin, estado ON reservas
+WHEN NEW.estado <> 'cancelada'
+BEGIN
+    SELECT RAISE(ABORT, 'Ya existe una reserva en ese horario')
+    WHERE EXISTS (
+        SELECT 1 FROM reservas
+        WHERE id_cancha = NEW.id_cancha
+        AND fecha = NEW.fecha
+        AND id <> NEW.id
+        AND estado <> 'cancelada'
+        AND hora_inicio < NEW.hora_fin
+        AND hora_fin > NEW.hora_inicio
+    );
+END;
+"""
+
+# Tablas con updated_at (tr_update_timestamp_* en PostgreSQL). SQLite no puede
+# modificar NEW en un trigger BEFORE, así que el valor se asigna en cada UPDATE
+TABLAS_CON_TIMESTAMP = ['tipos_cancha', 'canchas', 'clientes', 'reservas', 'usuarios']
+
+# Descripciones de los triggers de auditoría (mismos textos que en PostgreSQL)
+DESCRIPCIONES_AUDITORIA = {
+    'clientes': {
+        'INSERT': "printf('Cliente creado: %s %s (ID: %s)', NEW.nombre, NEW.apellido, NEW.id)",
+        'UPDATE': "printf('Cliente actualizado: %s %s (ID: %s)', NEW.nombre, NEW.apellido, NEW.id)",
+        'DELETE': "printf('Cliente eliminado: %s %s (ID: %s)', OLD.nombre, OLD.apellido, OLD.id)",
+    },
+    'reservas': {
+        'INSERT': "printf('Reserva creada: ID %s para cliente %s en cancha %s fecha %s', NEW.id, NEW.id_cliente, NEW.id_cancha, NEW.fecha)",
+        'UPDATE': "printf('Reserva actualizada: ID %s - Estado: %s -> %s', NEW.id, OLD.estado, NEW.estado)",
+        'DELETE': "printf('Reserva eliminada: ID %s del cliente %s', OLD.id, OLD.id_cliente)",
+    },
+}
+
+# Resúmenes diarios y la columna de reservas que agrupan (acumular_resumen_reserva)
+RESUMENES_DIARIOS = {
+    'resumen_diario_canchas': 'id_cancha',
+    'resumen_diario_clientes': 'id_cliente',
+}
+
+# Horas de una reserva (fila = NEW/OLD o una tabla) en SQLite
+HORAS_RESERVA = (
+    "((strftime('%s', '2000-01-01 ' || {fila}.hora_fin) - "
+    "strftime('%s', '2000-01-01 ' || {fila}.hora_inicio)) / 3600.0)"
+)
+
+# Códigos de error de PostgreSQL que se reproducen
+ERRORES_SQLITE = [
+    ('UNIQUE constraint failed', '23505'),
+    ('FOREIGN KEY constraint failed', '23503'),
+    ('NOT NULL constraint failed', '23502'),
+    ('CHECK constraint failed', '23514'),
+    ('Ya existe una reserva en ese horario', '23P01'),
+]
+
+class ErrorBackendLocal(Exception):
+    """Error del backend local con el código SQLSTATE equivalente de PostgreSQL."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+class RespuestaLocal:
+    """Respuesta con la misma forma que APIResponse de postgrest (data, count)."""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        return f"RespuestaLocal(data={self.data!r}, count={self.count!r})"
+
+# =====================================================
+# PARSERS DE LA SINTAXIS DE POSTGREST
+# =====================================================
+
+def _dividir(texto: str, separador: str = ',') -> List[str]:
+    """Divide por el separador respetando paréntesis y comillas dobles."""
+    partes, actual, nivel, comillas, escape = [], [], 0, False, False
+    for c in texto:
+        if escape:
+            actual.append(c)
+            escape = False
+            continue
+        if c == '\\' and comillas:
+            actual.append(c)
+            escape = True
+            continue
+        if c == '"':
+            comillas = not comillas
+        elif not comillas and c == '(':
+            nivel += 1
+        elif not comillas and c == ')':
+            nivel -= 1
+        elif not comillas and nivel == 0 and c == separador:
+            partes.append(''.join(actual))
+            actual = []
+            continue
+        actual.append(c)
+    if actual:
+        partes.append(''.join(actual))
+    return partes
+
+def _sin_comillas(valor: str) -> str:
+    """Quita las comillas dobles de un valor de filtro y resuelve los escapes."""
+    if len(valor) >= 2 and valor[0] == '"' and valor[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', valor[1:-1])
+    return valor
+
+def parsear_seleccion(texto: str) -> List[Dict[str, Any]]:
+    """
+    Convierte la cadena de select de PostgREST en una lista de nodos.
+
+    Nodos: {'tipo': '*'}, {'tipo': 'col', 'nombre', 'alias'} y
+    {'tipo': 'rel', 'alias', 'objetivo', 'pista', 'inner', 'hijos'}.
+    """
+    texto = ''.join(c for c in texto if not c.isspace())
+    nodos = []
+    for parte in _dividir(texto):
+        if not parte:
+            continue
+        if parte == '*':
+            nodos.append({'tipo': '*'})
+            continue
+        if '(' in parte:
+            cabeza, cuerpo = parte[:parte.index('(')], parte[parte.index('(') + 1:-1]
+            alias = None
+            if ':' in cabeza:
+                alias, cabeza = cabeza.split(':', 1)
+            objetivo, *modificadores = cabeza.split('!')
+            pista = next((m for m in modificadores if m not in ('inner', 'left')), None)
+            nodos.append({
+                'tipo': 'rel',
+                'alias': alias or objetivo,
+                'objetivo': objetivo,
+                'pista': pista,
+                'inner': 'inner' in modificadores,
+                'hijos': parsear_seleccion(cuerpo)
+            })
+        else:
+            alias = None
+            if ':' in parte and '::' not in parte:
+                alias, parte = parte.split(':', 1)
+            nombre = parte.split('::')[0]
+            nodos.append({'tipo': 'col', 'nombre': nombre, 'alias': alias or nombre})
+    return nodos
+
+def parsear_logica(texto: str) -> List[Tuple]:
+    """
+    Convierte el contenido de un filtro or=(...)/and=(...) en nodos.
+
+    Nodos: ('cond', columna, operador, valor, negado) y
+    ('and' | 'or', [nodos], negado).
+    """
+    nodos = []
+    for parte in _dividir(texto):
+        negado = False
+        if parte.startswith('not.') and (parte[4:].startswith('and(') or parte[4:].startswith('or(')):
+            negado, parte = True, parte[4:]
+        if parte.startswith('and(') or parte.startswith('or('):
+            operador = parte[:parte.index('(')]
+            nodos.append((operador, parsear_logica(parte[len(operador) + 1:-1]), negado))
+            continue
+        columna, resto = parte.split('.', 1)
+        operador, valor = resto.split('.', 1)
+        if operador == 'not':
+            negado = True
+            operador, valor = valor.split('.', 1)
+        nodos.append(('cond', columna, operador, valor, negado))
+    return nodos
+
+# =====================================================
+# CONSTRUCTOR DE CONSULTAS
+# =====================================================
+
+class ConsultaLocal:
+    """Equivalente local de los request builders de postgrest-py."""
+
+    def __init__(self, cliente: 'ClienteLocal', tabla: str):
+        self._cliente = cliente
+        self._tabla = tabla
+        self._operacion = 'select'
+        self._seleccion = parsear_seleccion('*')
+        self._conteo = None
+        self._datos = None
+        self._filtros: List[Tuple[Optional[str], Tuple]] = []
+        self._orden: List[Tuple[str, bool]] = []
+        self._limite = None
+        self._desde = 0
+        self._unico = None
+        self.negate_next = False
+        self.headers: Dict[str, str] = {}
+
+    # --- Operaciones ---
+
+    def select(self, *columnas: str, count: Optional[str] = None, head: bool = False):
+        self._seleccion = parsear_seleccion(','.join(columnas) or '*')
+        self._conteo = count
+        return self
+
+    def insert(self, datos, count: Optional[str] = None, returning: str = 'representation', upsert: bool = False, **_):
+        self._operacion = 'insert'
+        self._datos = datos if isinstance(datos, list) else [datos]
+        self._conteo = count
+        self._retorno = returning
+        return self
+
+    def update(self, datos: Dict[str, Any], count: Optional[str] = None, **_):
+        self._operacion = 'update'
+        self._datos = datos
+        self._conteo = count
+        return self
+
+    def delete(self, count: Optional[str] = None, **_):
+        self._operacion = 'delete'
+        self._conteo = count
+        return self
+
+    # --- Filtros ---
+
+    @property
+    def not_(self):
+        """Niega el siguiente filtro (igual que postgrest-py)."""
+        self.negate_next = True
+        return self
+
+    def _agregar(self, columna: str, operador: str, valor: Any):
+        negado, self.negate_next = self.negate_next, False
+        ruta = None
+        if '.' in columna:
+            ruta, columna = columna.rsplit('.', 1)
+        self._filtros.append((ruta, ('cond', columna, operador, valor, negado)))
+        return self
+
+    def filter(self, columna: str, operador: str, criterio: Any):
+        if operador.startswith('not.'):
+            self.negate_next = True
+            operador = operador[4:]
+        if operador == 'in' and isinstance(criterio, str):
+            criterio = [_sin_comillas(v) for v in _dividir(criterio.strip('()'))]
+        return self._agregar(columna, operador, criterio)
+
+    def eq(self, columna, valor): return self._agregar(columna, 'eq', valor)
+    def neq(self, columna, valor): return self._agregar(columna, 'neq', valor)
+    def gt(self, columna, valor): return self._agregar(columna, 'gt', valor)
+    def gte(self, columna, valor): return self._agregar(columna, 'gte', valor)
+    def lt(self, columna, valor): return self._agregar(columna, 'lt', valor)
+    def lte(self, columna, valor): return self._agregar(columna, 'lte', valor)
+    def like(self, columna, patron): return self._agregar(columna, 'like', patron)
+    def ilike(self, columna, patron): return self._agregar(columna, 'ilike', patron)
+    def is_(self, columna, valor): return self._agregar(columna, 'is', valor)
+    def in_(self, columna, valores): return self._agregar(columna, 'in', list(valores))
+
+    def or_(self, filtros: str, reference_table: Optional[str] = None):
+        negado, self.negate_next = self.negate_next, False
+        self._filtros.append((reference_table, ('or', parsear_logica(filtros), negado)))
+        return self
+
+    # --- Modificadores ---
+
+    def order(self, columna: str, *, desc: bool = False, nullsfirst: bool = False, foreign_table: Optional[str] = None):
+        self._orden.append((columna, desc))
+        return self
+
+    def limit(self, cantidad: int, *, foreign_table: Optional[str] = None):
+        self._limite = cantidad
+        return self
+
+    def range(self, inicio: int, fin: int, foreign_table: Optional[str] = None):
+        self._desde = inicio
+        self._limite = fin - inicio + 1
+        return self
+
+    def single(self):
+        self._unico = 'single'
+        return self
+
+    def maybe_single(self):
+        self._unico = 'maybe'
+        return self
+
+    # --- Ejecución ---
+
+    def execute(self) -> RespuestaLocal:
+        return self._cliente._ejecutar(self)
+
+class LlamadaRpcLocal:
+    """Llamada pendiente a una función del backend local (equivale a rpc())."""
+
+    def __init__(self, cliente: 'ClienteLocal', nombre: str, parametros: Dict[str, Any]):
+        self._cliente = cliente
+        self._nombre = nombre
+        self._parametros = parametros or {}
+        self.headers: Dict[str, str] = {}
+
+    def execute(self) -> RespuestaLocal:
+        return self._cliente._ejecutar_rpc(self)
+
+# =====================================================
+# FUNCIONES RPC (equivalentes de las funciones plpgsql)
+# =====================================================
+
+# nombre -> función(conexion, parametros) que devuelve el valor de data
+FUNCIONES_RPC: Dict[str, Callable[[sqlite3.Connection, Dict[str, Any]], Any]] = {}
+
+def funcion_rpc(nombre: str, devuelve: Optional[str] = None):
+    """
+    Decorador que registra una función RPC del backend local.
+    
+    Args:
+        nombre: Nombre de la función en PostgreSQL
+        devuelve: Tabla de las filas devueltas (RETURNS SETOF tabla); la función
+            devuelve entonces la lista de ids y el cliente lee las filas
+    """
+    def registrar(funcion):
+        funcion.devuelve = devuelve
+        FUNCIONES_RPC[nombre] = funcion
+        return funcion
+    return registrar
+
+@funcion_rpc('registrar_auditoria')
+def _rpc_registrar_auditoria(con: sqlite3.Connection, p: Dict[str, Any]):
+    con.execute(
+        """INSERT INTO auditoria_bitacora (
+               nombre_usuario, tabla_afectada, id_registro, tipo_accion,
+               descripcion_detallada, datos_anteriores, datos_nuevos
+           ) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (
+            p['p_nombre_usuario'], p['p_tabla_afectada'],
+            (p.get('p_datos_nuevos') or p.get('p_datos_anteriores') or {}).get('id'),
+            p['p_tipo_accion'], p['p_descripcion'],
+            _a_json(p.get('p_datos_anteriores')), _a_json(p.get('p_datos_nuevos'))
+        )
+    )
+    return None
+
+@funcion_rpc('crear_reserva', devuelve='reservas')
+def _rpc_crear_reserva(con: sqlite3.Connection, p: Dict[str, Any]):
+    if p.get('p_nombre_usuario'):
+        con.execute('SELECT fijar_usuario(?)', (p['p_nombre_usuario'],))
+
+    if not con.execute(
+        "SELECT 1 FROM canchas WHERE id = ? AND disponible", (p['p_id_cancha'],)
+    ).fetchone():
+        raise ErrorBackendLocal('La cancha no está disponible', 'P0001')
+
+    hora_inicio, hora_fin = _hora(p['p_hora_inicio']), _hora(p['p_hora_fin'])
+    precio_hora = con.execute(
+        """SELECT tc.precio_por_hora FROM tipos_cancha tc
+           JOIN canchas c ON c.id_tipo = tc.id WHERE c.id = ?""",
+        (p['p_id_cancha'],)
+    ).fetchone()[0]
+    horas = (_minutos(hora_fin) - _minutos(hora_inicio)) / 60
+
+    cursor = con.execute(
+        """INSERT INTO reservas (id_cliente, id_cancha, fecha, hora_inicio, hora_fin, estado, monto_total, observaciones)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            p['p_id_cliente'], p['p_id_cancha'], _fecha(p['p_fecha']), hora_inicio, hora_fin,
+            p.get('p_estado') or 'confirmada', round(precio_hora * horas, 2), p.get('p_observaciones')
+        )
+    )
+    return [cursor.lastrowid]
+
+@funcion_rpc('crear_reservas_serie', devuelve='reservas')
+def _rpc_crear_reservas_serie(con: sqlite3.Connection, p: Dict[str, Any]):
+    if p.get('p_nombre_usuario'):
+        con.execute('SELECT fijar_usuario(?)', (p['p_nombre_usuario'],))
+
+    if not con.execute(
+        "SELECT 1 FROM canchas WHERE id = ? AND disponible", (p['p_id_cancha'],)
+    ).fetchone():
+        raise ErrorBackendLocal('La cancha no está disponible', 'P0001')
+
+    hora_inicio, hora_fin = _hora(p['p_hora_inicio']), _hora(p['p_hora_fin'])
+    precio_hora = con.execute(
+        """SELECT tc.precio_por_hora FROM tipos_cancha tc
+           JOIN canchas c ON c.id_tipo = tc.id WHERE c.id = ?""",
+        (p['p_id_cancha'],)
+    ).fetchone()[0]
+    monto = round(precio_hora * (_minutos(hora_fin) - _minutos(hora_inicio)) / 60, 2)
+    fechas = sorted(_fecha(f) for f in p['p_fechas'])
+    estado = p.get('p_estado') or 'confirmada'
+
+    con.execute('SELECT omitir_auditoria(1)')
+    ids = []
+    for fecha in fechas:
+        cursor = con.execute(
+            """INSERT INTO reservas (id_cliente, id_cancha, fecha, hora_inicio, hora_fin, estado, monto_total, observaciones)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (p['p_id_cliente'], p['p_id_cancha'], fecha, hora_inicio, hora_fin, estado, monto, p.get('p_observaciones'))
+        )
+        ids.append(cursor.lastrowid)
+    con.execute('SELECT omitir_auditoria(0)')
+
+    # Con fuente 'aplicacion' la serie la audita crear_reservas_serie en Python
+    fuente = con.execute("SELECT fuente FROM auditoria_fuentes WHERE tabla = 'reservas'").fetchone()
+    if not fuente or fuente[0] != 'trigger':
+        return ids
+
+    _rpc_registrar_auditoria(con, {
+        'p_nombre_usuario': con.execute('SELECT usuario_actual()').fetchone()[0],
+        'p_tabla_afectada': 'reservas',
+        'p_tipo_accion': 'INSERT',
+        'p_descripcion': (
+            f"Serie de {len(ids)} reservas creada para cliente {p['p_id_cliente']} en cancha {p['p_id_cancha']} "
+            f"({fechas[0]} a {fechas[-1]}, {hora_inicio} - {hora_fin})"
+        ),
+        'p_datos_nuevos': {
+            'ids': ids,
+            'fechas': fechas,
+            'id_cliente': p['p_id_cliente'],
+            'id_cancha': p['p_id_cancha'],
+            'hora_inicio': hora_inicio,
+            'hora_fin': hora_fin,
+            'estado': estado,
+            'monto_por_reserva': monto
+        }
+    })
+    return ids
+
+# Particiones de auditoría: SQLite no tiene particiones, la tabla es una sola
+# y "eliminar un mes" borra sus filas
+@funcion_rpc('crear_particiones_auditoria')
+def _rpc_crear_particiones_auditoria(con: sqlite3.Connection, p: Dict[str, Any]):
+    return None
+
+@funcion_rpc('meses_auditoria_anteriores')
+def _rpc_meses_auditoria_anteriores(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """SELECT DISTINCT substr(created_at, 1, 7) || '-01' FROM auditoria_bitacora
+           WHERE created_at < ? ORDER BY 1""",
+        (_fecha(p['p_antes']),)
+    ).fetchall()
+    return [{'mes': f[0]} for f in filas]
+
+@funcion_rpc('eliminar_mes_auditoria')
+def _rpc_eliminar_mes_auditoria(con: sqlite3.Connection, p: Dict[str, Any]):
+    mes = _fecha(p['p_mes'])[:7]
+    con.execute("DELETE FROM auditoria_bitacora WHERE substr(created_at, 1, 7) = ?", (mes,))
+    return None
+
+@funcion_rpc('reconstruir_resumenes')
+def _rpc_reconstruir_resumenes(con: sqlite3.Connection, p: Dict[str, Any]):
+    horas = HORAS_RESERVA.format(fila='reservas')
+    for resumen, columna in RESUMENES_DIARIOS.items():
+        con.execute(f'DELETE FROM {resumen}')
+        con.execute(
+            f"""INSERT INTO {resumen} (fecha, {columna}, estado, reservas, horas, ingresos)
+                SELECT fecha, {columna}, estado, COUNT(*), SUM({horas}), SUM(monto_total)
+                FROM reservas
+                GROUP BY fecha, {columna}, estado"""
+        )
+    return None
+
+def _rango(p: Dict[str, Any]) -> Dict[str, Any]:
+    return {'inicio': p.get('p_fecha_inicio'), 'fin': p.get('p_fecha_fin')}
+
+@funcion_rpc('estadisticas_uso_canchas')
+def _rpc_estadisticas_uso_canchas(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """SELECT
+               ca.id,
+               ca.nombre AS nombre_cancha,
+               tc.nombre AS tipo_cancha,
+               COALESCE(SUM(r.reservas), 0) AS total_reservas,
+               COALESCE(ROUND(SUM(r.horas), 2), 0) AS horas_reservadas,
+               COALESCE(SUM(r.ingresos), 0) AS ingresos_totales
+           FROM canchas ca
+           JOIN tipos_cancha tc ON ca.id_tipo = tc.id
+           LEFT JOIN resumen_diario_canchas r ON ca.id = r.id_cancha
+               AND r.estado <> 'cancelada'
+               AND (:inicio IS NULL OR r.fecha >= :inicio)
+               AND (:fin IS NULL OR r.fecha <= :fin)
+           GROUP BY ca.id, ca.nombre, tc.nombre
+           ORDER BY ca.id""",
+        _rango(p)
+    ).fetchall()
+    return [dict(f) for f in filas]
+
+@funcion_rpc('reporte_ingresos_diarios')
+def _rpc_reporte_ingresos_diarios(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """SELECT fecha, SUM(reservas) AS total_reservas, SUM(ingresos) AS ingresos_totales
+           FROM resumen_diario_canchas
+           WHERE estado <> 'cancelada'
+           AND reservas > 0
+           AND (:inicio IS NULL OR fecha >= :inicio)
+           AND (:fin IS NULL OR fecha <= :fin)
+           GROUP BY fecha
+           ORDER BY fecha""",
+        _rango(p)
+    ).fetchall()
+    return [dict(f) for f in filas]
+
+@funcion_rpc('reporte_reservas_estado')
+def _rpc_reporte_reservas_estado(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """SELECT estado, SUM(reservas) AS total_reservas, SUM(ingresos) AS ingresos_totales
+           FROM resumen_diario_canchas
+           WHERE reservas > 0
+           AND (:inicio IS NULL OR fecha >= :inicio)
+           AND (:fin IS NULL OR fecha <= :fin)
+           GROUP BY estado
+           ORDER BY estado""",
+        _rango(p)
+    ).fetchall()
+    return [dict(f) for f in filas]
+
+@funcion_rpc('reporte_top_clientes')
+def _rpc_reporte_top_clientes(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """WITH por_cliente AS (
+               SELECT id_cliente, SUM(reservas) AS reservas, SUM(ingresos) AS ingresos
+               FROM resumen_diario_clientes
+               WHERE estado <> 'cancelada'
+               AND (:inicio IS NULL OR fecha >= :inicio)
+               AND (:fin IS NULL OR fecha <= :fin)
+               GROUP BY id_cliente
+               HAVING SUM(reservas) > 0
+           ), ranking AS (
+               SELECT
+                   id_cliente, reservas, ingresos,
+                   ROW_NUMBER() OVER (ORDER BY reservas DESC, id_cliente) AS posicion_reservas,
+                   ROW_NUMBER() OVER (ORDER BY ingresos DESC, id_cliente) AS posicion_gasto
+               FROM por_cliente
+           )
+           SELECT
+               c.id,
+               c.nombre || ' ' || c.apellido AS nombre_cliente,
+               rk.reservas AS total_reservas,
+               rk.ingresos AS gasto_total,
+               rk.posicion_reservas,
+               rk.posicion_gasto
+           FROM ranking rk
+           JOIN clientes c ON c.id = rk.id_cliente
+           WHERE rk.posicion_reservas <= :limite OR rk.posicion_gasto <= :limite
+           ORDER BY rk.posicion_reservas""",
+        {**_rango(p), 'limite': p.get('p_limite', 10)}
+    ).fetchall()
+    return [dict(f) for f in filas]
+
+@funcion_rpc('reporte_fidelizacion_clientes')
+def _rpc_reporte_fidelizacion_clientes(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """SELECT
+               COUNT(*) AS clientes_unicos,
+               COUNT(*) FILTER (WHERE reservas > :frecuente) AS clientes_frecuentes
+           FROM (
+               SELECT SUM(reservas) AS reservas
+               FROM resumen_diario_clientes
+               WHERE estado <> 'cancelada'
+               AND (:inicio IS NULL OR fecha >= :inicio)
+               AND (:fin IS NULL OR fecha <= :fin)
+               GROUP BY id_cliente
+               HAVING SUM(reservas) > 0
+           )""",
+        {**_rango(p), 'frecuente': p.get('p_reservas_frecuente', 3)}
+    ).fetchall()
+    return [dict(f) for f in filas]
+
+@funcion_rpc('reporte_ocupacion_franjas')
+def _rpc_reporte_ocupacion_franjas(con: sqlite3.Connection, p: Dict[str, Any]):
+    # strftime('%w') empieza en domingo = 0; dia_semana va de 1 (lunes) a 7
+    filas = con.execute(
+        """SELECT id_cancha, json_group_array(json_array(dia_semana, hora_inicio, hora_fin, reservas)) AS franjas
+           FROM (
+               SELECT id_cancha, (CAST(strftime('%w', fecha) AS INT) + 6) % 7 + 1 AS dia_semana,
+                      hora_inicio, hora_fin, COUNT(*) AS reservas
+               FROM reservas
+               WHERE estado <> 'cancelada'
+               AND (:inicio IS NULL OR fecha >= :inicio)
+               AND (:fin IS NULL OR fecha <= :fin)
+               GROUP BY 1, 2, 3, 4
+           )
+           GROUP BY id_cancha
+           ORDER BY id_cancha""",
+        _rango(p)
+    ).fetchall()
+    return [{'id_cancha': f['id_cancha'], 'franjas': json.loads(f['franjas'])} for f in filas]
+
+@funcion_rpc('indice_disponibilidad')
+def _rpc_indice_disponibilidad(con: sqlite3.Connection, p: Dict[str, Any]):
+    filas = con.execute(
+        """SELECT
+               ca.id AS id_cancha,
+               (SELECT json_group_array(json_array(h.dia_semana, h.hora_inicio, h.hora_fin))
+                FROM horarios_disponibles h
+                WHERE h.id_cancha = ca.id AND h.activo) AS horarios,
+               (SELECT json_group_array(json_array(r.fecha, r.hora_inicio, r.hora_fin, r.id))
+                FROM reservas r
+                WHERE r.id_cancha = ca.id
+                AND r.fecha >= :inicio AND r.fecha <= :fin
+                AND r.estado <> 'cancelada') AS reservas
+           FROM canchas ca
+           ORDER BY ca.id""",
+        _rango(p)
+    ).fetchall()
+    return [
+        {'id_cancha': f['id_cancha'], 'horarios': json.loads(f['horarios']), 'reservas': json.loads(f['reservas'])}
+        for f in filas
+    ]
+
+# =====================================================
+# CLIENTE LOCAL
+# =====================================================
+
+def _a_json(valor: Any) -> Optional[str]:
+    return None if valor is None else json.dumps(valor, default=str, ensure_ascii=False)
+
+def _hora(valor: Any) -> str:
+    """Normaliza una hora a 'HH:MM:SS' (formato de TIME en PostgREST)."""
+    if isinstance(valor, time):
+        return valor.strftime('%H:%M:%S')
+    texto = str(valor)
+    return texto + ':00' if len(texto) == 5 else texto[:8]
+
+def _fecha(valor: Any) -> str:
+    return valor.isoformat() if isinstance(valor, date) else str(valor)[:10]
+
+def _minutos(hora: str) -> int:
+    return int(hora[:2]) * 60 + int(hora[3:5])
+
+def _regexp(patron: str, valor: Optional[str]) -> bool:
+    return valor is not None and re.search(patron, valor, re.IGNORECASE) is not None
+
+def _minusculas(valor: Any) -> Any:
+    return valor.lower() if isinstance(valor, str) else valor
+
+def _json_diferencias(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    """Equivale a jsonb_diferencias(): campos de `a` que cambian respecto de `b`, más 'id'."""
+    if a is None:
+        return None
+    fila_a, fila_b = json.loads(a), json.loads(b or '{}')
+    return _a_json({
+        campo: valor for campo, valor in fila_a.items()
+        if campo == 'id' or campo not in fila_b or fila_b[campo] != valor
+    })
+
+class ClienteLocal:
+    """
+    Cliente de datos sobre SQLite con la interfaz del cliente de Supabase.
+
+    Args:
+        ruta: Archivo de la base SQLite (':memory:' para una base en memoria)
+        datos_prueba: Si la base está vacía, cargar los datos de prueba del script
+        filas_maximas: Filas máximas por respuesta de select o rpc, como
+            max-rows de PostgREST (el resto se descarta sin error); None sin tope
+    """
+
+    def __init__(self, ruta: str = ':memory:', datos_prueba: bool = True, filas_maximas: Optional[int] = None):
+        self.ruta = ruta
+        self.filas_maximas = filas_maximas
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._con = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._con.row_factory = sqlite3.Row
+        self._con.create_function('regexp', 2, _regexp, deterministic=True)
+        self._con.create_function('minusculas', 1, _minusculas, deterministic=True)
+        self._con.create_function('json_diferencias', 2, _json_diferencias, deterministic=True)
+        self._con.create_function('usuario_actual', 0, self._usuario_actual)
+        self._con.create_function('fijar_usuario', 1, self._fijar_usuario)
+        self._con.create_function('auditoria_omitida', 0, self._auditoria_omitida)
+        self._con.create_function('omitir_auditoria', 1, self._omitir_auditoria)
+        self._con.execute('PRAGMA foreign_keys = ON')
+        self._con.execute('PRAGMA case_sensitive_like = ON')
+        if ruta != ':memory:':
+            self._con.execute('PRAGMA journal_mode = WAL')
+        self._crear_esquema()
+        self._columnas = {t: self._leer_columnas(t) for t in self._tablas()}
+        self._fks = {t: self._leer_claves_foraneas(t) for t in self._tablas()}
+        if datos_prueba and not self._con.execute('SELECT 1 FROM tipos_cancha LIMIT 1').fetchone():
+            self.cargar_datos_prueba()
+
+    # --- Interfaz del cliente de Supabase ---
+
+    def table(self, tabla: str) -> ConsultaLocal:
+        if tabla not in self._columnas:
+            raise ErrorBackendLocal(f'relation "{tabla}" does not exist', '42P01')
+        return ConsultaLocal(self, tabla)
+
+    def from_(self, tabla: str) -> ConsultaLocal:
+        return self.table(tabla)
+
+    def rpc(self, nombre: str, parametros: Optional[Dict[str, Any]] = None) -> LlamadaRpcLocal:
+        return LlamadaRpcLocal(self, nombre, parametros)
+
+    # --- Esquema ---
+
+    def _crear_esquema(self):
+        self._con.executescript(ESQUEMA)
+        # Bases creadas antes de guardar el id del registro auditado
+        if 'id_registro' not in [c for c, _ in self._leer_columnas('auditoria_bitacora')]:
+            self._con.execute('ALTER TABLE auditoria_bitacora ADD COLUMN id_registro INTEGER')
+        self._con.execute(
+            'CREATE INDEX IF NOT EXISTS idx_auditoria_registro ON auditoria_bitacora(tabla_afectada, id_registro, id)'
+        )
+        for tabla, descripciones in DESCRIPCIONES_AUDITORIA.items():
+            columnas = [c for c, _ in self._leer_columnas(tabla)]
+            tipos = dict(self._leer_columnas(tabla))
+            for accion, descripcion in descripciones.items():
+                anteriores = self._json_fila(columnas, tipos, 'OLD') if accion != 'INSERT' else 'NULL'
+                nuevos = self._json_fila(columnas, tipos, 'NEW') if accion != 'DELETE' else 'NULL'
+                if accion == 'UPDATE':
+                    # Solo los campos modificados (igual que jsonb_diferencias en PostgreSQL)
+                    anteriores, nuevos = f"json_diferencias({anteriores}, {nuevos})", f"json_diferencias({nuevos}, {anteriores})"
+                id_registro = 'OLD.id' if accion == 'DELETE' else 'NEW.id'
+                # Se recrean siempre para que una base existente tome la versión actual
+                self._con.execute(f"DROP TRIGGER IF EXISTS tr_auditoria_{tabla}_{accion.lower()}")
+                self._con.execute(f"""
+                    CREATE TRIGGER tr_auditoria_{tabla}_{accion.lower()}
+                    AFTER {accion} ON {tabla} FOR EACH ROW
+                    WHEN NOT auditoria_omitida()
+                    AND COALESCE((SELECT fuente FROM auditoria_fuentes WHERE tabla = '{tabla}'), 'aplicacion') = 'trigger'
+                    BEGIN
+                        INSERT INTO auditoria_bitacora (
+                            nombre_usuario, tabla_afectada, id_registro, tipo_accion,
+                            descripcion_detallada, datos_anteriores, datos_nuevos
+                        ) VALUES (
+                            usuario_actual(), '{tabla}', {id_registro}, '{accion}', {descripcion}, {anteriores}, {nuevos}
+                        );
+                    END
+                """)
+        self._crear_triggers_resumen()
+        # Bases creadas antes de los resúmenes: se calculan una vez desde las reservas
+        if (self._con.execute('SELECT 1 FROM reservas LIMIT 1').fetchone()
+                and not self._con.execute('SELECT 1 FROM resumen_diario_canchas LIMIT 1').fetchone()):
+            _rpc_reconstruir_resumenes(self._con, {})
+
+    def _crear_triggers_resumen(self):
+        """Triggers equivalentes a tr_resumen_reservas (uno por operación en SQLite)."""
+        def acumular(fila: str, signo: int) -> str:
+            return '\n'.join(
+                f"""INSERT INTO {resumen} (fecha, {columna}, estado, reservas, horas, ingresos)
+                    VALUES ({fila}.fecha, {fila}.{columna}, {fila}.estado, {signo},
+                            {signo} * {HORAS_RESERVA.format(fila=fila)}, {signo} * {fila}.monto_total)
+                    ON CONFLICT (fecha, {columna}, estado) DO UPDATE SET
+                        reservas = reservas + excluded.reservas,
+                        horas = horas + excluded.horas,
+                        ingresos = ingresos + excluded.ingresos;"""
+                for resumen, columna in RESUMENES_DIARIOS.items()
+            )
+
+        cuerpos = {
+            'INSERT': ('INSERT', acumular('NEW', 1)),
+            'DELETE': ('DELETE', acumular('OLD', -1)),
+            'UPDATE': (
+                'UPDATE OF fecha, id_cancha, id_cliente, estado, hora_inicio, hora_fin, monto_total',
+                acumular('OLD', -1) + '\n' + acumular('NEW', 1)
+            ),
+        }
+        for accion, (evento, cuerpo) in cuerpos.items():
+            self._con.execute(f"DROP TRIGGER IF EXISTS tr_resumen_reservas_{accion.lower()}")
+            self._con.execute(f"""
+                CREATE TRIGGER tr_resumen_reservas_{accion.lower()}
+                AFTER {evento} ON reservas FOR EACH ROW
+                BEGIN
+                    {cuerpo}
+                END
+            """)
+
+    @staticmethod
+    def _json_fila(columnas: List[str], tipos: Dict[str, str], fila: str) -> str:
+        """Expresión json_object(...) equivalente a to_jsonb(OLD/NEW)."""
+        pares = []
+        for columna in columnas:
+            valor = f"{fila}.{columna}"
+            if tipos[columna] == 'BOOLEAN':
+                valor = f"CASE WHEN {valor} IS NULL THEN NULL WHEN {valor} THEN json('true') ELSE json('false') END"
+            pares.append(f"'{columna}', {valor}")
+        return f"json_object({', '.join(pares)})"
+
+    def _tablas(self) -> List[str]:
+        return [f[0] for f in self._con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+
+    def _leer_columnas(self, tabla: str) -> List[Tuple[str, str]]:
+        return [(f['name'], f['type'].split('(')[0].upper()) for f in self._con.execute(f'PRAGMA table_info({tabla})')]
+
+    def _leer_claves_foraneas(self, tabla: str) -> Dict[str, Tuple[str, str]]:
+        return {f['from']: (f['table'], f['to'] or 'id') for f in self._con.execute(f'PRAGMA foreign_key_list({tabla})')}
+
+    def refrescar_esquema(self):
+        """Vuelve a leer columnas y claves foráneas tras cambios de esquema."""
+        self._columnas = {t: self._leer_columnas(t) for t in self._tablas()}
+        self._fks = {t: self._leer_claves_foraneas(t) for t in self._tablas()}
+
+    # --- Usuario de la aplicación (equivale a current_user en los triggers) ---
+
+    def _usuario_actual(self) -> str:
+        return getattr(self._local, 'usuario', None) or 'postgres'
+
+    def _fijar_usuario(self, usuario: str) -> str:
+        """Equivale a set_config('app.usuario', ..., true): vale hasta el fin de la llamada."""
+        self._local.usuario = usuario
+        return usuario
+
+    def _auditoria_omitida(self) -> bool:
+        return getattr(self._local, 'omitir_auditoria', False)
+
+    def _omitir_auditoria(self, valor: int) -> int:
+        """Equivale a set_config('app.auditoria_omitida', ..., true)."""
+        self._local.omitir_auditoria = bool(valor)
+        return valor
+
+    # --- Conversión de valores ---
+
+    def _tipo(self, tabla: str, columna: str) -> Optional[str]:
+        for nombre, tipo in self._columnas[tabla]:
+            if nombre == columna:
+                return tipo
+        return None
+
+    def _valor_entrada(self, tabla: str, columna: str, valor: Any) -> Any:
+        """Convierte un valor de Python/JSON al formato almacenado en SQLite."""
+        if valor is None:
+            return None
+        tipo = self._tipo(tabla, columna)
+        if tipo == 'BOOLEAN':
+            if isinstance(valor, str):
+                return 1 if valor.lower() in ('true', 't', '1') else 0
+            return 1 if valor else 0
+        if tipo == 'JSONB':
+            return valor if isinstance(valor, str) else _a_json(valor)
+        if tipo == 'TIME':
+            return _hora(valor)
+        if isinstance(valor, (date, datetime, time)):
+            return valor.isoformat()
+        return valor
+
+    def _fila_salida(self, tabla: str, fila: sqlite3.Row) -> Dict[str, Any]:
+        """Convierte una fila de SQLite al formato JSON que devuelve PostgREST."""
+        resultado = {}
+        for columna in fila.keys():
+            valor = fila[columna]
+            tipo = self._tipo(tabla, columna)
+            if valor is not None:
+                if tipo == 'BOOLEAN':
+                    valor = bool(valor)
+                elif tipo == 'DECIMAL':
+                    valor = float(valor)
+                elif tipo == 'JSONB':
+                    valor = json.loads(valor)
+            resultado[columna] = valor
+        return resultado
+
+    # --- Traducción de filtros a SQL ---
+
+    def _condicion(self, tabla: str, alias: str, nodo: Tuple, parametros: List[Any]) -> str:
+        if nodo[0] in ('and', 'or'):
+            _, hijos, negado = nodo
+            partes = [self._condicion(tabla, alias, h, parametros) for h in hijos]
+            sql = '(' + f' {nodo[0].upper()} '.join(partes) + ')'
+            return f'NOT {sql}' if negado else sql
+
+        _, columna, operador, valor, negado = nodo
+        if self._tipo(tabla, columna) is None:
+            raise ErrorBackendLocal(f'column {tabla}.{columna} does not exist', '42703')
+        ref = f'{alias}."{columna}"'
+
+        if operador == 'is':
+            texto = str(valor).lower()
+            sql = {'null': f'{ref} IS NULL', 'true': f'{ref} IS TRUE', 'false': f'{ref} IS FALSE'}[
+                'null' if valor is None else texto
+            ]
+        elif operador == 'in':
+            valores = valor if isinstance(valor, list) else [
+                _sin_comillas(v) for v in _dividir(str(valor).strip('()'))
+            ]
+            if not valores:
+                sql = '0'
+            else:
+                sql = f"{ref} IN ({', '.join('?' * len(valores))})"
+                parametros.extend(self._valor_entrada(tabla, columna, v) for v in valores)
+        elif operador in ('like', 'ilike'):
+            patron = _sin_comillas(str(valor)).replace('*', '%')
+            if operador == 'ilike':
+                sql = f'minusculas({ref}) LIKE minusculas(?)'
+            else:
+                sql = f'{ref} LIKE ?'
+            parametros.append(patron)
+        else:
+            simbolos = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+            if operador not in simbolos:
+                raise ErrorBackendLocal(f'Operador no soportado por el backend local: {operador}', 'PGRST100')
+            if isinstance(valor, str):
+                valor = _sin_comillas(valor)
+            sql = f'{ref} {simbolos[operador]} ?'
+            parametros.append(self._valor_entrada(tabla, columna, valor))
+        return f'NOT ({sql})' if negado else sql
+
+    def _where(self, tabla: str, alias: str, filtros: List[Tuple], parametros: List[Any]) -> str:
+        partes = [self._condicion(tabla, alias, nodo, parametros) for nodo in filtros]
+        return ' AND '.join(partes) if partes else '1'
+
+    # --- Relaciones embebidas ---
+
+    def _resolver_relacion(self, tabla: str, nodo: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        """
+        Devuelve (cardinalidad, tabla destino, columna local, columna remota).
+
+        Admite 'destino(...)', 'alias:columna_fk(...)' y 'destino!pista(...)'.
+        """
+        objetivo, pista = nodo['objetivo'], nodo['pista']
+        fks = self._fks[tabla]
+        if objetivo in fks:
+            destino, remota = fks[objetivo]
+            return 'uno', destino, objetivo, remota
+        if pista in fks and fks[pista][0] == objetivo:
+            return 'uno', objetivo, pista, fks[pista][1]
+        for columna, (destino, remota) in fks.items():
+            if destino == objetivo:
+                return 'uno', objetivo, columna, remota
+        for columna, (destino, remota) in self._fks.get(objetivo, {}).items():
+            if destino == tabla:
+                return 'muchos', objetivo, remota, columna
+        raise ErrorBackendLocal(
+            f"Could not find a relationship between '{tabla}' and '{objetivo}'", 'PGRST200'
+        )
+
+    def _columnas_sql(self, tabla: str, nodos: List[Dict[str, Any]], extra: List[str]) -> List[str]:
+        if any(n['tipo'] == '*' for n in nodos):
+            columnas = [c for c, _ in self._columnas[tabla]]
+        else:
+            columnas = [n['nombre'] for n in nodos if n['tipo'] == 'col']
+        for columna in extra:
+            if columna not in columnas:
+                columnas.append(columna)
+        return columnas
+
+    def _proyectar(self, tabla: str, nodos: List[Dict[str, Any]], fila: Dict[str, Any]) -> Dict[str, Any]:
+        if any(n['tipo'] == '*' for n in nodos):
+            salida = {c: fila[c] for c, _ in self._columnas[tabla] if c in fila}
+        else:
+            salida = {}
+        for nodo in nodos:
+            if nodo['tipo'] == 'col':
+                salida[nodo['alias']] = fila[nodo['nombre']]
+            elif nodo['tipo'] == 'rel':
+                salida[nodo['alias']] = fila.get(nodo['alias'])
+        return salida
+
+    def _subconsulta_inner(self, tabla: str, alias: str, nodo: Dict[str, Any],
+                           filtros: List[Tuple], parametros: List[Any]) -> str:
+        """Condición que exige que exista el recurso embebido (modificador !inner)."""
+        cardinalidad, destino, local, remota = self._resolver_relacion(tabla, nodo)
+        condicion = self._where(destino, 'e', filtros, parametros)
+        if cardinalidad == 'uno':
+            return f'{alias}."{local}" IN (SELECT e."{remota}" FROM {destino} e WHERE {condicion})'
+        return f'EXISTS (SELECT 1 FROM {destino} e WHERE e."{remota}" = {alias}."{local}" AND {condicion})'
+
+    def _embeber(self, tabla: str, nodos: List[Dict[str, Any]], filas: List[Dict[str, Any]],
+                 filtros_por_ruta: Dict[str, List[Tuple]]):
+        """Agrega a cada fila sus recursos embebidos con una consulta por relación."""
+        for nodo in nodos:
+            if nodo['tipo'] != 'rel' or not filas:
+                continue
+            cardinalidad, destino, local, remota = self._resolver_relacion(tabla, nodo)
+            claves = sorted({f[local] for f in filas if f.get(local) is not None})
+            relacionados: Dict[Any, Any] = {}
+            if claves:
+                parametros: List[Any] = list(claves)
+                extra = [remota] + [
+                    self._resolver_relacion(destino, h)[2] for h in nodo['hijos'] if h['tipo'] == 'rel'
+                ]
+                columnas = self._columnas_sql(destino, nodo['hijos'], extra)
+                condicion = self._where(destino, 'e', filtros_por_ruta.get(nodo['alias'], []), parametros)
+                lista = ', '.join(f'e."{c}"' for c in columnas)
+                marcas = ', '.join('?' * len(claves))
+                sql = f'SELECT {lista} FROM {destino} e WHERE e."{remota}" IN ({marcas}) AND {condicion}'
+                hijos = [self._fila_salida(destino, f) for f in self._con.execute(sql, parametros)]
+                self._embeber(destino, nodo['hijos'], hijos, {})
+                for hijo in hijos:
+                    proyectado = self._proyectar(destino, nodo['hijos'], hijo)
+                    if cardinalidad == 'uno':
+                        relacionados[hijo[remota]] = proyectado
+                    else:
+                        relacionados.setdefault(hijo[remota], []).append(proyectado)
+            for fila in filas:
+                vacio = None if cardinalidad == 'uno' else []
+                fila[nodo['alias']] = relacionados.get(fila.get(local), vacio)
+
+    # --- Ejecución ---
+
+    def _error(self, e: Exception) -> ErrorBackendLocal:
+        mensaje = str(e)
+        for texto, codigo in ERRORES_SQLITE:
+            if texto in mensaje:
+                return ErrorBackendLocal(mensaje, codigo)
+        return ErrorBackendLocal(mensaje)
+
+    def _ejecutar(self, consulta: ConsultaLocal) -> RespuestaLocal:
+        with self._lock:
+            try:
+                self._local.usuario = consulta.headers.get('x-usuario-app')
+                self._con.execute('BEGIN')
+                try:
+                    respuesta = getattr(self, f'_ejecutar_{consulta._operacion}')(consulta)
+                    self._con.execute('COMMIT')
+                except Exception:
+                    self._con.execute('ROLLBACK')
+                    raise
+            except ErrorBackendLocal:
+                raise
+            except sqlite3.Error as e:
+                raise self._error(e)
+            finally:
+                self._local.usuario = None
+                self._local.omitir_auditoria = False
+
+        if consulta._unico:
+            filas = respuesta.data
+            if consulta._unico == 'maybe' and not filas:
+                return RespuestaLocal(None, respuesta.count)
+            if len(filas) != 1:
+                raise ErrorBackendLocal(
+                    'JSON object requested, multiple (or no) rows returned', 'PGRST116'
+                )
+            return RespuestaLocal(filas[0], respuesta.count)
+        return respuesta
+
+    def _ejecutar_select(self, consulta: ConsultaLocal) -> RespuestaLocal:
+        tabla = consulta._tabla
+        parametros: List[Any] = []
+        base = [nodo for ruta, nodo in consulta._filtros if ruta is None]
+        por_ruta: Dict[str, List[Tuple]] = {}
+        for ruta, nodo in consulta._filtros:
+            if ruta is not None:
+                por_ruta.setdefault(ruta, []).append(nodo)
+
+        condiciones = [self._where(tabla, 't', base, parametros)]
+        for nodo in consulta._seleccion:
+            if nodo['tipo'] == 'rel' and nodo['inner']:
+                condiciones.append(self._subconsulta_inner(
+                    tabla, 't', nodo, por_ruta.pop(nodo['alias'], []), parametros
+                ))
+        where = ' AND '.join(condiciones)
+
+        extra = [self._resolver_relacion(tabla, n)[2] for n in consulta._seleccion if n['tipo'] == 'rel']
+        columnas = self._columnas_sql(tabla, consulta._seleccion, extra)
+        lista = ', '.join(f't."{c}"' for c in columnas)
+        sql = f'SELECT {lista} FROM {tabla} t WHERE {where}'
+        if consulta._orden:
+            sql += ' ORDER BY ' + ', '.join(
+                f't."{c}" {"DESC NULLS LAST" if d else "ASC NULLS LAST"}' for c, d in consulta._orden
+            )
+        limite = consulta._limite
+        if self.filas_maximas is not None:
+            limite = self.filas_maximas if limite is None else min(limite, self.filas_maximas)
+        if limite is not None:
+            sql += f' LIMIT {int(limite)} OFFSET {int(consulta._desde)}'
+        elif consulta._desde:
+            sql += f' LIMIT -1 OFFSET {int(consulta._desde)}'
+
+        filas = [self._fila_salida(tabla, f) for f in self._con.execute(sql, parametros)]
+        self._embeber(tabla, consulta._seleccion, filas, por_ruta)
+        data = [self._proyectar(tabla, consulta._seleccion, f) for f in filas]
+
+        total = None
+        if consulta._conteo:
+            total = self._con.execute(
+                f'SELECT COUNT(*) FROM {tabla} t WHERE {where}', parametros
+            ).fetchone()[0]
+        return RespuestaLocal(data, total)
+
+    def _ejecutar_insert(self, consulta: ConsultaLocal) -> RespuestaLocal:
+        tabla = consulta._tabla
+        data = []
+        for registro in consulta._datos:
+            columnas = list(registro.keys())
+            valores = [self._valor_entrada(tabla, c, registro[c]) for c in columnas]
+            if columnas:
+                sql = (
+                    f"INSERT INTO {tabla} ({', '.join(columnas)}) "
+                    f"VALUES ({', '.join('?' * len(columnas))}) RETURNING *"
+                )
+            else:
+                sql = f'INSERT INTO {tabla} DEFAULT VALUES RETURNING *'
+            data.extend(self._fila_salida(tabla, f) for f in self._con.execute(sql, valores).fetchall())
+        conteo = len(data) if consulta._conteo else None
+        if consulta._retorno == 'minimal':
+            return RespuestaLocal([], conteo)
+        return RespuestaLocal(data, conteo)
+
+    def _ejecutar_update(self, consulta: ConsultaLocal) -> RespuestaLocal:
+        tabla = consulta._tabla
+        columnas = list(consulta._datos.keys())
+        parametros = [self._valor_entrada(tabla, c, consulta._datos[c]) for c in columnas]
+        asignaciones = ', '.join(f'"{c}" = ?' for c in columnas)
+        if tabla in TABLAS_CON_TIMESTAMP and 'updated_at' not in columnas:
+            asignaciones += f', updated_at = {AHORA}'
+        where = self._where(tabla, tabla, [n for r, n in consulta._filtros if r is None], parametros)
+        filas = self._con.execute(
+            f'UPDATE {tabla} SET {asignaciones} WHERE {where} RETURNING rowid', parametros
+        ).fetchall()
+        return RespuestaLocal(self._releer(tabla, [f[0] for f in filas]), len(filas) if consulta._conteo else None)
+
+    def _ejecutar_delete(self, consulta: ConsultaLocal) -> RespuestaLocal:
+        tabla = consulta._tabla
+        parametros: List[Any] = []
+        where = self._where(tabla, tabla, [n for r, n in consulta._filtros if r is None], parametros)
+        filas = self._con.execute(f'DELETE FROM {tabla} WHERE {where} RETURNING *', parametros).fetchall()
+        data = [self._fila_salida(tabla, f) for f in filas]
+        return RespuestaLocal(data, len(data) if consulta._conteo else None)
+
+    def _releer(self, tabla: str, ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        Lee filas por rowid (incluye los cambios hechos por triggers AFTER).
+        En las tablas con id INTEGER PRIMARY KEY el rowid es el id.
+        """
+        if not ids:
+            return []
+        filas = self._con.execute(
+            f"SELECT * FROM {tabla} WHERE rowid IN ({', '.join('?' * len(ids))}) ORDER BY rowid", ids
+        )
+        return [self._fila_salida(tabla, f) for f in filas]
+
+    def _ejecutar_rpc(self, llamada: LlamadaRpcLocal) -> RespuestaLocal:
+        if llamada._nombre not in FUNCIONES_RPC:
+            raise ErrorBackendLocal(f'Could not find the function public.{llamada._nombre}', 'PGRST202')
+        with self._lock:
+            try:
+                self._local.usuario = llamada.headers.get('x-usuario-app')
+                self._con.execute('BEGIN')
+                try:
+                    funcion = FUNCIONES_RPC[llamada._nombre]
+                    data = funcion(self._con, llamada._parametros)
+                    if funcion.devuelve:
+                        data = self._releer(funcion.devuelve, data)
+                    self._con.execute('COMMIT')
+                except Exception:
+                    self._con.execute('ROLLBACK')
+                    raise
+            except ErrorBackendLocal:
+                raise
+            except sqlite3.Error as e:
+                raise self._error(e)
+            finally:
+                self._local.usuario = None
+                self._local.omitir_auditoria = False
+        if self.filas_maximas is not None and isinstance(data, list):
+            data = data[:self.filas_maximas]
+        return RespuestaLocal(data)
+
+    # --- Datos de prueba (sección 11 del script) ---
+
+    def cargar_datos_prueba(self):
+        """Carga los mismos datos de prueba que script_supabase.txt."""
+        import bcrypt
+
+        def hash_local(password: str) -> str:
+            return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=10)).decode('utf-8')
+
+        with self._lock:
+            con = self._con
+            con.execute('BEGIN')
+            try:
+                con.executemany(
+                    'INSERT INTO tipos_cancha (nombre, descripcion, precio_por_hora) VALUES (?, ?, ?)',
+                    [
+                        ('Fútbol 11', 'Cancha de fútbol completa para 22 jugadores', 50.00),
+                        ('Fútbol 7', 'Cancha de fútbol reducida para 14 jugadores', 35.00),
+                        ('Pádel', 'Cancha de pádel para 4 jugadores', 25.00),
+                        ('Básquet', 'Cancha de básquet para 10 jugadores', 30.00),
+                    ]
+                )
+                con.executemany(
+                    'INSERT INTO canchas (nombre, id_tipo, ubicacion, capacidad_maxima) VALUES (?, ?, ?, ?)',
+                    [
+                        ('Cancha Principal', 1, 'Sector Norte', 22),
+                        ('Cancha Norte', 2, 'Sector Norte', 14),
+                        ('Cancha Sur', 2, 'Sector Sur', 14),
+                        ('Pádel 1', 3, 'Sector Este', 4),
+                        ('Pádel 2', 3, 'Sector Este', 4),
+                        ('Básquet Cubierta', 4, 'Sector Centro', 10),
+                    ]
+                )
+                con.execute(
+                    """INSERT INTO horarios_disponibles (id_cancha, dia_semana, hora_inicio, hora_fin)
+                       SELECT c.id, d.dia, '08:00:00', '22:00:00'
+                       FROM canchas c, (SELECT 1 AS dia UNION ALL SELECT 2 UNION ALL SELECT 3
+                                        UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6
+                                        UNION ALL SELECT 7) d"""
+                )
+                con.executemany(
+                    'INSERT INTO clientes (nombre, apellido, telefono, email, documento) VALUES (?, ?, ?, ?, ?)',
+                    [
+                        ('Juan', 'Pérez', '0991234567', 'juan.perez@email.com', '1234567890'),
+                        ('María', 'González', '0987654321', 'maria.gonzalez@email.com', '0987654321'),
+                        ('Carlos', 'Rodríguez', '0998765432', 'carlos.rodriguez@email.com', '1122334455'),
+                        ('Ana', 'Martínez', '0995566778', 'ana.martinez@email.com', '5566778899'),
+                        ('Luis', 'López', '0994433221', 'luis.lopez@email.com', '3344556677'),
+                    ]
+                )
+                con.executemany(
+                    'INSERT INTO usuarios (nombre, email, password_hash, rol) VALUES (?, ?, ?, ?)',
+                    [
+                        ('Administrador', 'admin@reservas.com', hash_local('admin123'), 'admin'),
+                        ('Operador Principal', 'operador@reservas.com', hash_local('operador123'), 'operador_reservas'),
+                        ('Consultor Reportes', 'consultor@reservas.com', hash_local('consultor123'), 'consultor'),
+                    ]
+                )
+                manana = date.today() + timedelta(days=1)
+                pasado = date.today() + timedelta(days=2)
+                for p in [
+                    (1, 1, manana, '10:00', '12:00', 'Partido amistoso'),
+                    (2, 2, manana, '15:00', '16:00', 'Entrenamiento'),
+                    (3, 4, pasado, '18:00', '19:00', 'Pádel recreativo'),
+                ]:
+                    _rpc_crear_reserva(con, dict(zip(
+                        ['p_id_cliente', 'p_id_cancha', 'p_fecha', 'p_hora_inicio', 'p_hora_fin', 'p_observaciones'], p
+                    )))
+                con.execute('COMMIT')
+            except Exception:
+                con.execute('ROLLBACK')
+                raise
+
+    @contextmanager
+    def carga_masiva(self):
+        """
+        Conexión para cargar muchas filas generadas en una sola transacción.
+
+        Mientras dura se quitan los triggers de reservas y clientes (no
+        solapamiento, auditoría y resúmenes), así cada fila cuesta solo su
+        INSERT; quien carga es responsable de que los datos respeten las
+        reglas. Al salir se recrean los triggers y se reconstruyen los
+        resúmenes diarios.
+        """
+        with self._lock:
+            con = self._con
+            con.execute('BEGIN')
+            try:
+                triggers = [f[0] for f in con.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ('reservas', 'clientes')"
+                )]
+                for trigger in triggers:
+                    con.execute(f'DROP TRIGGER {trigger}')
+                yield con
+                _rpc_reconstruir_resumenes(con, {})
+                con.execute('COMMIT')
+            except Exception:
+                con.execute('ROLLBACK')
+                raise
+            finally:
+                self._crear_esquema()
+
+    def cerrar(self):
+        """Cierra la conexión SQLite."""
+        with self._lock:
+            self._con.close()
@@ -1,21 +1,164 @@
 import streamlit as st
-from supabase import create_client
+import httpx
+from supabase import create_client, ClientOptions
 from datetime import datetime, date, time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Callable
 import os
+import json
+import threading
+from components.metricas import contador, histograma, cronometrar, iniciar_exportador
 
-# Initialize Supabase client - You'll need to set these environment variables
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# =====================================================
+# CLIENTE DE BASE DE DATOS (perezoso y compartido por proceso)
+# =====================================================
+# El cliente no se crea al importar el módulo: se construye la primera vez que
+# se usa y lo comparten todas las sesiones del mismo proceso de Streamlit, de
+# modo que las conexiones HTTP (y su TLS) se reutilizan entre reruns y usuarios.
+# El backend se elige con RESERVAS_BACKEND (secrets o variable de entorno).
 
-SUPABASE_URL = st.secrets["SUPABASE_URL"]
-SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
+BACKEND_POR_DEFECTO = 'supabase'
 
+# Backends registrados: nombre -> función sin argumentos que construye el cliente
+_BACKENDS: Dict[str, Callable[[], Any]] = {}
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_KEY environment variables.")
+# Clientes ya construidos (uno por backend) y cliente fijado manualmente
+# para pruebas, benchmarks y scripts
+_clientes: Dict[str, Any] = {}
+_cliente_fijo = None
+_lock_cliente = threading.Lock()
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def leer_configuracion(clave: str, defecto: Optional[str] = None) -> Optional[str]:
+    """
+    Lee un valor de configuración desde st.secrets o, si no existe, desde
+    las variables de entorno.
+    """
+    try:
+        if clave in st.secrets:
+            return st.secrets[clave]
+    except Exception:
+        # Sin archivo secrets.toml: se usan solo las variables de entorno
+        pass
+    return os.getenv(clave, defecto)
+
+def registrar_backend(nombre: str, fabrica: Callable[[], Any]):
+    """
+    Registra un backend de datos seleccionable con RESERVAS_BACKEND.
+    
+    Args:
+        nombre: Nombre del backend (ej. 'supabase')
+        fabrica: Función sin argumentos que devuelve un cliente con la misma
+            interfaz que el cliente de Supabase (table, from_, rpc)
+    """
+    _BACKENDS[nombre] = fabrica
+
+def _crear_cliente_supabase():
+    """Construye el cliente de Supabase con un pool de conexiones keep-alive."""
+    url = leer_configuracion('SUPABASE_URL')
+    key = leer_configuracion('SUPABASE_KEY')
+    
+    if not url or not key:
+        raise ValueError("Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_KEY environment variables.")
+    
+    http = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=20,
+            max_keepalive_connections=10,
+            keepalive_expiry=60
+        ),
+        timeout=httpx.Timeout(30.0, connect=10.0)
+    )
+    return create_client(url, key, options=ClientOptions(httpx_client=http))
+
+def _crear_cliente_local():
+    """Construye el backend SQLite local (RESERVAS_DB_LOCAL, en memoria por defecto)."""
+    from components.backend_local import ClienteLocal
+    return ClienteLocal(leer_configuracion('RESERVAS_DB_LOCAL', ':memory:'))
+
+registrar_backend('supabase', _crear_cliente_supabase)
+registrar_backend('local', _crear_cliente_local)
+
+def obtener_cliente():
+    """
+    Devuelve el cliente de datos del proceso, creándolo si hace falta.
+    
+    Returns:
+        Cliente fijado con usar_cliente() o, si no hay, el cliente compartido
+        del backend configurado en RESERVAS_BACKEND (envuelto con las trazas
+        de components.trazas salvo TRAZAS_BACKEND=0)
+    """
+    if _cliente_fijo is not None:
+        return _cliente_fijo
+    
+    backend = leer_configuracion('RESERVAS_BACKEND', BACKEND_POR_DEFECTO)
+    cliente = _clientes.get(backend)
+    if cliente is None:
+        with _lock_cliente:
+            cliente = _clientes.get(backend)
+            if cliente is None:
+                if backend not in _BACKENDS:
+                    raise ValueError(f"Backend de datos desconocido: {backend}")
+                cliente = _BACKENDS[backend]()
+                # Import diferido: components.trazas lee la configuración de este módulo
+                from components.trazas import ClienteTrazado, trazas_habilitadas
+                if trazas_habilitadas():
+                    cliente = ClienteTrazado(cliente)
+                _clientes[backend] = cliente
+                # Primer cliente del proceso: publicar las métricas (components.metricas)
+                iniciar_exportador()
+    return cliente
+
+def usar_cliente(cliente):
+    """
+    Fija el cliente de datos que usará todo el proceso (o None para volver
+    al backend configurado). Pensado para pruebas, benchmarks y scripts.
+    """
+    global _cliente_fijo
+    _cliente_fijo = cliente
+
+def verificar_conexion() -> Tuple[bool, str]:
+    """
+    Comprueba que el backend responde con una consulta mínima.
+    
+    Returns:
+        Tuple con (ok, mensaje con la latencia o el error)
+    """
+    try:
+        inicio = datetime.now()
+        obtener_cliente().table('tipos_cancha').select('id').limit(1).execute()
+        ms = (datetime.now() - inicio).total_seconds() * 1000
+        return True, f"Conexión correcta ({ms:.0f} ms)"
+    except Exception as e:
+        return False, f"Error de conexión: {str(e)}"
+
+class _ClienteDiferido:
+    """Delegado que resuelve el cliente real en cada uso (ver obtener_cliente)."""
+    
+    def __getattr__(self, nombre):
+        return getattr(obtener_cliente(), nombre)
+
+# Punto de acceso usado por las páginas: `from components.database import supabase`
+supabase = _ClienteDiferido()
+
+# SQLSTATE de exclusion_violation (restricción excl_reservas_solapamiento)
+CODIGO_SOLAPAMIENTO = '23P01'
+
+# Métricas de la creación de reservas y de los reportes (components.metricas)
+RESERVAS_SEGUNDOS = histograma(
+    'reservas_creacion_segundos', 'Duración de la creación de reservas', ('tipo', 'resultado')
+)
+RESERVAS_CONFLICTOS = contador(
+    'reservas_conflictos_total', 'Reservas rechazadas por solapamiento con otra reserva', ('origen',)
+)
+REPORTES_SEGUNDOS = histograma(
+    'reportes_carga_segundos', 'Duración de la carga de datos de los reportes', ('reporte', 'resultado')
+)
+
+class HorarioOcupadoError(Exception):
+    """La reserva se solapa con otra reserva activa de la misma cancha."""
+
+def es_solapamiento(error: Exception) -> bool:
+    """Indica si un error de la base de datos es la violación de no solapamiento."""
+    return getattr(error, 'code', None) == CODIGO_SOLAPAMIENTO
 
 def crear_reserva(
     id_cliente: int,
@@ -23,11 +166,18 @@ def crear_reserva(
     fecha: date,
     hora_inicio: time,
     hora_fin: time,
-    observaciones: Optional[str] = None
+    observaciones: Optional[str] = None,
+    estado: str = 'confirmada',
+    nombre_usuario: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Crea una nueva reserva en el sistema.
     
+    La función crear_reserva de la base de datos valida la cancha y el horario,
+    calcula el monto e inserta en una sola transacción; la auditoría la
+    registra el trigger de reservas con el usuario indicado, o esta función
+    si auditoria_fuentes asigna las reservas a la aplicación.
+    
     Args:
         id_cliente: ID del cliente que hace la reserva
         id_cancha: ID de la cancha a reservar
@@ -35,67 +185,177 @@ def crear_reserva(
         hora_inicio: Hora de inicio de la reserva
         hora_fin: Hora de fin de la reserva
         observaciones: Observaciones opcionales de la reserva
+        estado: Estado inicial de la reserva
+        nombre_usuario: Usuario de la aplicación para la bitácora de auditoría
     
     Returns:
         Dict con la información de la reserva creada
+    
+    Raises:
+        HorarioOcupadoError: Si el horario se solapa con otra reserva activa
     """
-    try:
-        # Primero verificamos que la cancha esté disponible
-        cancha = supabase.table('canchas').select('*').eq('id', id_cancha).eq('disponible', True).execute()
-        if not cancha.data:
-            raise ValueError('La cancha no está disponible')
-        
-        # Verificar que no haya conflicto de horarios
-        conflicto = supabase.table('reservas')\
-            .select('*')\
-            .eq('id_cancha', id_cancha)\
-            .eq('fecha', fecha.isoformat())\
-            .neq('estado', 'cancelada')\
-            .lte('hora_inicio', hora_fin.isoformat())\
-            .gte('hora_fin', hora_inicio.isoformat())\
-            .execute()
+    with RESERVAS_SEGUNDOS.medir(tipo='individual', resultado='error') as medicion:
+        try:
+            reserva = supabase.rpc('crear_reserva', {
+                'p_id_cliente': id_cliente,
+                'p_id_cancha': id_cancha,
+                'p_fecha': fecha.isoformat(),
+                'p_hora_inicio': hora_inicio.isoformat(),
+                'p_hora_fin': hora_fin.isoformat(),
+                'p_observaciones': observaciones,
+                'p_estado': estado,
+                'p_nombre_usuario': nombre_usuario
+            }).execute()
+            
+            medicion['resultado'] = 'ok'
+            reserva = reserva.data[0]
             
-        if conflicto.data:
-            raise ValueError('Ya existe una reserva en ese horario')
+            # Con fuente 'aplicacion' el trigger omite la fila
+            if auditar_en_aplicacion('reservas'):
+                registrar_auditoria(
+                    nombre_usuario or 'sistema',
+                    'reservas',
+                    'INSERT',
+                    f"Se creó la reserva ID: {reserva['id']}",
+                    None,
+                    reserva
+                )
+            return reserva
         
-        # Calcular monto total
-        tipo_cancha = supabase.rpc(
-            'calcular_monto_reserva',
-            {
+        except Exception as e:
+            if es_solapamiento(e):
+                medicion['resultado'] = 'conflicto'
+                RESERVAS_CONFLICTOS.inc(origen='base')
+                raise HorarioOcupadoError('Ya existe una reserva en ese horario')
+            raise Exception(f'Error al crear la reserva: {str(e)}')
+
+def crear_reservas_serie(
+    id_cliente: int,
+    id_cancha: int,
+    fechas: List[date],
+    hora_inicio: time,
+    hora_fin: time,
+    observaciones: Optional[str] = None,
+    estado: str = 'confirmada',
+    nombre_usuario: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Crea una serie de reservas recurrentes con una sola inserción masiva.
+    
+    La función crear_reservas_serie inserta todas las fechas en una
+    transacción y registra un único resumen en la auditoría (aquí, si
+    auditoria_fuentes asigna las reservas a la aplicación).
+    
+    Args:
+        id_cliente: ID del cliente que hace las reservas
+        id_cancha: ID de la cancha a reservar
+        fechas: Fechas de las ocurrencias a crear
+        hora_inicio: Hora de inicio de cada reserva
+        hora_fin: Hora de fin de cada reserva
+        observaciones: Observaciones opcionales
+        estado: Estado inicial de las reservas
+        nombre_usuario: Usuario de la aplicación para la bitácora de auditoría
+    
+    Returns:
+        List[Dict] con las reservas creadas
+    
+    Raises:
+        HorarioOcupadoError: Si alguna fecha se solapa con otra reserva activa
+    """
+    with RESERVAS_SEGUNDOS.medir(tipo='serie', resultado='error') as medicion:
+        try:
+            reservas = supabase.rpc('crear_reservas_serie', {
+                'p_id_cliente': id_cliente,
                 'p_id_cancha': id_cancha,
+                'p_fechas': [f.isoformat() for f in fechas],
                 'p_hora_inicio': hora_inicio.isoformat(),
-                'p_hora_fin': hora_fin.isoformat()
-            }
-        ).execute()
-        
-        monto_total = tipo_cancha.data
-        
-        # Crear la reserva
-        reserva = supabase.table('reservas').insert({
-            'id_cliente': id_cliente,
-            'id_cancha': id_cancha,
-            'fecha': fecha.isoformat(),
-            'hora_inicio': hora_inicio.isoformat(),
-            'hora_fin': hora_fin.isoformat(),
-            'monto_total': monto_total,
-            'estado': 'confirmada',
-            'observaciones': observaciones
-        }).execute()
-        
-        # Registrar en auditoría
-        registrar_auditoria(
-            'sistema',
-            'reservas',
-            'INSERT',
-            f'Nueva reserva creada para el cliente {id_cliente} en la cancha {id_cancha}',
-            None,
-            reserva.data[0]
-        )
+                'p_hora_fin': hora_fin.isoformat(),
+                'p_observaciones': observaciones,
+                'p_estado': estado,
+                'p_nombre_usuario': nombre_usuario
+            }).execute()
+            
+            medicion['resultado'] = 'ok'
+            reservas = reservas.data or []
+            
+            # Mismo resumen que registra la función de la base de datos
+            if reservas and auditar_en_aplicacion('reservas'):
+                fechas_serie = sorted(r['fecha'] for r in reservas)
+                registrar_auditoria(
+                    nombre_usuario or 'sistema',
+                    'reservas',
+                    'INSERT',
+                    f"Serie de {len(reservas)} reservas creada para cliente {id_cliente} en cancha {id_cancha} "
+                    f"({fechas_serie[0]} a {fechas_serie[-1]}, {hora_inicio.isoformat()} - {hora_fin.isoformat()})",
+                    None,
+                    {
+                        'ids': [r['id'] for r in reservas],
+                        'fechas': fechas_serie,
+                        'id_cliente': id_cliente,
+                        'id_cancha': id_cancha,
+                        'hora_inicio': hora_inicio.isoformat(),
+                        'hora_fin': hora_fin.isoformat(),
+                        'estado': estado,
+                        'monto_por_reserva': reservas[0].get('monto_total')
+                    }
+                )
+            return reservas
         
-        return reserva.data[0]
+        except Exception as e:
+            if es_solapamiento(e):
+                medicion['resultado'] = 'conflicto'
+                RESERVAS_CONFLICTOS.inc(origen='base')
+                raise HorarioOcupadoError('Ya existe una reserva en ese horario')
+            raise Exception(f'Error al crear la serie de reservas: {str(e)}')
+
+# Cabecera con el usuario de la aplicación; los triggers de auditoría la leen
+# de request.headers (PostgREST) para registrar quién hizo el cambio
+CABECERA_USUARIO = 'x-usuario-app'
+
+# Fuentes de auditoría si no se puede leer la tabla auditoria_fuentes
+FUENTES_AUDITORIA = {'clientes': 'trigger', 'reservas': 'trigger'}
+
+_fuentes_auditoria: Optional[Dict[str, str]] = None
+
+def como_usuario(consulta, nombre_usuario: Optional[str]):
+    """
+    Agrega a una consulta sin ejecutar la cabecera con el usuario de la aplicación.
     
-    except Exception as e:
-        raise Exception(f'Error al crear la reserva: {str(e)}')
+    Args:
+        consulta: Query builder o llamada rpc() (Supabase o backend local)
+        nombre_usuario: Usuario que realiza la acción
+    
+    Returns:
+        La misma consulta, para seguir encadenando
+    """
+    if nombre_usuario:
+        cabeceras = consulta.request.headers if hasattr(consulta, 'request') else consulta.headers
+        cabeceras[CABECERA_USUARIO] = nombre_usuario
+    return consulta
+
+def fuente_auditoria(tabla: str) -> str:
+    """
+    Devuelve quién audita los cambios de una tabla: 'trigger' o 'aplicacion'.
+    
+    La configuración se lee una vez por proceso de la tabla auditoria_fuentes,
+    la misma que consultan los triggers, así nunca se registran ambas. Si la
+    lectura falla se usa FUENTES_AUDITORIA (los valores del script) por el
+    resto del proceso: reintentar en cada escritura podría elegir fuentes
+    distintas para la misma tabla.
+    """
+    global _fuentes_auditoria
+    if _fuentes_auditoria is None:
+        try:
+            filas = supabase.table('auditoria_fuentes').select('tabla, fuente').execute().data
+            _fuentes_auditoria = {f['tabla']: f['fuente'] for f in filas}
+        except Exception as e:
+            print(f"Error al leer auditoria_fuentes, se usan las fuentes por defecto: {str(e)}")  # Para debugging
+            _fuentes_auditoria = dict(FUENTES_AUDITORIA)
+    return _fuentes_auditoria.get(tabla, 'aplicacion')
+
+def auditar_en_aplicacion(tabla: str) -> bool:
+    """Indica si los cambios de la tabla se registran desde Python."""
+    return fuente_auditoria(tabla) != 'trigger'
 
 def registrar_auditoria(
     nombre_usuario: str,
@@ -108,6 +368,12 @@ def registrar_auditoria(
     """
     Registra una entrada en la bitácora de auditoría.
     
+    En los UPDATE se guardan solo los campos modificados (ver
+    components.auditoria.calcular_diferencias). La entrada se encola y la
+    escribe en segundo plano el escritor de components.auditoria (por
+    lotes), así que no agrega latencia a la operación y un fallo de la
+    bitácora no la interrumpe.
+    
     Args:
         nombre_usuario: Nombre del usuario que realiza la acción
         tabla_afectada: Nombre de la tabla afectada
@@ -117,95 +383,273 @@ def registrar_auditoria(
         datos_nuevos: Datos después del cambio (para INSERT/UPDATE)
     
     Returns:
-        Dict con la información del registro de auditoría
+        Dict con la entrada encolada
     """
-    try:
-        auditoria = supabase.table('auditoria_bitacora').insert({
-            'nombre_usuario': nombre_usuario,
-            'tabla_afectada': tabla_afectada,
-            'tipo_accion': tipo_accion,
-            'descripcion_detallada': descripcion,
-            'datos_anteriores': datos_anteriores,
-            'datos_nuevos': datos_nuevos,
-            'hora_inicio_ingreso': datetime.now().isoformat()
-        }).execute()
-        
-        return auditoria.data[0]
+    from components.auditoria import obtener_escritor, calcular_diferencias, AUDITORIA_ENTRADAS
     
-    except Exception as e:
-        raise Exception(f'Error al registrar auditoría: {str(e)}')
+    # Fechas y otros tipos no JSON se guardan como texto
+    datos_anteriores = json.loads(json.dumps(datos_anteriores, default=str))
+    datos_nuevos = json.loads(json.dumps(datos_nuevos, default=str))
+    if tipo_accion == 'UPDATE':
+        datos_anteriores, datos_nuevos = calcular_diferencias(datos_anteriores, datos_nuevos)
+    
+    ahora = datetime.now().isoformat()
+    entrada = {
+        'nombre_usuario': nombre_usuario,
+        'tabla_afectada': tabla_afectada,
+        'id_registro': (datos_nuevos or datos_anteriores or {}).get('id'),
+        'tipo_accion': tipo_accion,
+        'descripcion_detallada': descripcion,
+        'datos_anteriores': datos_anteriores,
+        'datos_nuevos': datos_nuevos,
+        'hora_inicio_ingreso': ahora,
+        # Hora del evento, no la de la escritura del lote
+        'created_at': ahora
+    }
+    obtener_escritor().registrar(entrada)
+    AUDITORIA_ENTRADAS.inc(tipo_accion=tipo_accion)
+    return entrada
 
-def obtener_reservas_completas():
+# Columnas de reservas que se piden por defecto (sin campos de control)
+COLUMNAS_RESERVA = [
+    'id', 'id_cliente', 'id_cancha', 'fecha', 'hora_inicio', 'hora_fin',
+    'estado', 'monto_total', 'anticipo', 'observaciones'
+]
+
+def limpiar_busqueda(busqueda: str) -> str:
+    """
+    Quita de un texto de búsqueda los caracteres reservados de la sintaxis
+    de filtros de PostgREST (comas, paréntesis y comodines).
+    """
+    return ''.join(c for c in busqueda if c not in ',()%*\\').strip()
+
+def consulta_reservas_completas(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    estado: Optional[str] = None,
+    id_cancha: Optional[int] = None,
+    id_cliente: Optional[int] = None,
+    busqueda: Optional[str] = None,
+    columnas: Optional[List[str]] = None,
+    conteo: Optional[str] = None
+):
     """
-    Obtiene todas las reservas con sus detalles completos incluyendo información de canchas y clientes.
+    Construye (sin ejecutar) la consulta de reservas con sus detalles de
+    cliente y cancha. Todos los filtros se envían a la base de datos.
+    
+    Args:
+        fecha_inicio: Fecha mínima de la reserva (inclusive)
+        fecha_fin: Fecha máxima de la reserva (inclusive)
+        estado: Estado de la reserva
+        id_cancha: ID de la cancha
+        id_cliente: ID del cliente
+        busqueda: Texto a buscar en el nombre o apellido del cliente
+        columnas: Columnas de reservas a devolver (por defecto COLUMNAS_RESERVA)
+        conteo: Método de conteo de PostgREST ('exact', 'planned', 'estimated')
     
     Returns:
-        List[Dict] con todas las reservas y sus detalles
+        Query builder listo para ordenar, paginar o ejecutar
+    """
+    busqueda = limpiar_busqueda(busqueda or '')
+    
+    # Con búsqueda por cliente el join debe ser inner para filtrar las reservas
+    join_clientes = 'clientes!inner' if busqueda else 'clientes:id_cliente'
+    seleccion = f"""
+        {', '.join(columnas or COLUMNAS_RESERVA)},
+        {join_clientes} (
+            id,
+            nombre,
+            apellido
+        ),
+        canchas:id_cancha (
+            id,
+            nombre,
+            tipos_cancha:id_tipo (
+                id,
+                nombre,
+                precio_por_hora
+            )
+        )
+    """
+    
+    query = supabase.from_('reservas').select(seleccion, count=conteo)
+    
+    if fecha_inicio:
+        query = query.gte('fecha', fecha_inicio.isoformat())
+    if fecha_fin:
+        query = query.lte('fecha', fecha_fin.isoformat())
+    if estado:
+        query = query.eq('estado', estado)
+    if id_cancha:
+        query = query.eq('id_cancha', id_cancha)
+    if id_cliente:
+        query = query.eq('id_cliente', id_cliente)
+    if busqueda:
+        query = query.or_(
+            f"nombre.ilike.%{busqueda}%,apellido.ilike.%{busqueda}%",
+            reference_table='clientes'
+        )
+    
+    return query
+
+def obtener_reservas_completas(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    estado: Optional[str] = None,
+    id_cancha: Optional[int] = None,
+    id_cliente: Optional[int] = None,
+    busqueda: Optional[str] = None,
+    columnas: Optional[List[str]] = None
+):
+    """
+    Obtiene las reservas con sus detalles completos incluyendo información de canchas y clientes.
+    
+    Los filtros se aplican en la base de datos, por lo que solo se transfieren
+    las reservas que cumplen los criterios (ver consulta_reservas_completas).
+    
+    Returns:
+        Respuesta con data conteniendo la lista de reservas y sus detalles
     """
     try:
-        return supabase.from_('reservas')\
-            .select('''
-                *,
-                clientes:id_cliente (
-                    id,
-                    nombre,
-                    apellido
-                ),
-                canchas:id_cancha (
-                    id,
-                    nombre,
-                    tipos_cancha:id_tipo (
-                        id,
-                        nombre,
-                        precio_por_hora
-                    )
-                )
-            ''')\
-            .execute()
+        return consulta_reservas_completas(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            estado=estado,
+            id_cancha=id_cancha,
+            id_cliente=id_cliente,
+            busqueda=busqueda,
+            columnas=columnas
+        ).execute()
     except Exception as e:
         raise Exception(f'Error al obtener reservas completas: {str(e)}')
 
-def obtener_estadisticas_canchas():
+def _parametros_rango(fecha_inicio: Optional[date], fecha_fin: Optional[date]) -> Dict[str, Any]:
+    """Parámetros de rango de fechas de las funciones de reporte (None = sin límite)."""
+    return {
+        'p_fecha_inicio': fecha_inicio.isoformat() if fecha_inicio else None,
+        'p_fecha_fin': fecha_fin.isoformat() if fecha_fin else None
+    }
+
+@cronometrar(REPORTES_SEGUNDOS, reporte='estadisticas_canchas')
+def obtener_estadisticas_canchas(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None
+):
     """
-    Obtiene estadísticas de uso por cancha.
+    Obtiene estadísticas de uso por cancha en un rango de fechas.
+    
+    La agregación se resuelve en la base de datos con la función
+    estadisticas_uso_canchas (sobre el resumen diario por cancha), por lo
+    que se hace una sola consulta sin importar el número de canchas.
+    
+    Args:
+        fecha_inicio: Fecha inicial del rango (inclusive). None = sin límite
+        fecha_fin: Fecha final del rango (inclusive). None = sin límite
     
     Returns:
-        Dict con data conteniendo lista de estadísticas por cancha
+        Respuesta con data conteniendo una fila por cancha con id, nombre_cancha,
+        tipo_cancha, total_reservas, horas_reservadas e ingresos_totales
     """
     try:
-        # Primero obtenemos todas las canchas con sus tipos
-        response = supabase.from_('canchas')\
-            .select('''
-                id,
-                nombre,
-                tipos_cancha!inner (
-                    nombre,
-                    precio_por_hora
-                )
-            ''')\
-            .execute()
-        
-        if not response.data:
-            return {"data": []}
-
-        # Luego obtenemos las reservas para cada cancha
-        for cancha in response.data:
-            # Obtener reservas para esta cancha
-            reservas = supabase.from_('reservas')\
-                .select('fecha, hora_inicio, hora_fin, monto_total')\
-                .eq('id_cancha', cancha['id'])\
-                .neq('estado', 'cancelada')\
-                .execute()
-            
-            # Agregar las reservas a los datos de la cancha
-            cancha['reservas'] = reservas.data if reservas.data else []
-        
-        return response
+        return supabase.rpc(
+            'estadisticas_uso_canchas',
+            _parametros_rango(fecha_inicio, fecha_fin)
+        ).execute()
         
     except Exception as e:
         print(f"Error en obtener_estadisticas_canchas: {str(e)}")  # Para debugging
         raise Exception(f'Error al obtener estadísticas de canchas: {str(e)}')
 
+@cronometrar(REPORTES_SEGUNDOS, reporte='ingresos_diarios')
+def obtener_ingresos_diarios(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None
+):
+    """
+    Obtiene los ingresos por día (sin reservas canceladas) con reporte_ingresos_diarios.
+    
+    Returns:
+        Respuesta con data conteniendo fecha, total_reservas e ingresos_totales
+        por cada día con reservas
+    """
+    try:
+        return supabase.rpc('reporte_ingresos_diarios', _parametros_rango(fecha_inicio, fecha_fin)).execute()
+    except Exception as e:
+        raise Exception(f'Error al obtener ingresos diarios: {str(e)}')
+
+@cronometrar(REPORTES_SEGUNDOS, reporte='reservas_por_estado')
+def obtener_reservas_por_estado(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None
+):
+    """
+    Obtiene la cantidad de reservas e ingresos por estado con reporte_reservas_estado.
+    
+    Returns:
+        Respuesta con data conteniendo estado, total_reservas e ingresos_totales
+    """
+    try:
+        return supabase.rpc('reporte_reservas_estado', _parametros_rango(fecha_inicio, fecha_fin)).execute()
+    except Exception as e:
+        raise Exception(f'Error al obtener reservas por estado: {str(e)}')
+
+@cronometrar(REPORTES_SEGUNDOS, reporte='top_clientes')
+def obtener_top_clientes(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    limite: int = 10
+):
+    """
+    Obtiene los clientes con más reservas y con más gasto con reporte_top_clientes.
+    
+    Args:
+        fecha_inicio: Fecha inicial del rango (inclusive). None = sin límite
+        fecha_fin: Fecha final del rango (inclusive). None = sin límite
+        limite: Clientes de cada ranking
+    
+    Returns:
+        Respuesta con data conteniendo id, nombre_cliente, total_reservas,
+        gasto_total, posicion_reservas y posicion_gasto (los clientes que están
+        entre los primeros `limite` de alguno de los dos rankings)
+    """
+    try:
+        return supabase.rpc(
+            'reporte_top_clientes',
+            {**_parametros_rango(fecha_inicio, fecha_fin), 'p_limite': limite}
+        ).execute()
+    except Exception as e:
+        raise Exception(f'Error al obtener los clientes principales: {str(e)}')
+
+@cronometrar(REPORTES_SEGUNDOS, reporte='fidelizacion_clientes')
+def obtener_fidelizacion_clientes(
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    reservas_frecuente: int = 3
+) -> Dict[str, int]:
+    """
+    Obtiene las métricas de fidelización con reporte_fidelizacion_clientes.
+    
+    Args:
+        fecha_inicio: Fecha inicial del rango (inclusive). None = sin límite
+        fecha_fin: Fecha final del rango (inclusive). None = sin límite
+        reservas_frecuente: Un cliente es frecuente con más de esta cantidad de reservas
+    
+    Returns:
+        Dict con clientes_unicos y clientes_frecuentes
+    """
+    try:
+        response = supabase.rpc(
+            'reporte_fidelizacion_clientes',
+            {**_parametros_rango(fecha_inicio, fecha_fin), 'p_reservas_frecuente': reservas_frecuente}
+        ).execute()
+        fila = (response.data or [{}])[0]
+        return {
+            'clientes_unicos': int(fila.get('clientes_unicos') or 0),
+            'clientes_frecuentes': int(fila.get('clientes_frecuentes') or 0)
+        }
+    except Exception as e:
+        raise Exception(f'Error al obtener métricas de fidelización: {str(e)}')
+
 def obtener_horarios_cancha(id_cancha: int):
     """
     Obtiene los horarios disponibles de una cancha específica.
@@ -240,4 +684,54 @@ def obtener_horarios_cancha(id_cancha: int):
         return response.data
     except Exception as e:
         print(f"Error en obtener_horarios_cancha: {str(e)}")  # Para debugging
-        raise Exception(f'Error al obtener horarios de la cancha: {str(e)}')
\ No newline at end of file
+        raise Exception(f'Error al obtener horarios de la cancha: {str(e)}')
+
+def crear_horarios_cancha(
+    id_cancha: int,
+    dias_semana: List[int],
+    hora_inicio: time,
+    hora_fin: time,
+    nombre_usuario: str
+) -> List[Dict[str, Any]]:
+    """
+    Crea los horarios de funcionamiento de una cancha con una sola inserción.
+    
+    Se registra una entrada de auditoría por horario; registrar_auditoria
+    solo las encola y el escritor las envía juntas en un lote.
+    
+    Args:
+        id_cancha: ID de la cancha
+        dias_semana: Días de la semana (1 = lunes ... 7 = domingo)
+        hora_inicio: Hora de apertura
+        hora_fin: Hora de cierre
+        nombre_usuario: Usuario de la aplicación para la bitácora de auditoría
+    
+    Returns:
+        List[Dict] con los horarios creados
+    """
+    try:
+        data = [
+            {
+                'id_cancha': id_cancha,
+                'dia_semana': dia,
+                'hora_inicio': hora_inicio.isoformat(),
+                'hora_fin': hora_fin.isoformat()
+            }
+            for dia in dias_semana
+        ]
+        response = supabase.table('horarios_disponibles').insert(data).execute()
+        horarios = response.data or data
+        
+        for horario in horarios:
+            registrar_auditoria(
+                nombre_usuario,
+                'horarios_disponibles',
+                'INSERT',
+                f"Se creó horario para la cancha {id_cancha}, día {horario['dia_semana']}",
+                None,
+                horario
+            )
+        
+        return horarios
+    except Exception as e:
+        raise Exception(f'Error al crear horarios de la cancha: {str(e)}')
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""
+Índice en memoria de disponibilidad de canchas.
+
+Guarda, por cancha y por día, los intervalos reservados (en minutos desde la
+medianoche) ordenados por hora de inicio, y los horarios de funcionamiento por
+día de la semana. Con eso la verificación de conflictos es una búsqueda
+binaria en memoria en lugar de dos consultas HTTP por cada rerun.
+
+El índice es único por proceso (lo comparten todas las sesiones), se carga para
+una ventana de días y se mantiene al día con registrar()/quitar() cuando la
+aplicación crea o cancela reservas. La restricción de la base de datos sigue
+siendo la garantía final frente a escrituras de otros procesos.
+"""
+import threading
+from bisect import bisect_left, insort
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from components.database import obtener_cliente, RESERVAS_CONFLICTOS
+from components.metricas import contador
+
+# Días cargados a partir de hoy (la pantalla de reservas permite hasta 30)
+DIAS_VENTANA = 31
+
+# Segundos tras los cuales se recarga la ventana para ver cambios de otros procesos
+SEGUNDOS_VIGENCIA = 60
+
+# Resolución (minutos) de la grilla de turnos libres
+GRANULARIDAD_MINUTOS = 15
+
+# Accesos al índice: 'acierto' si la ventana cargada sirve, 'fallo' si hubo que recargarla
+INDICE_ACCESOS = contador(
+    'indice_disponibilidad_accesos_total', 'Accesos al índice de disponibilidad por resultado de caché', ('resultado',)
+)
+
+def a_minutos(hora: Any) -> int:
+    """Convierte una hora ('HH:MM[:SS]' o time) a minutos desde la medianoche."""
+    if isinstance(hora, time):
+        return hora.hour * 60 + hora.minute
+    return int(hora[:2]) * 60 + int(hora[3:5])
+
+def formatear_minutos(minutos: int) -> str:
+    """Convierte minutos desde la medianoche a 'HH:MM'."""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+class IndiceDisponibilidad:
+    """Intervalos reservados y horarios de funcionamiento por cancha y día."""
+
+    def __init__(self, dias_ventana: int = DIAS_VENTANA, segundos_vigencia: int = SEGUNDOS_VIGENCIA):
+        self.dias_ventana = dias_ventana
+        self.segundos_vigencia = segundos_vigencia
+        self._lock = threading.RLock()
+        self._desde: Optional[date] = None
+        self._hasta: Optional[date] = None
+        self._cargado_en: Optional[datetime] = None
+        # id_cancha -> dia_semana (1-7) -> [(inicio, fin)]
+        self._horarios: Dict[int, Dict[int, List[Tuple[int, int]]]] = {}
+        # (id_cancha, fecha ISO) -> [(inicio, fin, id_reserva)] ordenada por inicio
+        self._reservas: Dict[Tuple[int, str], List[Tuple[int, int, int]]] = {}
+        # id_reserva -> (id_cancha, fecha ISO) para poder quitarla
+        self._ubicacion: Dict[int, Tuple[int, str]] = {}
+
+    # --- Carga ---
+
+    def cargar(self, desde: date, hasta: date):
+        """
+        Carga horarios y reservas no canceladas del rango con una llamada.
+
+        La función indice_disponibilidad devuelve una fila por cancha con sus
+        horarios y reservas, así la respuesta no se trunca en max-rows de
+        PostgREST aunque la ventana tenga miles de reservas.
+
+        Args:
+            desde: Primera fecha de la ventana (inclusive)
+            hasta: Última fecha de la ventana (inclusive)
+        """
+        canchas = obtener_cliente().rpc('indice_disponibilidad', {
+            'p_fecha_inicio': desde.isoformat(),
+            'p_fecha_fin': hasta.isoformat()
+        }).execute()
+
+        indice_horarios: Dict[int, Dict[int, List[Tuple[int, int]]]] = {}
+        indice_reservas: Dict[Tuple[int, str], List[Tuple[int, int, int]]] = {}
+        ubicacion: Dict[int, Tuple[int, str]] = {}
+        for cancha in canchas.data or []:
+            id_cancha = cancha['id_cancha']
+            for dia_semana, hora_inicio, hora_fin in cancha['horarios'] or []:
+                indice_horarios.setdefault(id_cancha, {}).setdefault(int(dia_semana), []).append(
+                    (a_minutos(hora_inicio), a_minutos(hora_fin))
+                )
+            for fecha, hora_inicio, hora_fin, id_reserva in cancha['reservas'] or []:
+                clave = (id_cancha, fecha)
+                indice_reservas.setdefault(clave, []).append((a_minutos(hora_inicio), a_minutos(hora_fin), id_reserva))
+                ubicacion[id_reserva] = clave
+        for intervalos in indice_reservas.values():
+            intervalos.sort()
+
+        with self._lock:
+            self._horarios = indice_horarios
+            self._reservas = indice_reservas
+            self._ubicacion = ubicacion
+            self._desde, self._hasta = desde, hasta
+            self._cargado_en = datetime.now()
+
+    def asegurar_ventana(self, fecha: date, contar: bool = True, desde: Optional[date] = None):
+        """
+        Carga (o recarga) la ventana si la fecha queda fuera o si venció.
+
+        Args:
+            fecha: Fecha que la ventana debe incluir
+            contar: Registrar el acceso en INDICE_ACCESOS (False en las
+                llamadas internas, así cada consulta pública cuenta una vez)
+            desde: Si se indica, la ventana debe incluir todo [desde, fecha]
+        """
+        desde = fecha if desde is None else min(desde, fecha)
+        with self._lock:
+            vigente = (
+                self._cargado_en is not None
+                and (datetime.now() - self._cargado_en).total_seconds() < self.segundos_vigencia
+                and self._desde <= desde
+                and fecha <= self._hasta
+            )
+            if contar:
+                INDICE_ACCESOS.inc(resultado='acierto' if vigente else 'fallo')
+            if vigente:
+                return
+            self.cargar(min(date.today(), desde), max(fecha, date.today() + timedelta(days=self.dias_ventana)))
+
+    def invalidar(self):
+        """Descarta los datos cargados; la próxima consulta recarga la ventana."""
+        with self._lock:
+            self._cargado_en = None
+
+    # --- Consultas ---
+
+    def horarios(self, id_cancha: int, dia_semana: int) -> List[Tuple[int, int]]:
+        """Horarios de funcionamiento (minutos) de la cancha para el día (1-7)."""
+        return self._horarios.get(id_cancha, {}).get(dia_semana, [])
+
+    def reservas_del_dia(self, id_cancha: int, fecha: date) -> List[Tuple[int, int, int]]:
+        """Intervalos reservados (inicio, fin, id) de la cancha en la fecha."""
+        self.asegurar_ventana(fecha, contar=False)
+        return list(self._reservas.get((id_cancha, fecha.isoformat()), []))
+
+    def buscar_conflicto(self, id_cancha: int, fecha: date, inicio: int, fin: int) -> Optional[Tuple[int, int, int]]:
+        """
+        Devuelve la reserva que se solapa con [inicio, fin) o None.
+
+        Como las reservas de una cancha no se solapan entre sí, al ordenarlas por
+        inicio también quedan ordenadas por fin: basta mirar la última reserva
+        que empieza antes de `fin`.
+        """
+        self.asegurar_ventana(fecha, contar=False)
+        with self._lock:
+            intervalos = self._reservas.get((id_cancha, fecha.isoformat()))
+            if not intervalos:
+                return None
+            posicion = bisect_left(intervalos, (fin, -1, -1))
+            if posicion > 0 and intervalos[posicion - 1][1] > inicio:
+                return intervalos[posicion - 1]
+            return None
+
+    def verificar(self, id_cancha: int, fecha: date, hora_inicio: time, hora_fin: time) -> Tuple[bool, str]:
+        """
+        Verifica horario de funcionamiento y conflictos de una posible reserva.
+
+        Returns:
+            Tuple con (disponible, mensaje)
+        """
+        self.asegurar_ventana(fecha)
+        inicio, fin = a_minutos(hora_inicio), a_minutos(hora_fin)
+
+        horarios = self.horarios(id_cancha, fecha.weekday() + 1)  # Python: 0-6, BD: 1-7
+        if not horarios:
+            return False, "No hay horario definido para este día"
+        if not any(h_inicio <= inicio and fin <= h_fin for h_inicio, h_fin in horarios):
+            rangos = ', '.join(f"{formatear_minutos(a)} - {formatear_minutos(b)}" for a, b in horarios)
+            return False, f"El horario está fuera del rango permitido ({rangos})"
+
+        conflicto = self.buscar_conflicto(id_cancha, fecha, inicio, fin)
+        if conflicto:
+            RESERVAS_CONFLICTOS.inc(origen='indice')
+            return False, f"Ya existe una reserva en el horario {formatear_minutos(conflicto[0])} - {formatear_minutos(conflicto[1])}"
+
+        return True, "Horario disponible"
+
+    def verificar_serie(
+        self,
+        id_cancha: int,
+        fechas: List[date],
+        hora_inicio: time,
+        hora_fin: time
+    ) -> List[Tuple[date, bool, str]]:
+        """
+        Verifica todas las ocurrencias de una serie recurrente.
+        
+        Las fechas pueden quedar fuera de la ventana del índice (una temporada
+        completa), así que las reservas de la cancha en esas fechas se leen con
+        una sola consulta; los horarios de funcionamiento salen del índice.
+        
+        Returns:
+            List[Tuple] con (fecha, disponible, mensaje) por ocurrencia
+        """
+        self.asegurar_ventana(date.today())
+        inicio, fin = a_minutos(hora_inicio), a_minutos(hora_fin)
+        
+        reservas = obtener_cliente().table('reservas')\
+            .select('fecha, hora_inicio, hora_fin')\
+            .eq('id_cancha', id_cancha)\
+            .in_('fecha', [f.isoformat() for f in fechas])\
+            .neq('estado', 'cancelada')\
+            .execute()
+        por_fecha: Dict[str, List[Tuple[int, int]]] = {}
+        for r in reservas.data or []:
+            por_fecha.setdefault(r['fecha'], []).append((a_minutos(r['hora_inicio']), a_minutos(r['hora_fin'])))
+        
+        resultados = []
+        for fecha in fechas:
+            horarios = self.horarios(id_cancha, fecha.weekday() + 1)
+            if not any(h_inicio <= inicio and fin <= h_fin for h_inicio, h_fin in horarios):
+                resultados.append((fecha, False, "Fuera del horario de funcionamiento"))
+                continue
+            conflicto = next(
+                (r for r in sorted(por_fecha.get(fecha.isoformat(), [])) if r[0] < fin and r[1] > inicio),
+                None
+            )
+            if conflicto:
+                resultados.append((
+                    fecha, False,
+                    f"Ocupado {formatear_minutos(conflicto[0])} - {formatear_minutos(conflicto[1])}"
+                ))
+            else:
+                resultados.append((fecha, True, "Disponible"))
+        return resultados
+
+    # --- Turnos libres (grilla vectorizada) ---
+
+    def turnos_libres(
+        self,
+        ids_cancha: List[int],
+        desde: date,
+        dias: int,
+        duracion_minutos: int,
+        granularidad: int = GRANULARIDAD_MINUTOS
+    ) -> Dict[str, Any]:
+        """
+        Calcula todos los inicios posibles de un turno de la duración pedida
+        para varias canchas y días.
+        
+        Arma una grilla booleana (cancha x día x franja) con el horario de
+        funcionamiento, le resta las franjas reservadas y marca como inicio
+        válido cada franja seguida de suficientes franjas libres.
+        
+        Args:
+            ids_cancha: Canchas a considerar
+            desde: Primer día
+            dias: Cantidad de días
+            duracion_minutos: Duración del turno buscado
+            granularidad: Minutos por franja
+        
+        Returns:
+            Dict con 'canchas', 'fechas', 'granularidad' e 'inicios'
+            (np.ndarray bool de forma cancha x día x franja)
+        """
+        hasta = desde + timedelta(days=dias - 1)
+        self.asegurar_ventana(hasta, desde=desde)
+        
+        franjas = 24 * 60 // granularidad
+        necesarias = -(-duracion_minutos // granularidad)
+        fechas = [desde + timedelta(days=d) for d in range(dias)]
+        indice_cancha = {id_cancha: i for i, id_cancha in enumerate(ids_cancha)}
+        
+        with self._lock:
+            # Capacidad por cancha y día de la semana: +1 al abrir, -1 al cerrar
+            semanal = np.zeros((len(ids_cancha), 7, franjas + 1), dtype=np.int16)
+            for id_cancha, por_dia in self._horarios.items():
+                if id_cancha not in indice_cancha:
+                    continue
+                for dia_semana, intervalos in por_dia.items():
+                    for inicio, fin in intervalos:
+                        semanal[indice_cancha[id_cancha], dia_semana - 1, -(-inicio // granularidad)] += 1
+                        semanal[indice_cancha[id_cancha], dia_semana - 1, fin // granularidad] -= 1
+            
+            # Ocupación por cancha y fecha, con el mismo truco de diferencias
+            ocupado = np.zeros((len(ids_cancha), dias, franjas + 1), dtype=np.int16)
+            posicion_fecha = {f.isoformat(): d for d, f in enumerate(fechas)}
+            filas, columnas, inicios, fines = [], [], [], []
+            for (id_cancha, fecha), intervalos in self._reservas.items():
+                if id_cancha not in indice_cancha or fecha not in posicion_fecha:
+                    continue
+                for inicio, fin, _ in intervalos:
+                    filas.append(indice_cancha[id_cancha])
+                    columnas.append(posicion_fecha[fecha])
+                    inicios.append(inicio // granularidad)
+                    fines.append(-(-fin // granularidad))
+        
+        if filas:
+            np.add.at(ocupado, (filas, columnas, inicios), 1)
+            np.add.at(ocupado, (filas, columnas, fines), -1)
+        
+        dias_semana = np.array([f.weekday() for f in fechas], dtype=np.intp)
+        abierto = np.cumsum(semanal, axis=-1)[:, dias_semana, :franjas] > 0
+        libre = abierto & (np.cumsum(ocupado, axis=-1)[..., :franjas] == 0)
+        
+        # Un inicio es válido si las `necesarias` franjas siguientes están libres
+        acumulado = np.concatenate(
+            [np.zeros(libre.shape[:-1] + (1,), dtype=np.int32), np.cumsum(libre, axis=-1, dtype=np.int32)],
+            axis=-1
+        )
+        validos = np.zeros_like(libre)
+        if necesarias <= franjas:
+            validos[..., :franjas - necesarias + 1] = (
+                acumulado[..., necesarias:] - acumulado[..., :-necesarias]
+            ) == necesarias
+        
+        # No ofrecer turnos que ya empezaron hoy
+        if desde <= date.today() <= hasta:
+            ahora = datetime.now()
+            validos[:, (date.today() - desde).days, :-(-(ahora.hour * 60 + ahora.minute) // granularidad)] = False
+        
+        return {
+            'canchas': list(ids_cancha),
+            'fechas': fechas,
+            'granularidad': granularidad,
+            'inicios': validos
+        }
+
+    # --- Mantenimiento incremental ---
+
+    def registrar(self, reserva: Dict[str, Any]):
+        """
+        Refleja en el índice una reserva creada o modificada.
+
+        Si la reserva está cancelada se quita; en otro caso se (re)inserta.
+        Las fechas fuera de la ventana cargada se ignoran.
+        """
+        with self._lock:
+            self.quitar(reserva['id'])
+            if reserva.get('estado') == 'cancelada' or self._cargado_en is None:
+                return
+            fecha = date.fromisoformat(str(reserva['fecha'])[:10])
+            if not (self._desde <= fecha <= self._hasta):
+                return
+            clave = (reserva['id_cancha'], fecha.isoformat())
+            insort(
+                self._reservas.setdefault(clave, []),
+                (a_minutos(reserva['hora_inicio']), a_minutos(reserva['hora_fin']), reserva['id'])
+            )
+            self._ubicacion[reserva['id']] = clave
+
+    def quitar(self, id_reserva: int):
+        """Quita una reserva del índice (por ejemplo al cancelarla)."""
+        with self._lock:
+            clave = self._ubicacion.pop(id_reserva, None)
+            if clave is None:
+                return
+            self._reservas[clave] = [r for r in self._reservas[clave] if r[2] != id_reserva]
+
+# Índice compartido por todas las sesiones del proceso
+_indice = IndiceDisponibilidad()
+
+def obtener_indice() -> IndiceDisponibilidad:
+    """Devuelve el índice de disponibilidad del proceso."""
+    return _indice
+
+def fechas_serie(inicio: date, fin: date, semanas_intervalo: int = 1) -> List[date]:
+    """
+    Fechas de una serie recurrente, el mismo día de la semana que `inicio`.
+    
+    Args:
+        inicio: Primera ocurrencia
+        fin: Última fecha posible (inclusive)
+        semanas_intervalo: 1 = semanal, 2 = quincenal
+    """
+    fechas = []
+    fecha = inicio
+    while fecha <= fin:
+        fechas.append(fecha)
+        fecha += timedelta(weeks=semanas_intervalo)
+    return fechas
+
+def fechas_sin_turnos(turnos: Dict[str, Any], id_cancha: Optional[int] = None) -> List[date]:
+    """
+    Fechas sin ningún turno libre, para una cancha o para todas.
+    
+    Args:
+        turnos: Resultado de IndiceDisponibilidad.turnos_libres
+        id_cancha: Cancha a evaluar (None = ninguna cancha tiene turnos)
+    """
+    inicios = turnos['inicios']
+    if id_cancha is not None:
+        hay_turno = inicios[turnos['canchas'].index(id_cancha)].any(axis=-1)
+    else:
+        hay_turno = inicios.any(axis=(0, 2))
+    return [f for f, hay in zip(turnos['fechas'], hay_turno) if not hay]
+
+def horas_libres(turnos: Dict[str, Any], id_cancha: int, fecha: date) -> List[time]:
+    """Horas de inicio libres de una cancha en una fecha."""
+    if id_cancha not in turnos['canchas'] or fecha not in turnos['fechas']:
+        return []
+    franjas = turnos['inicios'][turnos['canchas'].index(id_cancha), turnos['fechas'].index(fecha)]
+    minutos = np.flatnonzero(franjas) * turnos['granularidad']
+    return [time(int(m) // 60, int(m) % 60) for m in minutos]
@@ -0,0 +1,390 @@
+"""
+Exportación de reservas, reportes y bitácora a CSV, CSV comprimido o Parquet.
+
+Las exportaciones grandes no se arman en memoria: exportar_consulta recorre
+la consulta con paginación por cursor (obtener_pagina) y escribe cada página
+en el archivo a medida que llega, de modo que el proceso de Streamlit
+mantiene en memoria una sola página sin importar el rango. El archivo queda
+en EXPORTACION_DIRECTORIO y la página lo ofrece con st.download_button.
+
+También se puede usar desde la línea de comandos, sin Streamlit:
+    python -m components.exportacion reservas --desde 2023-01-01 --hasta 2025-12-31 --formato Parquet
+"""
+import argparse
+import gzip
+import io
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import streamlit as st
+
+from components.database import consulta_reservas_completas, obtener_cliente, leer_configuracion
+from components.archivo_auditoria import ESQUEMA_ARCHIVO, normalizar_registros, iterar_archivo
+from components.transformaciones import normalizar_reservas, SEPARADOR
+from components.utils import obtener_pagina
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV comprimido': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# Filas leídas por consulta (y escritas por bloque)
+FILAS_POR_LECTURA = 1000
+
+# Horas que se conservan los archivos generados antes de borrarlos
+HORAS_RETENCION = 24
+
+ORDEN_RESERVAS = [('fecha', False), ('hora_inicio', False), ('id', False)]
+ORDEN_BITACORA = [('created_at', False), ('id', False)]
+
+ESQUEMA_RESERVAS = pa.schema([
+    ('id', pa.int64()),
+    ('fecha', pa.date32()),
+    ('hora_inicio', pa.string()),
+    ('hora_fin', pa.string()),
+    ('estado', pa.string()),
+    ('monto_total', pa.float64()),
+    ('anticipo', pa.float64()),
+    ('horas', pa.float64()),
+    ('observaciones', pa.string()),
+    ('id_cliente', pa.int64()),
+    ('nombre_cliente', pa.string()),
+    ('id_cancha', pa.int64()),
+    ('nombre_cancha', pa.string()),
+    ('tipo_cancha', pa.string()),
+])
+
+class EscritorTabular:
+    """
+    Escribe DataFrames por bloques en un archivo CSV, CSV comprimido o Parquet.
+
+    Cada bloque se convierte a una tabla de Arrow con el esquema del archivo
+    (si no se indica, se toma del primer bloque), así los enteros con nulos
+    no terminan como 12.0 en el CSV. El CSV lleva BOM para que Excel
+    reconozca los acentos y la cabecera se escribe una sola vez.
+    """
+
+    def __init__(self, ruta: str, formato: str, esquema: Optional[pa.Schema] = None):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}")
+        self.ruta = ruta
+        self.formato = formato
+        self.esquema = esquema
+        self.filas = 0
+        self._archivo = None
+        self._escritor = None
+
+    def _abrir(self):
+        if self.formato == 'Parquet':
+            self._escritor = pq.ParquetWriter(self.ruta, self.esquema, compression='zstd')
+            return
+        if self.formato == 'CSV comprimido':
+            self._archivo = gzip.open(self.ruta, 'wb')
+        else:
+            self._archivo = open(self.ruta, 'wb')
+        self._archivo.write('\ufeff'.encode('utf-8'))
+        self._escritor = pa_csv.CSVWriter(self._archivo, self.esquema)
+
+    def escribir(self, df: pd.DataFrame):
+        """Agrega un bloque de filas al archivo."""
+        if self.esquema is None:
+            esquema = pa.Schema.from_pandas(df, preserve_index=False)
+            # Columnas sin valores en el primer bloque: se guardan como texto
+            self.esquema = pa.schema([
+                campo.with_type(pa.string()) if pa.types.is_null(campo.type) else campo
+                for campo in esquema
+            ])
+        if self._escritor is None:
+            self._abrir()
+        self._escritor.write_table(pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False))
+        self.filas += len(df)
+
+    def cerrar(self):
+        """Cierra el archivo; sin filas queda un archivo válido con solo la cabecera."""
+        if self._escritor is None:
+            self.escribir(pd.DataFrame(columns=self.esquema.names if self.esquema is not None else []))
+        self._escritor.close()
+        if self._archivo is not None:
+            self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+def exportar_consulta(
+    escritor: EscritorTabular,
+    construir_consulta: Callable[[Optional[str]], Any],
+    orden: List[Tuple[str, bool]],
+    convertir: Callable[[List[Dict]], pd.DataFrame],
+    progreso: Optional[Callable[[int, Optional[int]], None]] = None,
+    tamano: int = FILAS_POR_LECTURA
+) -> int:
+    """
+    Recorre una consulta por cursor y escribe cada página en el archivo.
+
+    Args:
+        escritor: Archivo de destino
+        construir_consulta: Función que recibe el método de conteo (o None) y
+            devuelve un query builder nuevo con los filtros aplicados
+        orden: Lista de (columna, descendente); la última columna debe ser única
+        convertir: Convierte las filas de una página en un DataFrame
+        progreso: Función (filas escritas, total estimado o None) llamada por página
+        tamano: Filas por consulta
+
+    Returns:
+        int con la cantidad de filas exportadas
+    """
+    cursor, total, exportadas = None, None, 0
+    while True:
+        # El conteo (estimado) se pide solo con la primera página
+        filas, cursor, conteo = obtener_pagina(
+            construir_consulta('estimated' if cursor is None else None),
+            orden,
+            cursor,
+            tamano
+        )
+        if conteo is not None:
+            total = conteo
+        if filas:
+            escritor.escribir(convertir(filas))
+            exportadas += len(filas)
+        if progreso:
+            progreso(exportadas, total)
+        if cursor is None:
+            return exportadas
+
+def convertir_reservas(filas: List[Dict]) -> pd.DataFrame:
+    """Reservas de consulta_reservas_completas con las columnas de ESQUEMA_RESERVAS."""
+    df = normalizar_reservas(filas)
+    df['fecha'] = df['fecha'].dt.date
+    df['anticipo'] = pd.to_numeric(df.get('anticipo'), errors='coerce')
+    df['tipo_cancha'] = df.get(f'canchas{SEPARADOR}tipos_cancha{SEPARADOR}nombre')
+    return df.reindex(columns=ESQUEMA_RESERVAS.names)
+
+def exportar_reservas(
+    ruta: str,
+    formato: str,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    estado: Optional[str] = None,
+    busqueda: Optional[str] = None,
+    progreso: Optional[Callable[[int, Optional[int]], None]] = None
+) -> int:
+    """
+    Exporta las reservas que cumplen los filtros (los mismos de la lista de
+    reservas), con nombre de cliente, cancha y tipo.
+
+    Returns:
+        int con la cantidad de reservas exportadas
+    """
+    try:
+        with EscritorTabular(ruta, formato, ESQUEMA_RESERVAS) as escritor:
+            return exportar_consulta(
+                escritor,
+                lambda conteo: consulta_reservas_completas(
+                    fecha_inicio=fecha_inicio,
+                    fecha_fin=fecha_fin,
+                    estado=estado,
+                    busqueda=busqueda,
+                    conteo=conteo
+                ),
+                ORDEN_RESERVAS,
+                convertir_reservas,
+                progreso
+            )
+    except Exception as e:
+        raise Exception(f'Error al exportar reservas: {str(e)}')
+
+def exportar_bitacora(
+    ruta: str,
+    formato: str,
+    fecha_inicio: date,
+    fecha_fin: date,
+    usuario: Optional[str] = None,
+    tipo_accion: Optional[str] = None,
+    progreso: Optional[Callable[[int, Optional[int]], None]] = None
+) -> int:
+    """
+    Exporta la bitácora del rango, incluidos los meses archivados, con todas
+    las columnas de ESQUEMA_ARCHIVO (los snapshots JSONB como texto JSON).
+
+    Primero se escriben los meses archivados (los más antiguos) y después la
+    tabla, todo en orden de created_at.
+
+    Returns:
+        int con la cantidad de registros exportados
+    """
+    def consulta(conteo):
+        query = obtener_cliente().table('auditoria_bitacora').select('*', count=conteo)\
+            .gte('created_at', fecha_inicio.isoformat())\
+            .lt('created_at', (fecha_fin + timedelta(days=1)).isoformat())
+        if usuario:
+            query = query.eq('nombre_usuario', usuario)
+        if tipo_accion:
+            query = query.eq('tipo_accion', tipo_accion)
+        return query
+
+    try:
+        with EscritorTabular(ruta, formato, ESQUEMA_ARCHIVO) as escritor:
+            for df in iterar_archivo(fecha_inicio, fecha_fin, usuario, tipo_accion):
+                escritor.escribir(df)
+            archivados = escritor.filas
+            return archivados + exportar_consulta(
+                escritor,
+                consulta,
+                ORDEN_BITACORA,
+                normalizar_registros,
+                None if progreso is None else lambda filas, total: progreso(
+                    archivados + filas, None if total is None else archivados + total
+                )
+            )
+    except Exception as e:
+        raise Exception(f'Error al exportar la bitácora: {str(e)}')
+
+def exportar_dataframe(df: pd.DataFrame, formato: str) -> bytes:
+    """
+    Serializa un DataFrame ya calculado (por ejemplo un reporte agregado)
+    en el formato pedido.
+
+    Returns:
+        bytes con el contenido del archivo
+    """
+    if formato == 'Parquet':
+        destino = io.BytesIO()
+        df.to_parquet(destino, index=False, compression='zstd')
+        return destino.getvalue()
+    contenido = df.to_csv(index=False).encode('utf-8-sig')
+    return gzip.compress(contenido) if formato == 'CSV comprimido' else contenido
+
+def directorio_exportacion() -> str:
+    """Directorio de los archivos generados (EXPORTACION_DIRECTORIO)."""
+    return leer_configuracion(
+        'EXPORTACION_DIRECTORIO',
+        os.path.join(tempfile.gettempdir(), 'exportaciones_reservas')
+    )
+
+def ruta_exportacion(nombre_base: str, formato: str) -> str:
+    """
+    Ruta nueva para una exportación. De paso borra los archivos generados
+    hace más de HORAS_RETENCION horas.
+    """
+    directorio = directorio_exportacion()
+    os.makedirs(directorio, exist_ok=True)
+    limite = time.time() - HORAS_RETENCION * 3600
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.isfile(ruta) and os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass  # Otro proceso pudo haberlo borrado
+    marca = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    return os.path.join(directorio, f"{nombre_base}_{marca}{FORMATOS[formato][0]}")
+
+def selector_formato(clave: str) -> str:
+    """Selector del formato de exportación."""
+    return st.selectbox("Formato", list(FORMATOS), key=f'formato_{clave}')
+
+def panel_exportacion(
+    clave: str,
+    nombre_base: str,
+    exportar: Callable[[str, str, Callable[[int, Optional[int]], None]], int],
+    filtros: Tuple = ()
+):
+    """
+    Muestra el formato, el botón para generar el archivo con barra de
+    progreso y el botón de descarga del último archivo generado.
+
+    Args:
+        clave: Prefijo único para el estado de la sesión
+        nombre_base: Nombre del archivo descargado (sin extensión)
+        exportar: Función (ruta, formato, progreso) -> filas exportadas
+        filtros: Valores de los filtros actuales; si cambian se descarta el archivo
+    """
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        formato = selector_formato(clave)
+
+    estado = st.session_state.get(f'exportacion_{clave}')
+    if estado and (
+        estado['filtros'] != filtros or estado['formato'] != formato or not os.path.exists(estado['ruta'])
+    ):
+        estado = None
+        st.session_state.pop(f'exportacion_{clave}', None)
+
+    with col2:
+        generar = st.button("Generar archivo", key=f'generar_{clave}')
+
+    if generar:
+        barra = st.progress(0.0, text="Exportando...")
+
+        def progreso(filas, total):
+            detalle = f"{filas:,} de ~{total:,}" if total else f"{filas:,}"
+            barra.progress(min(filas / total, 1.0) if total else 0.0, text=f"Exportando... {detalle} filas")
+
+        ruta = ruta_exportacion(nombre_base, formato)
+        try:
+            filas = exportar(ruta, formato, progreso)
+        except Exception as e:
+            barra.empty()
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            st.error(f"Error al generar el archivo: {str(e)}")
+            return
+        barra.empty()
+        estado = {'ruta': ruta, 'formato': formato, 'filtros': filtros, 'filas': filas}
+        st.session_state[f'exportacion_{clave}'] = estado
+
+    if estado:
+        extension, mime = FORMATOS[estado['formato']]
+        with open(estado['ruta'], 'rb') as archivo:
+            st.download_button(
+                f"⬇️ Descargar ({estado['filas']:,} filas)",
+                data=archivo,
+                file_name=f"{nombre_base}{extension}",
+                mime=mime,
+                key=f'descargar_{clave}'
+            )
+
+def boton_descarga(clave: str, etiqueta: str, nombre_base: str, df: pd.DataFrame, formato: str):
+    """Botón de descarga de un DataFrame ya calculado en el formato elegido."""
+    extension, mime = FORMATOS[formato]
+    st.download_button(
+        f"⬇️ {etiqueta}",
+        data=exportar_dataframe(df, formato),
+        file_name=f"{nombre_base}{extension}",
+        mime=mime,
+        key=f'descargar_{clave}'
+    )
+
+def _fecha(texto: str) -> date:
+    return date.fromisoformat(texto)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Exporta reservas o la bitácora a CSV/Parquet')
+    parser.add_argument('origen', choices=['reservas', 'bitacora'])
+    parser.add_argument('--desde', type=_fecha, required=True, help='Primer día (AAAA-MM-DD)')
+    parser.add_argument('--hasta', type=_fecha, required=True, help='Último día (AAAA-MM-DD)')
+    parser.add_argument('--formato', choices=list(FORMATOS), default='CSV comprimido')
+    parser.add_argument('--salida', help='Archivo de destino (por defecto en EXPORTACION_DIRECTORIO)')
+    args = parser.parse_args()
+
+    salida = args.salida or ruta_exportacion(args.origen, args.formato)
+    inicio = datetime.now()
+    mostrar = lambda filas, total: print(f"\r{filas:,} filas", end='', flush=True)
+    if args.origen == 'reservas':
+        cantidad = exportar_reservas(salida, args.formato, args.desde, args.hasta, progreso=mostrar)
+    else:
+        cantidad = exportar_bitacora(salida, args.formato, args.desde, args.hasta, progreso=mostrar)
+    print(f"\n{cantidad:,} filas exportadas a {salida} en {(datetime.now() - inicio).total_seconds():.1f} s")
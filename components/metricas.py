@@ -0,0 +1,317 @@
+"""
+Métricas del proceso en formato de texto de Prometheus.
+
+Registro en memoria de contadores, histogramas e indicadores con etiquetas,
+compartido por todas las sesiones del proceso de Streamlit. Los módulos
+declaran sus métricas al importarse (contador(), histograma(), indicador()
+devuelven la existente si ya está registrada con ese nombre) y las
+actualizan en los caminos que interesa vigilar: creación de reservas,
+autenticación, auditoría, reportes y el índice de disponibilidad.
+
+iniciar_exportador() expone el registro una vez por proceso:
+    METRICAS_PUERTO: servidor HTTP local con GET /metrics
+    METRICAS_ARCHIVO: archivo .prom reescrito cada METRICAS_SEGUNDOS
+                      (para el textfile collector de node_exporter)
+Sin ninguna de las dos las métricas se acumulan pero no se publican.
+"""
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterator
+
+# Límites (segundos) de los histogramas de latencia
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Intervalo por defecto (segundos) entre escrituras del archivo de métricas
+SEGUNDOS_ARCHIVO = 15
+
+TIPO_CONTENIDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _valor(numero: float) -> str:
+    if math.isinf(numero):
+        return '+Inf' if numero > 0 else '-Inf'
+    return repr(float(numero)) if not float(numero).is_integer() else str(int(numero))
+
+def _escapar(texto: Any) -> str:
+    return str(texto).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = '') -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return '{' + ','.join(partes) + '}' if partes else ''
+
+class _Metrica:
+    """Base común: nombre, ayuda, etiquetas y valores por combinación de etiquetas."""
+
+    tipo = ''
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._valores: Dict[Tuple[str, ...], Any] = {}
+
+    def _clave(self, etiquetas: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}, no {tuple(etiquetas)}")
+        return tuple(str(etiquetas[n]) for n in self.etiquetas)
+
+    def _muestras(self) -> List[str]:
+        raise NotImplementedError
+
+    def exponer(self) -> List[str]:
+        """Líneas HELP, TYPE y muestras en formato de texto de Prometheus."""
+        return [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}'] + self._muestras()
+
+class Contador(_Metrica):
+    """Valor que solo aumenta (eventos, errores)."""
+
+    tipo = 'counter'
+
+    def inc(self, cantidad: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas) -> float:
+        with self._lock:
+            return self._valores.get(self._clave(etiquetas), 0)
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_valor(v)}' for clave, v in valores]
+
+class Histograma(_Metrica):
+    """Distribución de observaciones (latencias) en cubetas acumuladas."""
+
+    tipo = 'histogram'
+
+    def __init__(
+        self,
+        nombre: str,
+        ayuda: str,
+        etiquetas: Tuple[str, ...] = (),
+        limites: Tuple[float, ...] = LIMITES_SEGUNDOS
+    ):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            cubetas, suma, cantidad = self._valores.get(clave) or ([0] * len(self.limites), 0.0, 0)
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    cubetas[i] += 1
+            self._valores[clave] = (cubetas, suma + valor, cantidad + 1)
+
+    @contextmanager
+    def medir(self, **etiquetas) -> Iterator[Dict[str, Any]]:
+        """
+        Observa la duración (segundos) del bloque. Las etiquetas que se
+        conocen al final (por ejemplo el resultado) se pueden completar
+        en el dict devuelto.
+        """
+        etiquetas = dict(etiquetas)
+        inicio = time.perf_counter()
+        try:
+            yield etiquetas
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def cantidad(self, **etiquetas) -> int:
+        with self._lock:
+            return (self._valores.get(self._clave(etiquetas)) or (None, 0.0, 0))[2]
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = sorted((clave, (list(c), s, n)) for clave, (c, s, n) in self._valores.items())
+        lineas = []
+        for clave, (cubetas, suma, cantidad) in valores:
+            for limite, acumulado in zip(self.limites + (math.inf,), cubetas + [cantidad]):
+                cubeta = _etiquetas(self.etiquetas, clave, f'le="{_valor(limite)}"')
+                lineas.append(f'{self.nombre}_bucket{cubeta} {acumulado}')
+            lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_valor(suma)}')
+            lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {cantidad}')
+        return lineas
+
+class Indicador(_Metrica):
+    """
+    Valor que sube y baja (profundidad de una cola). Con `funcion` se lee
+    en el momento de exponer, sin tener que mantenerlo actualizado.
+    """
+
+    tipo = 'gauge'
+
+    def __init__(self, nombre: str, ayuda: str, funcion: Optional[Callable[[], float]] = None):
+        super().__init__(nombre, ayuda)
+        self.funcion = funcion
+
+    def fijar(self, valor: float):
+        with self._lock:
+            self._valores[()] = valor
+
+    def _muestras(self) -> List[str]:
+        if self.funcion is not None:
+            try:
+                return [f'{self.nombre} {_valor(self.funcion())}']
+            except Exception as e:
+                print(f"Error al leer la métrica {self.nombre}: {str(e)}")  # Para debugging
+                return []
+        with self._lock:
+            return [f'{self.nombre} {_valor(v)}' for v in self._valores.values()]
+
+class RegistroMetricas:
+    """Métricas registradas por nombre y su exposición en texto."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas: Dict[str, _Metrica] = {}
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        """Registra la métrica o devuelve la ya registrada con el mismo nombre y tipo."""
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is None:
+                self._metricas[metrica.nombre] = metrica
+                return metrica
+            if type(existente) is not type(metrica) or existente.etiquetas != metrica.etiquetas:
+                raise ValueError(f"La métrica {metrica.nombre} ya está registrada con otro tipo o etiquetas")
+            return existente
+
+    def exponer(self) -> str:
+        """Todas las métricas en formato de texto de Prometheus."""
+        with self._lock:
+            metricas = [self._metricas[n] for n in sorted(self._metricas)]
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+# Registro compartido por el proceso
+registro = RegistroMetricas()
+
+def contador(nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()) -> Contador:
+    """Declara (o devuelve la ya declarada) un contador del registro del proceso."""
+    return registro.registrar(Contador(nombre, ayuda, etiquetas))
+
+def histograma(
+    nombre: str,
+    ayuda: str,
+    etiquetas: Tuple[str, ...] = (),
+    limites: Tuple[float, ...] = LIMITES_SEGUNDOS
+) -> Histograma:
+    """Declara (o devuelve el ya declarado) un histograma del registro del proceso."""
+    return registro.registrar(Histograma(nombre, ayuda, etiquetas, limites))
+
+def indicador(nombre: str, ayuda: str, funcion: Optional[Callable[[], float]] = None) -> Indicador:
+    """Declara (o devuelve el ya declarado) un indicador del registro del proceso."""
+    metrica = registro.registrar(Indicador(nombre, ayuda, funcion))
+    if funcion is not None:
+        metrica.funcion = funcion
+    return metrica
+
+def cronometrar(metrica: Histograma, **etiquetas):
+    """
+    Decorador que observa en `metrica` la duración de cada llamada. Si la
+    métrica tiene la etiqueta 'resultado' se completa con 'ok' o 'error'.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = 'error'
+            try:
+                valor = funcion(*args, **kwargs)
+                resultado = 'ok'
+                return valor
+            finally:
+                extra = {'resultado': resultado} if 'resultado' in metrica.etiquetas else {}
+                metrica.observar(time.perf_counter() - inicio, **etiquetas, **extra)
+        return envoltura
+    return decorador
+
+# =====================================================
+# EXPORTACIÓN
+# =====================================================
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        cuerpo = registro.exponer().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', TIPO_CONTENIDO)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        # Sin una línea en la consola por cada scrape
+        pass
+
+def escribir_archivo(ruta: str):
+    """Escribe las métricas en `ruta` de forma atómica (archivo temporal y rename)."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        archivo.write(registro.exponer())
+    os.replace(temporal, ruta)
+
+def _escribir_periodicamente(ruta: str, segundos: float):
+    while True:
+        try:
+            escribir_archivo(ruta)
+        except Exception as e:
+            print(f"Error al escribir las métricas en {ruta}: {str(e)}")  # Para debugging
+        time.sleep(segundos)
+
+_exportador: Optional[Any] = None
+_lock_exportador = threading.Lock()
+
+def iniciar_exportador():
+    """
+    Publica el registro según METRICAS_PUERTO / METRICAS_ARCHIVO. Se puede
+    llamar en cada rerun: solo el primer llamado del proceso hace algo.
+    """
+    global _exportador
+    if _exportador is not None:
+        return
+    # Import diferido: components.database llama a esta función al crear el cliente
+    from components.database import leer_configuracion
+    with _lock_exportador:
+        if _exportador is not None:
+            return
+        puerto = leer_configuracion('METRICAS_PUERTO')
+        ruta = leer_configuracion('METRICAS_ARCHIVO')
+        if puerto:
+            try:
+                servidor = ThreadingHTTPServer(
+                    (leer_configuracion('METRICAS_HOST', '127.0.0.1'), int(puerto)), _ManejadorMetricas
+                )
+            except OSError as e:
+                # Puerto ocupado (otro proceso ya publica): no interrumpir la aplicación
+                print(f"Error al iniciar el servidor de métricas en el puerto {puerto}: {str(e)}")  # Para debugging
+                _exportador = False
+                return
+            servidor.daemon_threads = True
+            threading.Thread(target=servidor.serve_forever, name='metricas-http', daemon=True).start()
+            _exportador = servidor
+        elif ruta:
+            hilo = threading.Thread(
+                target=_escribir_periodicamente,
+                args=(ruta, float(leer_configuracion('METRICAS_SEGUNDOS', str(SEGUNDOS_ARCHIVO)))),
+                name='metricas-archivo',
+                daemon=True
+            )
+            hilo.start()
+            _exportador = hilo
+        else:
+            _exportador = False
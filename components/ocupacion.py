@@ -0,0 +1,196 @@
+"""
+Ocupación de canchas por día de la semana y hora.
+
+Compara los minutos reservados con la capacidad definida en
+horarios_disponibles. Para cada cancha se construyen dos máscaras de minutos
+por día de la semana (cancha x día x 1440): la de horario de funcionamiento y
+la de minutos reservados. Ambas se arman con arreglos de diferencias (+1 al
+empezar, -1 al terminar) y una suma acumulada, así el costo es lineal en la
+cantidad de reservas y no depende del largo de cada una. Al sumar todas las
+reservas de un mismo día de la semana, cada minuto queda con la cantidad de
+fechas en que estuvo ocupado; multiplicar la máscara de horario por la
+cantidad de fechas de ese día en el rango da la capacidad. Por eso basta con
+leer las reservas agrupadas por cancha, día de la semana y franja, con la
+cantidad de cada grupo como peso.
+"""
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+from components.database import obtener_cliente, REPORTES_SEGUNDOS
+from components.metricas import cronometrar
+from components.transformaciones import minutos_desde_hora
+
+MINUTOS_DIA = 24 * 60
+
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+@cronometrar(REPORTES_SEGUNDOS, reporte='ocupacion')
+def cargar_datos(desde: date, hasta: date) -> Dict[str, pd.DataFrame]:
+    """
+    Lee canchas, horarios activos y reservas no canceladas del rango.
+
+    Las reservas llegan ya agrupadas por la función reporte_ocupacion_franjas
+    (una fila por cancha), así la cantidad de llamadas no crece con las
+    reservas del rango.
+
+    Returns:
+        Dict con DataFrames 'canchas' (id, nombre, tipo), 'horarios'
+        (id_cancha, dia_semana, hora_inicio, hora_fin) y 'reservas'
+        (id_cancha, dia_semana, hora_inicio, hora_fin, reservas)
+    """
+    cliente = obtener_cliente()
+    canchas = cliente.table('canchas').select('id, nombre, tipos_cancha(nombre)').order('id').execute()
+    horarios = cliente.table('horarios_disponibles')\
+        .select('id_cancha, dia_semana, hora_inicio, hora_fin')\
+        .eq('activo', True)\
+        .execute()
+
+    franjas = cliente.rpc('reporte_ocupacion_franjas', {
+        'p_fecha_inicio': desde.isoformat(),
+        'p_fecha_fin': hasta.isoformat()
+    }).execute()
+
+    return {
+        'canchas': pd.DataFrame(
+            [
+                {
+                    'id': c['id'],
+                    'nombre': c['nombre'],
+                    'tipo': (c.get('tipos_cancha') or {}).get('nombre') or 'Sin tipo'
+                }
+                for c in canchas.data or []
+            ],
+            columns=['id', 'nombre', 'tipo']
+        ),
+        'horarios': pd.DataFrame(horarios.data or [], columns=['id_cancha', 'dia_semana', 'hora_inicio', 'hora_fin']),
+        'reservas': pd.DataFrame(
+            [[f['id_cancha'], *franja] for f in franjas.data or [] for franja in f['franjas']],
+            columns=['id_cancha', 'dia_semana', 'hora_inicio', 'hora_fin', 'reservas']
+        )
+    }
+
+def _mascara(
+    cantidad_canchas: int,
+    filas: np.ndarray,
+    dias: np.ndarray,
+    inicios: np.ndarray,
+    fines: np.ndarray,
+    pesos: Any = 1
+) -> np.ndarray:
+    """Suma de intervalos [inicio, fin) por cancha y día: cancha x día x minuto."""
+    diferencias = np.zeros((cantidad_canchas, 7, MINUTOS_DIA + 1), dtype=np.int32)
+    np.add.at(diferencias, (filas, dias, inicios), pesos)
+    np.add.at(diferencias, (filas, dias, fines), -pesos)
+    return np.cumsum(diferencias, axis=-1)[..., :MINUTOS_DIA]
+
+def calcular_ocupacion(
+    ids_cancha: List[int],
+    horarios: pd.DataFrame,
+    reservas: pd.DataFrame,
+    desde: date,
+    hasta: date
+) -> Dict[str, Any]:
+    """
+    Calcula capacidad y minutos reservados por cancha, día de la semana y hora.
+
+    Args:
+        ids_cancha: Canchas a considerar (define el orden del resultado)
+        horarios: id_cancha, dia_semana (1=Lunes), hora_inicio, hora_fin
+        reservas: id_cancha, fecha, hora_inicio, hora_fin (sin canceladas), o
+            ya agrupadas como en cargar_datos: dia_semana en lugar de fecha y
+            la cantidad de reservas de cada franja en 'reservas'
+        desde: Primer día del rango (inclusive)
+        hasta: Último día del rango (inclusive)
+
+    Returns:
+        Dict con 'canchas', 'desde', 'hasta', 'capacidad' y 'reservado'
+        (np.ndarray de minutos, forma cancha x día de la semana x hora)
+    """
+    posicion = pd.Series(np.arange(len(ids_cancha)), index=pd.Index(ids_cancha, dtype='int64'))
+
+    # Fechas de cada día de la semana dentro del rango
+    dias_rango = np.arange(np.datetime64(desde), np.datetime64(hasta + timedelta(days=1)))
+    fechas_por_dia = np.bincount((dias_rango.astype('int64') + 3) % 7, minlength=7)  # 1970-01-01 fue jueves
+
+    horarios = horarios[horarios['id_cancha'].isin(posicion.index)]
+    abierto = _mascara(
+        len(ids_cancha),
+        posicion[horarios['id_cancha']].to_numpy(),
+        horarios['dia_semana'].to_numpy(dtype=np.intp) - 1,
+        minutos_desde_hora(horarios['hora_inicio']),
+        minutos_desde_hora(horarios['hora_fin'])
+    ) > 0
+
+    reservas = reservas[reservas['id_cancha'].isin(posicion.index)]
+    if 'dia_semana' in reservas:
+        dias = reservas['dia_semana'].to_numpy(dtype=np.intp) - 1
+    else:
+        fechas = pd.to_datetime(reservas['fecha']).to_numpy(dtype='datetime64[D]')
+        dias = (fechas.astype('int64') + 3) % 7
+    ocupado = _mascara(
+        len(ids_cancha),
+        posicion[reservas['id_cancha']].to_numpy(),
+        dias,
+        minutos_desde_hora(reservas['hora_inicio']),
+        minutos_desde_hora(reservas['hora_fin']),
+        reservas['reservas'].to_numpy(dtype=np.int32) if 'reservas' in reservas else 1
+    )
+
+    # Solo cuentan los minutos reservados dentro del horario de funcionamiento
+    capacidad = abierto * fechas_por_dia[np.newaxis, :, np.newaxis]
+    reservado = np.minimum(ocupado, capacidad)
+    forma = (len(ids_cancha), 7, 24, 60)
+    return {
+        'canchas': list(ids_cancha),
+        'desde': desde,
+        'hasta': hasta,
+        'capacidad': capacidad.reshape(forma).sum(axis=-1),
+        'reservado': reservado.reshape(forma).sum(axis=-1)
+    }
+
+def _porcentaje(reservado: np.ndarray, capacidad: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(capacidad > 0, reservado * 100.0 / capacidad, np.nan)
+
+def mapa_calor(ocupacion: Dict[str, Any], ids_cancha: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    Porcentaje de ocupación por día de la semana (filas) y hora (columnas).
+
+    Args:
+        ocupacion: Resultado de calcular_ocupacion
+        ids_cancha: Canchas a incluir (None = todas)
+
+    Returns:
+        pd.DataFrame 7 x 24 con NaN en las horas sin capacidad
+    """
+    seleccion = [
+        i for i, id_cancha in enumerate(ocupacion['canchas'])
+        if ids_cancha is None or id_cancha in ids_cancha
+    ]
+    porcentaje = _porcentaje(
+        ocupacion['reservado'][seleccion].sum(axis=0),
+        ocupacion['capacidad'][seleccion].sum(axis=0)
+    )
+    return pd.DataFrame(porcentaje, index=DIAS_SEMANA, columns=[f"{h:02d}:00" for h in range(24)])
+
+def ocupacion_por_grupo(ocupacion: Dict[str, Any], grupos: Dict[int, str]) -> pd.DataFrame:
+    """
+    Horas disponibles, horas reservadas y ocupación por grupo de canchas.
+
+    Args:
+        ocupacion: Resultado de calcular_ocupacion
+        grupos: id_cancha -> grupo (por ejemplo el tipo o el nombre de la cancha)
+
+    Returns:
+        pd.DataFrame con grupo, horas_disponibles, horas_reservadas y ocupacion (%)
+    """
+    df = pd.DataFrame({
+        'grupo': [grupos.get(id_cancha, 'Sin grupo') for id_cancha in ocupacion['canchas']],
+        'horas_disponibles': ocupacion['capacidad'].sum(axis=(1, 2)) / 60.0,
+        'horas_reservadas': ocupacion['reservado'].sum(axis=(1, 2)) / 60.0
+    }).groupby('grupo', as_index=False).sum()
+    df['ocupacion'] = _porcentaje(df['horas_reservadas'].to_numpy(), df['horas_disponibles'].to_numpy())
+    return df
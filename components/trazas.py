@@ -0,0 +1,303 @@
+"""
+Trazas de las llamadas al backend de datos.
+
+ClienteTrazado envuelve el cliente (Supabase o local) y registra cada ida y
+vuelta (cada execute() de una consulta o RPC): tabla, operación, forma de los
+filtros (métodos y columnas, sin valores), filas y bytes devueltos y
+duración. obtener_cliente() lo instala en el cliente compartido salvo que
+TRAZAS_BACKEND=0, así que cubre tanto components/ como las páginas.
+
+Las trazas se agrupan por sesión y rerun de Streamlit: panel_trazas() (al
+final de cada página) muestra a los administradores la cascada de llamadas
+del rerun actual y marca las consultas repetidas con la misma forma, el
+síntoma de un patrón N+1. Además se escriben como JSON por línea en un
+archivo rotativo (TRAZAS_ARCHIVO).
+"""
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Optional, Dict, Any, List, Callable
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Métodos del query builder que definen la operación
+OPERACIONES = {'select', 'insert', 'update', 'delete', 'upsert'}
+
+# Métodos de filtro cuyo primer argumento es la columna
+FILTROS = {'eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'is_', 'in_', 'contains', 'filter', 'match'}
+
+# Llamadas con la misma forma en un rerun a partir de las cuales se avisa
+UMBRAL_REPETICIONES = 3
+
+# Columnas y operadores dentro de un filtro or=(...) (los valores se descartan)
+_PATRON_OR = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\.(?:not\.)?(eq|neq|gt|gte|lt|lte|like|ilike|is|in)\.')
+
+# Grupo or(...) en una forma ya resumida (el cursor de la paginación por keyset es uno)
+_PATRON_GRUPO_OR = re.compile(r' ?or\([^)]*\)')
+
+_lock = threading.Lock()
+# session_id -> {'marca': objeto del rerun, 'inicio': perf_counter, 'llamadas': [...]}
+_reruns: Dict[Optional[str], Dict[str, Any]] = {}
+_registro: Optional[logging.Logger] = None
+
+def _configuracion(clave: str, defecto: str) -> str:
+    # Import diferido: components.database instala el trazado al crear el cliente
+    from components.database import leer_configuracion
+    return leer_configuracion(clave, defecto)
+
+def trazas_habilitadas() -> bool:
+    """Indica si obtener_cliente() debe envolver el cliente (TRAZAS_BACKEND, activo por defecto)."""
+    return str(_configuracion('TRAZAS_BACKEND', '1')).lower() not in ('0', 'false', 'no')
+
+def _obtener_registro() -> logging.Logger:
+    """Logger con el archivo rotativo de trazas (se configura una vez por proceso)."""
+    global _registro
+    if _registro is None:
+        with _lock:
+            if _registro is None:
+                registro = logging.getLogger('reservas.trazas')
+                registro.setLevel(logging.INFO)
+                registro.propagate = False
+                manejador = RotatingFileHandler(
+                    _configuracion('TRAZAS_ARCHIVO', 'trazas_backend.log'),
+                    maxBytes=int(_configuracion('TRAZAS_ARCHIVO_BYTES', str(5 * 1024 * 1024))),
+                    backupCount=int(_configuracion('TRAZAS_ARCHIVOS', '3')),
+                    encoding='utf-8'
+                )
+                manejador.setFormatter(logging.Formatter('%(message)s'))
+                registro.addHandler(manejador)
+                _registro = registro
+    return _registro
+
+def _rerun_actual():
+    """
+    (session_id, marca) del rerun en curso. Streamlit reemplaza
+    ctx.widget_ids_this_run al comenzar cada rerun, así que ese objeto
+    identifica el rerun. Fuera de Streamlit (scripts, cron) es (None, None).
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None, None
+    return ctx.session_id, ctx.widget_ids_this_run
+
+def registrar_traza(traza: Dict[str, Any]):
+    """Agrega una traza al rerun en curso y la escribe en el archivo rotativo."""
+    sesion, marca = _rerun_actual()
+    with _lock:
+        rerun = _reruns.get(sesion)
+        if rerun is None or rerun['marca'] is not marca:
+            # Primera llamada de un rerun nuevo: se descartan las del anterior
+            rerun = _reruns[sesion] = {'marca': marca, 'inicio': traza['comienzo'], 'llamadas': []}
+        traza['inicio_ms'] = round((traza['comienzo'] - rerun['inicio']) * 1000, 2)
+        rerun['llamadas'].append(traza)
+    try:
+        _obtener_registro().info(json.dumps(
+            {'sesion': sesion, **{k: v for k, v in traza.items() if k != 'comienzo'}},
+            ensure_ascii=False, default=str
+        ))
+    except Exception as e:
+        print(f"Error al escribir la traza: {str(e)}")  # Para debugging
+
+def trazas_del_rerun() -> List[Dict[str, Any]]:
+    """Llamadas al backend hechas hasta ahora en el rerun actual de la sesión."""
+    sesion, marca = _rerun_actual()
+    with _lock:
+        rerun = _reruns.get(sesion)
+        if rerun is None or rerun['marca'] is not marca:
+            return []
+        return list(rerun['llamadas'])
+
+def forma_consulta(pasos: List[tuple]) -> str:
+    """
+    Resume los métodos encadenados de una consulta sin los valores, por
+    ejemplo "eq(id_cancha) order(fecha) limit": dos consultas con la misma
+    forma solo difieren en los parámetros.
+    """
+    partes = []
+    for metodo, args in pasos:
+        if metodo in OPERACIONES:
+            continue
+        if metodo == 'rpc':
+            partes.append(f"({args[0]})")
+        elif metodo in FILTROS and args:
+            partes.append(f"{metodo.rstrip('_')}({args[0]})")
+        elif metodo == 'or_' and args:
+            columnas = dict.fromkeys(f"{c}.{o}" for c, o in _PATRON_OR.findall(str(args[0])))
+            partes.append(f"or({','.join(columnas)})")
+        elif metodo == 'order' and args:
+            partes.append(f"order({args[0]})")
+        else:
+            partes.append(metodo.rstrip('_'))
+    return ' '.join(partes)
+
+class ClienteTrazado:
+    """
+    Envuelve un cliente de datos y registra cada execute() de sus consultas.
+
+    Args:
+        cliente: Cliente con la interfaz de Supabase (table, from_, rpc)
+        destino: Función que recibe cada traza (por defecto registrar_traza)
+    """
+
+    def __init__(self, cliente, destino: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self._cliente = cliente
+        self._destino = destino or registrar_traza
+
+    def table(self, tabla: str):
+        return _ConsultaTrazada(self, self._cliente.table(tabla), tabla, None)
+
+    def from_(self, tabla: str):
+        return _ConsultaTrazada(self, self._cliente.from_(tabla), tabla, None)
+
+    def rpc(self, nombre: str, *args, **kwargs):
+        consulta = _ConsultaTrazada(self, self._cliente.rpc(nombre, *args, **kwargs), nombre, 'rpc')
+        # La forma de un RPC son los nombres de sus parámetros
+        parametros = args[0] if args else kwargs.get('params') or {}
+        consulta._pasos.append(('rpc', (','.join(parametros),)))
+        return consulta
+
+    def __getattr__(self, nombre):
+        return getattr(self._cliente, nombre)
+
+class _ConsultaTrazada:
+    """Query builder envuelto: anota los métodos encadenados y traza el execute()."""
+
+    def __init__(self, trazado: ClienteTrazado, consulta, tabla: str, operacion: Optional[str]):
+        self._trazado = trazado
+        self._consulta = consulta
+        self._tabla = tabla
+        self._operacion = operacion
+        self._pasos: List[tuple] = []
+
+    def _seguir(self, resultado):
+        if hasattr(resultado, 'execute'):
+            self._consulta = resultado
+            return self
+        return resultado
+
+    def execute(self):
+        comienzo = time.perf_counter()
+        respuesta, error = None, None
+        try:
+            respuesta = self._consulta.execute()
+            return respuesta
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            duracion = time.perf_counter() - comienzo
+            datos = getattr(respuesta, 'data', None)
+            operacion = self._operacion or next((m for m, _ in self._pasos if m in OPERACIONES), 'select')
+            self._trazado._destino({
+                'momento': datetime.now().isoformat(timespec='milliseconds'),
+                'comienzo': comienzo,
+                'tabla': self._tabla,
+                'operacion': operacion,
+                'forma': forma_consulta(self._pasos),
+                'filas': len(datos) if isinstance(datos, list) else int(datos is not None),
+                'bytes': len(json.dumps(datos, ensure_ascii=False, default=str).encode('utf-8')) if datos is not None else 0,
+                'ms': round(duracion * 1000, 2),
+                'error': error
+            })
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._consulta, nombre)
+        if not callable(atributo):
+            # Propiedades como not_ devuelven otro builder
+            self._pasos.append((nombre, ()))
+            return self._seguir(atributo)
+
+        def encadenar(*args, **kwargs):
+            self._pasos.append((nombre, args))
+            return self._seguir(atributo(*args, **kwargs))
+        return encadenar
+
+def es_pagina_siguiente(traza: Dict[str, Any], anterior: Optional[Dict[str, Any]]) -> bool:
+    """
+    Indica si la traza es una página siguiente de la misma lectura que la
+    anterior (paginación por cursor de components.utils.obtener_pagina):
+    misma tabla y forma, más el filtro or(...) del cursor.
+    """
+    if anterior is None or traza['operacion'] != 'select' or not anterior['filas']:
+        return False
+    if traza['tabla'] != anterior['tabla'] or anterior['operacion'] != 'select':
+        return False
+    if 'limit' not in traza['forma'].split() or 'or(' not in traza['forma']:
+        return False
+    return _PATRON_GRUPO_OR.sub('', traza['forma']) == _PATRON_GRUPO_OR.sub('', anterior['forma'])
+
+def lecturas(trazas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Trazas sin las páginas siguientes: una por consulta lógica."""
+    return [t for i, t in enumerate(trazas) if not es_pagina_siguiente(t, trazas[i - 1] if i else None)]
+
+def repetidas(trazas: List[Dict[str, Any]], umbral: int = UMBRAL_REPETICIONES) -> pd.DataFrame:
+    """
+    Consultas con la misma tabla, operación y forma repetidas al menos
+    `umbral` veces en un rerun (candidatas a N+1). Las páginas siguientes
+    de una lectura paginada no cuentan como repeticiones.
+    """
+    trazas = lecturas(trazas)
+    if not trazas:
+        return pd.DataFrame(columns=['tabla', 'operacion', 'forma', 'veces', 'ms'])
+    df = pd.DataFrame(trazas).groupby(['tabla', 'operacion', 'forma'], as_index=False)\
+        .agg(veces=('ms', 'size'), ms=('ms', 'sum'))
+    return df[df['veces'] >= umbral].sort_values('veces', ascending=False, ignore_index=True)
+
+def panel_trazas():
+    """
+    Panel opcional en la barra lateral (solo administradores) con las
+    llamadas al backend del rerun actual. Va al final de cada página.
+    """
+    if st.session_state.get('usuario', {}).get('rol') != 'admin':
+        return
+    if not st.sidebar.checkbox("🔍 Trazas del backend", key='mostrar_trazas'):
+        return
+
+    trazas = trazas_del_rerun()
+    if not trazas:
+        st.sidebar.caption("Sin llamadas al backend en este rerun")
+        return
+
+    df = pd.DataFrame(trazas)
+    fin = float((df['inicio_ms'] + df['ms']).max())
+    st.sidebar.caption(
+        f"{len(df)} llamadas · {df['ms'].sum():.0f} ms en el backend · "
+        f"{df['filas'].sum():,} filas · {df['bytes'].sum() / 1024:,.0f} KB · {fin:.0f} ms desde la primera"
+    )
+
+    for _, fila in repetidas(trazas).iterrows():
+        st.sidebar.warning(
+            f"Posible N+1: {fila['tabla']} {fila['forma'] or fila['operacion']} "
+            f"×{fila['veces']} ({fila['ms']:.0f} ms)"
+        )
+
+    etiquetas = [f"{i + 1}. {t['tabla']} {t['forma']}"[:60] for i, t in enumerate(trazas)]
+    figura = go.Figure(go.Bar(
+        y=etiquetas,
+        x=df['ms'],
+        base=df['inicio_ms'],
+        orientation='h',
+        marker_color=['#d62728' if t['error'] else '#1f77b4' for t in trazas],
+        customdata=df[['operacion', 'filas', 'bytes', 'ms']].to_numpy(),
+        hovertemplate='%{y}<br>%{customdata[0]} · %{customdata[1]} filas · %{customdata[2]} bytes · %{customdata[3]} ms<extra></extra>'
+    ))
+    figura.update_layout(
+        height=max(200, 22 * len(trazas) + 60),
+        margin=dict(l=0, r=0, t=10, b=0),
+        xaxis_title='ms desde la primera llamada',
+        yaxis=dict(autorange='reversed')
+    )
+    st.sidebar.plotly_chart(figura, use_container_width=True)
+    with st.sidebar.expander("Detalle de las llamadas"):
+        st.dataframe(
+            df[['tabla', 'operacion', 'forma', 'filas', 'bytes', 'inicio_ms', 'ms']],
+            hide_index=True,
+            use_container_width=True
+        )
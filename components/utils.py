@@ -1,5 +1,231 @@
+import streamlit as st
+from datetime import date, time, datetime
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
 # Utilidades específicas del negocio:
-- validar_horario_disponible()
-- calcular_monto_reserva()
-- formatear_horarios()
-- paginacion_reservas()
\ No newline at end of file
+# - validar_horario_disponible()
+# - calcular_monto_reserva()
+# - formatear_horarios()
+
+# =====================================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# =====================================================
+
+# Caracteres que obligan a entrecomillar un valor dentro de un filtro or=(...)
+_CARACTERES_RESERVADOS = set(',.:()" \\')
+
+def _valor_filtro(valor: Any) -> str:
+    """Convierte un valor de cursor al formato de filtros de PostgREST."""
+    if isinstance(valor, (date, time, datetime)):
+        valor = valor.isoformat()
+    if isinstance(valor, bool):
+        return 'true' if valor else 'false'
+    texto = str(valor)
+    if any(c in _CARACTERES_RESERVADOS for c in texto):
+        texto = '"' + texto.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return texto
+
+def filtro_keyset(orden: List[Tuple[str, bool]], cursor: Dict[str, Any]) -> str:
+    """
+    Construye el filtro or=(...) que selecciona las filas posteriores al cursor.
+
+    Para un orden (c1, c2, c3) genera:
+        c1 > v1 OR (c1 = v1 AND c2 > v2) OR (c1 = v1 AND c2 = v2 AND c3 > v3)
+    usando lt en lugar de gt para las columnas descendentes.
+
+    Args:
+        orden: Lista de (columna, descendente). La última columna debe ser única
+        cursor: Valores de las columnas de orden de la última fila vista
+
+    Returns:
+        str con los filtros en sintaxis de PostgREST (sin paréntesis externos)
+    """
+    condiciones = []
+    for i, (columna, descendente) in enumerate(orden):
+        iguales = [f"{c}.eq.{_valor_filtro(cursor[c])}" for c, _ in orden[:i]]
+        operador = 'lt' if descendente else 'gt'
+        siguiente = f"{columna}.{operador}.{_valor_filtro(cursor[columna])}"
+        if iguales:
+            condiciones.append(f"and({','.join(iguales + [siguiente])})")
+        else:
+            condiciones.append(siguiente)
+    return ','.join(condiciones)
+
+def obtener_pagina(
+    consulta,
+    orden: List[Tuple[str, bool]],
+    cursor: Optional[Dict[str, Any]] = None,
+    tamano: int = 10
+) -> Tuple[List[Dict], Optional[Dict[str, Any]], Optional[int]]:
+    """
+    Obtiene una página de resultados usando paginación por cursor.
+
+    A diferencia de offset/limit, el costo de cada página no depende de cuántas
+    filas hay antes: la base de datos salta directamente al cursor por índice.
+
+    Args:
+        consulta: Query builder con los filtros ya aplicados (sin ejecutar)
+        orden: Lista de (columna, descendente); la última columna debe ser única
+        cursor: Cursor devuelto por la página anterior (None para la primera)
+        tamano: Cantidad de filas por página
+
+    Returns:
+        Tuple con (filas, cursor de la siguiente página o None, conteo total o None)
+    """
+    try:
+        if cursor:
+            consulta = consulta.or_(filtro_keyset(orden, cursor))
+        for columna, descendente in orden:
+            consulta = consulta.order(columna, desc=descendente)
+
+        # Se pide una fila extra para saber si existe una página siguiente
+        response = consulta.limit(tamano + 1).execute()
+        filas = response.data or []
+
+        siguiente = None
+        if len(filas) > tamano:
+            filas = filas[:tamano]
+            siguiente = {columna: filas[-1][columna] for columna, _ in orden}
+
+        return filas, siguiente, getattr(response, 'count', None)
+    except Exception as e:
+        raise Exception(f'Error al obtener la página: {str(e)}')
+
+def combinar_pagina(
+    filas: List[Dict],
+    siguiente: Optional[Dict[str, Any]],
+    extra: List[Dict],
+    orden: List[Tuple[str, bool]],
+    tamano: int
+) -> Tuple[List[Dict], Optional[Dict[str, Any]]]:
+    """
+    Intercala una página de obtener_pagina con filas de otra fuente.
+
+    Las filas repetidas (misma última columna de orden, que es única) se
+    toman una sola vez. Como ambas fuentes filtran por el mismo cursor, el
+    cursor de la última fila tomada sirve para la página siguiente de las dos.
+
+    Args:
+        filas: Filas de la página (hasta `tamano`)
+        siguiente: Cursor devuelto por obtener_pagina (None si no había más)
+        extra: Filas de la otra fuente posteriores al mismo cursor (hasta `tamano` + 1)
+        orden: Lista de (columna, descendente); la última columna debe ser única
+        tamano: Cantidad de filas por página
+
+    Returns:
+        Tuple con (filas de la página, cursor de la siguiente página o None)
+    """
+    unica = orden[-1][0]
+    vistas = {f[unica] for f in filas}
+    todas = filas + [f for f in extra if f[unica] not in vistas]
+    # Orden estable por cada columna, de la última a la primera
+    for columna, descendente in reversed(orden):
+        todas.sort(key=lambda f: f[columna], reverse=descendente)
+
+    pagina = todas[:tamano]
+    if pagina and (siguiente is not None or len(todas) > tamano):
+        return pagina, {columna: pagina[-1][columna] for columna, _ in orden}
+    return pagina, None
+
+def paginar(
+    clave: str,
+    construir_consulta: Callable[[Optional[str]], Any],
+    orden: List[Tuple[str, bool]],
+    filtros: Tuple = (),
+    tamano: int = 10,
+    conteo: str = 'exact',
+    etiqueta: str = 'registros',
+    complemento: Optional[Callable[[Optional[Dict[str, Any]], int, bool], Tuple[List[Dict], Optional[int]]]] = None
+) -> List[Dict]:
+    """
+    Muestra los controles de paginación y devuelve las filas de la página actual.
+
+    Los cursores de las páginas visitadas se guardan en st.session_state, de modo
+    que avanzar o retroceder solo consulta la página pedida. El conteo total se
+    calcula una sola vez por combinación de filtros.
+
+    Args:
+        clave: Prefijo único para el estado de la sesión (uno por listado)
+        construir_consulta: Función que recibe el método de conteo (o None) y
+            devuelve un query builder nuevo con los filtros aplicados
+        orden: Lista de (columna, descendente); la última columna debe ser única
+        filtros: Valores de los filtros actuales; si cambian se vuelve a la página 1
+        tamano: Cantidad de filas por página
+        conteo: Método de conteo de PostgREST ('exact', 'planned', 'estimated')
+        etiqueta: Nombre de los elementos para el texto informativo
+        complemento: Otra fuente de filas del mismo listado (por ejemplo los
+            meses archivados de la bitácora) que se intercala con la consulta.
+            Recibe (cursor, límite, contar) y devuelve (filas posteriores al
+            cursor en el mismo orden, hasta el límite; conteo total o None)
+
+    Returns:
+        List[Dict] con las filas de la página actual
+    """
+    estado = st.session_state.get(f'paginacion_{clave}')
+    if not estado or estado['filtros'] != filtros:
+        estado = {'filtros': filtros, 'cursores': [None], 'pagina': 0, 'total': None, 'siguiente': None}
+        st.session_state[f'paginacion_{clave}'] = estado
+
+    pedir_conteo = conteo if estado['total'] is None else None
+    filas, siguiente, total = obtener_pagina(
+        construir_consulta(pedir_conteo),
+        orden,
+        estado['cursores'][estado['pagina']],
+        tamano
+    )
+    if complemento is not None:
+        extra, total_extra = complemento(estado['cursores'][estado['pagina']], tamano + 1, pedir_conteo is not None)
+        filas, siguiente = combinar_pagina(filas, siguiente, extra, orden, tamano)
+        if total is not None and total_extra is not None:
+            total += total_extra
+    estado['siguiente'] = siguiente
+    if total is not None:
+        estado['total'] = total
+
+    if not filas and estado['pagina'] > 0:
+        # Las filas de la página se borraron o cambiaron: volver a la primera
+        # (con conteo nuevo) en lugar de dejar el listado sin controles
+        estado.update({'cursores': [None], 'pagina': 0, 'total': None, 'siguiente': None})
+        return paginar(clave, construir_consulta, orden, filtros, tamano, conteo, etiqueta, complemento)
+
+    if not filas:
+        return []
+
+    inicio = estado['pagina'] * tamano
+    total_texto = f" de {estado['total']}" if estado['total'] is not None else ""
+
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        st.button(
+            "⬅️ Anterior",
+            key=f"anterior_{clave}",
+            disabled=estado['pagina'] == 0,
+            on_click=_cambiar_pagina,
+            args=(clave, -1)
+        )
+    with col2:
+        st.markdown(f"Mostrando {etiqueta} {inicio + 1}-{inicio + len(filas)}{total_texto}")
+    with col3:
+        st.button(
+            "Siguiente ➡️",
+            key=f"siguiente_{clave}",
+            disabled=siguiente is None,
+            on_click=_cambiar_pagina,
+            args=(clave, 1)
+        )
+
+    return filas
+
+def _cambiar_pagina(clave: str, paso: int):
+    """Callback de los botones de paginación: mueve la página actual."""
+    estado = st.session_state[f'paginacion_{clave}']
+    if paso > 0 and estado['siguiente']:
+        del estado['cursores'][estado['pagina'] + 1:]
+        estado['cursores'].append(estado['siguiente'])
+        estado['pagina'] += 1
+    elif paso < 0 and estado['pagina'] > 0:
+        estado['pagina'] -= 1
+
+def reiniciar_paginacion(clave: str):
+    """Vuelve un listado a la primera página y fuerza a recalcular el conteo."""
+    st.session_state.pop(f'paginacion_{clave}', None)
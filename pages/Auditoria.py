@@ -1,7 +1,12 @@
 import streamlit as st
 from datetime import datetime, timedelta
-from st_aggrid import AgGrid, GridOptionsBuilder
+from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from components.database import supabase
+from components.utils import paginar
+from components.archivo_auditoria import pagina_archivo, contar_archivo, detalle_archivado
+from components.auditoria import reconstruir_imagenes
+from components.exportacion import panel_exportacion, exportar_bitacora
+from components.trazas import panel_trazas
 import pandas as pd
 
 # Verificación de autenticación y rol
@@ -13,6 +18,130 @@ if st.session_state.get('usuario', {}).get('rol') != 'admin':
     st.error("⛔ No tiene permisos para acceder a esta página")
     st.stop()
 
+# Configuración de paginación: más recientes primero, id como desempate
+REGISTROS_POR_PAGINA = 50
+ORDEN_BITACORA = [('created_at', True), ('id', True)]
+
+# Columnas de la grilla (los JSONB se cargan solo al seleccionar una fila)
+COLUMNAS_BITACORA = [
+    'id', 'created_at', 'nombre_usuario', 'tipo_accion', 'tabla_afectada',
+    'descripcion_detallada', 'hora_inicio_ingreso', 'hora_salida',
+    'navegador', 'ip_acceso', 'nombre_maquina'
+]
+
+# Funciones auxiliares
+def consulta_bitacora(conteo, usuario, tipo_accion, fecha_inicio, fecha_fin):
+    """Construye la consulta de la bitácora con los filtros en la base de datos"""
+    query = supabase.table('auditoria_bitacora').select(', '.join(COLUMNAS_BITACORA), count=conteo)\
+        .gte('created_at', fecha_inicio.isoformat())\
+        .lt('created_at', (fecha_fin + timedelta(days=1)).isoformat())
+    if usuario != "Todos":
+        query = query.eq('nombre_usuario', usuario)
+    if tipo_accion != "Todos":
+        query = query.eq('tipo_accion', tipo_accion)
+    return query
+
+def obtener_detalle(id_registro):
+    """Obtiene los datos anteriores y nuevos de un registro de la bitácora"""
+    response = supabase.table('auditoria_bitacora')\
+        .select('id, created_at, tabla_afectada, id_registro, tipo_accion, datos_anteriores, datos_nuevos')\
+        .eq('id', id_registro)\
+        .single()\
+        .execute()
+    return response.data
+
+def complemento_archivo(usuario, tipo_accion, fecha_inicio, fecha_fin):
+    """Fuente de paginar() con los meses archivados: mismos filtros y mismo cursor que la tabla"""
+    usuario = usuario if usuario != "Todos" else None
+    tipo_accion = tipo_accion if tipo_accion != "Todos" else None
+
+    def complemento(cursor, limite, contar):
+        filas = pagina_archivo(fecha_inicio, fecha_fin, usuario, tipo_accion, COLUMNAS_BITACORA, cursor, limite)
+        for fila in filas:
+            fila['archivado'] = True
+        total = contar_archivo(fecha_inicio, fecha_fin, usuario, tipo_accion) if contar else None
+        return filas, total
+
+    return complemento
+
+def tabla_cambios(detalle):
+    """Campos modificados de un UPDATE (la bitácora guarda solo las diferencias)"""
+    anteriores = detalle['datos_anteriores'] or {}
+    nuevos = detalle['datos_nuevos'] or {}
+    campos = [c for c in nuevos if c != 'id'] + [c for c in anteriores if c != 'id' and c not in nuevos]
+    return pd.DataFrame({
+        'Campo': campos,
+        'Antes': [str(anteriores.get(c, '')) for c in campos],
+        'Después': [str(nuevos.get(c, '')) for c in campos]
+    })
+
+def mostrar_registros(df, obtener_json):
+    """Muestra los registros en AgGrid y el detalle JSON del registro seleccionado"""
+    df = df[COLUMNAS_BITACORA].copy()
+
+    # Formatear fechas para visualización
+    for columna in ['created_at', 'hora_inicio_ingreso', 'hora_salida']:
+        df[columna] = pd.to_datetime(df[columna], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Renombrar columnas para mejor visualización
+    df = df.rename(columns={
+        'created_at': 'Fecha',
+        'nombre_usuario': 'Usuario',
+        'hora_inicio_ingreso': 'Hora de Ingreso',
+        'hora_salida': 'Hora de Salida',
+        'navegador': 'Navegador',
+        'ip_acceso': 'IP',
+        'nombre_maquina': 'Nombre PC',
+        'tabla_afectada': 'Tabla',
+        'tipo_accion': 'Acción',
+        'descripcion_detallada': 'Descripción'
+    })
+
+    gb = GridOptionsBuilder.from_dataframe(df)
+    gb.configure_default_column(resizable=True, sortable=False, filter=False)
+    gb.configure_column('id', header_name='ID', width=80)
+    gb.configure_column('Descripción', flex=1)
+    gb.configure_selection('single')
+    grid = AgGrid(
+        df,
+        gridOptions=gb.build(),
+        height=420,
+        update_mode=GridUpdateMode.SELECTION_CHANGED
+    )
+
+    # Detalle del registro seleccionado
+    seleccion = grid.selected_rows
+    if seleccion is not None and len(seleccion) > 0:
+        fila = seleccion.iloc[0] if isinstance(seleccion, pd.DataFrame) else seleccion[0]
+        detalle = obtener_json(int(fila['id']))
+
+        st.subheader(f"Detalle del registro {int(fila['id'])}")
+        if detalle['tipo_accion'] == 'UPDATE':
+            st.write("**Campos modificados**")
+            st.dataframe(tabla_cambios(detalle), hide_index=True, use_container_width=True)
+            with st.expander("Ver registro completo"):
+                imagenes = reconstruir_imagenes(detalle)
+                if imagenes is None:
+                    st.info("No se encontró el registro para reconstruir la fila completa")
+                else:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write("**Antes**")
+                        st.json(imagenes['antes'])
+                    with col2:
+                        st.write("**Después**")
+                        st.json(imagenes['despues'])
+        else:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.write("**Datos anteriores**")
+                st.json(detalle['datos_anteriores'] or {})
+            with col2:
+                st.write("**Datos nuevos**")
+                st.json(detalle['datos_nuevos'] or {})
+    else:
+        st.caption("Seleccione un registro para ver los datos anteriores y nuevos")
+
 # Configuración de la página
 st.title("📋 Bitácora del Sistema")
 st.markdown("---")
@@ -21,17 +150,21 @@ st.markdown("---")
 st.sidebar.header("Filtros de Búsqueda")
 
 # Filtro de fechas
-fecha_fin = datetime.now()
+fecha_fin = datetime.now().date()
 fecha_inicio = fecha_fin - timedelta(days=7)
-fecha_inicio, fecha_fin = st.sidebar.date_input(
+rango = st.sidebar.date_input(
     "Rango de fechas",
     (fecha_inicio, fecha_fin),
     key="date_range"
 )
+if len(rango) != 2:
+    st.info("Seleccione la fecha final del rango")
+    st.stop()
+fecha_inicio, fecha_fin = rango
 
 # Filtro de usuarios
 try:
-    usuarios = supabase.table('usuarios').select('nombre, email').execute()
+    usuarios = supabase.table('usuarios').select('email').order('email').execute()
     usuarios_list = ['Todos'] + [u['email'] for u in usuarios.data]
     usuario_filtro = st.sidebar.selectbox("Usuario", usuarios_list)
 except Exception as e:
@@ -42,71 +175,51 @@ except Exception as e:
 tipos_accion = ['Todos', 'INSERT', 'UPDATE', 'DELETE', 'LOGIN', 'LOGOUT']
 tipo_accion_filtro = st.sidebar.selectbox("Tipo de Acción", tipos_accion)
 
-# Consulta a la base de datos con filtros
-try:    # Obtener todos los registros primero
-    query = supabase.table('auditoria_bitacora').select('*')
-    resultado = query.execute()
-    
-    if not resultado.data:
-        st.info("No hay registros en la bitácora")
-        st.stop()
-    
-    # Convertir a DataFrame
-    df = pd.DataFrame(resultado.data)
-    
-    # Asegurarse de que todas las columnas necesarias existan
-    columnas_requeridas = [
-        'nombre_usuario', 'hora_inicio_ingreso', 'hora_salida', 
-        'navegador', 'ip_acceso', 'nombre_maquina', 
-        'tabla_afectada', 'tipo_accion', 'descripcion_detallada'
-    ]
-    
-    for col in columnas_requeridas:
-        if col not in df.columns:
-            df[col] = ''  # Agregar columna vacía si no existe
-    
-    # Aplicar filtros al DataFrame
-    if usuario_filtro != "Todos":
-        df = df[df['nombre_usuario'] == usuario_filtro]
-    if tipo_accion_filtro != "Todos":
-        df = df[df['tipo_accion'] == tipo_accion_filtro]
-    
-    # Filtrar por fecha
-    df['hora_inicio_ingreso'] = pd.to_datetime(df['hora_inicio_ingreso'])
-    df = df[
-        (df['hora_inicio_ingreso'].dt.date >= fecha_inicio) & 
-        (df['hora_inicio_ingreso'].dt.date <= fecha_fin)
-    ]
-    
-    if len(df) == 0:
+# Exportación de la bitácora filtrada (tabla y meses archivados)
+with st.expander("⬇️ Exportar bitácora"):
+    panel_exportacion(
+        'auditoria',
+        f"bitacora_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}",
+        lambda ruta, formato, progreso: exportar_bitacora(
+            ruta,
+            formato,
+            fecha_inicio,
+            fecha_fin,
+            usuario_filtro if usuario_filtro != "Todos" else None,
+            tipo_accion_filtro if tipo_accion_filtro != "Todos" else None,
+            progreso
+        ),
+        filtros=(usuario_filtro, tipo_accion_filtro, fecha_inicio, fecha_fin)
+    )
+
+# Consulta a la base de datos y a los meses archivados con filtros (una página por vez)
+try:
+    st.subheader("Registros de la Bitácora")
+    registros = paginar(
+        'auditoria',
+        lambda conteo: consulta_bitacora(conteo, usuario_filtro, tipo_accion_filtro, fecha_inicio, fecha_fin),
+        ORDEN_BITACORA,
+        filtros=(usuario_filtro, tipo_accion_filtro, fecha_inicio, fecha_fin),
+        tamano=REGISTROS_POR_PAGINA,
+        conteo='estimated',
+        etiqueta='registros',
+        complemento=complemento_archivo(usuario_filtro, tipo_accion_filtro, fecha_inicio, fecha_fin)
+    )
+
+    if not registros:
         st.info("No se encontraron registros en la bitácora para los filtros seleccionados")
         st.stop()
-    
-    # Formatear fechas para visualización
-    df['hora_inicio_ingreso'] = df['hora_inicio_ingreso'].dt.strftime('%Y-%m-%d %H:%M:%S')
-    df['hora_salida'] = pd.to_datetime(df['hora_salida']).dt.strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Renombrar columnas para mejor visualización
-    df = df.rename(columns={
-        'nombre_usuario': 'Usuario',
-        'hora_inicio_ingreso': 'Hora de Ingreso',
-        'hora_salida': 'Hora de Salida',
-        'navegador': 'Navegador',
-        'ip_acceso': 'IP',
-        'nombre_maquina': 'Nombre PC',
-        'tabla_afectada': 'Tabla',
-        'tipo_accion': 'Acción',
-        'descripcion_detallada': 'Descripción'
-    })
-      # Mostrar tabla directamente sin configuración compleja
-    st.subheader("Registros de la Bitácora")
-    
-    # Crear una tabla simple
-    st.dataframe(
-        df,
-        use_container_width=True,
-        hide_index=True
+
+    # Los JSONB se leen solo para la fila seleccionada, de la tabla o del archivo de su mes
+    archivados = {f['id']: f['created_at'] for f in registros if f.get('archivado')}
+    mostrar_registros(
+        pd.DataFrame(registros, columns=COLUMNAS_BITACORA),
+        lambda id_registro: detalle_archivado(id_registro, archivados[id_registro])
+        if id_registro in archivados else obtener_detalle(id_registro)
     )
 
 except Exception as e:
-    st.error(f"Error al cargar los datos de la bitácora: {str(e)}")
\ No newline at end of file
+    st.error(f"Error al cargar los datos de la bitácora: {str(e)}")
+
+# Trazas de las llamadas al backend de este rerun (solo administradores)
+panel_trazas()
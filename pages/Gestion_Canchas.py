@@ -1,5 +1,9 @@
 import streamlit as st
-from components.database import supabase, registrar_auditoria
+from components.database import supabase, registrar_auditoria, crear_horarios_cancha
+from components.utils import paginar, reiniciar_paginacion
+from components.disponibilidad import obtener_indice
+from components.transformaciones import normalizar_canchas
+from components.trazas import panel_trazas
 import pandas as pd
 from datetime import datetime, time
 
@@ -14,6 +18,10 @@ if rol not in ['admin', 'operador_reservas']:
     st.error("⛔ No tiene permisos para acceder a esta página")
     st.stop()
 
+# Configuración de paginación (orden estable para los cursores)
+ITEMS_POR_PAGINA = 5
+ORDEN_CANCHAS = [('nombre', False), ('id', False)]
+
 # Funciones CRUD
 def obtener_tipos_cancha():
     """Obtiene la lista de tipos de cancha desde la base de datos"""
@@ -25,16 +33,26 @@ def obtener_tipos_cancha():
         return []
 
 def obtener_canchas(busqueda=""):
-    """Obtiene la lista de canchas con sus tipos desde la base de datos"""
-    try:
+    """Obtiene la página actual de canchas con sus tipos y horarios desde la base de datos"""
+    def construir_consulta(conteo):
+        # Los horarios van embebidos: una consulta por página, no una por cancha
         query = supabase.table('canchas')\
-            .select('*, tipos_cancha(nombre, precio_por_hora)')
+            .select('*, tipos_cancha(nombre, precio_por_hora), horarios_disponibles(dia_semana, hora_inicio, hora_fin)', count=conteo)
             
         if busqueda:
             query = query.or_(f"nombre.ilike.%{busqueda}%,ubicacion.ilike.%{busqueda}%")
-            
-        response = query.execute()
-        return response.data
+        
+        return query
+    
+    try:
+        return paginar(
+            'canchas',
+            construir_consulta,
+            orden=ORDEN_CANCHAS,
+            filtros=(busqueda,),
+            tamano=ITEMS_POR_PAGINA,
+            etiqueta='canchas'
+        )
     except Exception as e:
         st.error(f"Error al obtener canchas: {str(e)}")
         return []
@@ -62,6 +80,7 @@ def crear_cancha(nombre, id_tipo, ubicacion, capacidad, observaciones):
             data
         )
         
+        reiniciar_paginacion('canchas')
         return True, "Cancha creada exitosamente"
     except Exception as e:
         return False, f"Error al crear cancha: {str(e)}"
@@ -128,6 +147,7 @@ def eliminar_cancha(id_cancha):
             None
         )
         
+        reiniciar_paginacion('canchas')
         return True, "Cancha eliminada exitosamente"
     except Exception as e:
         return False, f"Error al eliminar cancha: {str(e)}"
@@ -135,41 +155,31 @@ def eliminar_cancha(id_cancha):
 def crear_horarios_disponibles(id_cancha, dias_seleccionados, hora_inicio, hora_fin):
     """Crea los horarios disponibles para una cancha"""
     try:
-        # Crear los horarios para cada día seleccionado
-        for dia in dias_seleccionados:
-            data = {
-                'id_cancha': id_cancha,
-                'dia_semana': dia,
-                'hora_inicio': hora_inicio.isoformat(),
-                'hora_fin': hora_fin.isoformat()
-            }
-            response = supabase.table('horarios_disponibles').insert(data).execute()
-            
-            # Registrar en auditoría
-            registrar_auditoria(
-                st.session_state['usuario']['email'],
-                'horarios_disponibles',
-                'INSERT',
-                f"Se creó horario para la cancha {id_cancha}, día {dia}",
-                None,
-                data
-            )
+        # Todos los días en una sola inserción (ver crear_horarios_cancha)
+        crear_horarios_cancha(
+            id_cancha,
+            dias_seleccionados,
+            hora_inicio,
+            hora_fin,
+            st.session_state['usuario']['email']
+        )
+        
+        # Los horarios nuevos deben verse en la verificación de disponibilidad
+        obtener_indice().invalidar()
         
         return True, "Horarios creados exitosamente"
     except Exception as e:
         return False, f"Error al crear horarios: {str(e)}"
 
-def mostrar_horarios_disponibles(id_cancha):
+def mostrar_horarios_disponibles(horarios):
     """
     Muestra los horarios disponibles de una cancha organizados por día.
+    
+    Args:
+        horarios: Lista de horarios embebidos en la cancha (ver obtener_canchas)
     """
     try:
-        horarios = supabase.table('horarios_disponibles')\
-            .select('*')\
-            .eq('id_cancha', id_cancha)\
-            .execute()
-        
-        if not horarios.data:
+        if not horarios:
             st.info("No hay horarios disponibles configurados para esta cancha.")
             return
 
@@ -186,7 +196,7 @@ def mostrar_horarios_disponibles(id_cancha):
         st.write("#### 📅 Horarios Disponibles")
         
         # Ordenar horarios por día de la semana
-        horarios_ordenados = sorted(horarios.data, key=lambda x: x['dia_semana'])
+        horarios_ordenados = sorted(horarios, key=lambda x: x['dia_semana'])
         
         # Crear columnas para mostrar los horarios
         cols = st.columns(2)
@@ -229,36 +239,11 @@ with tab_lista:
     if not canchas:
         st.info("No se encontraron canchas que coincidan con la búsqueda.")
     else:
-        df = pd.DataFrame(canchas)
-        
-        # Preparar datos para mostrar
-        df['tipo'] = df['tipos_cancha'].apply(lambda x: x['nombre'])
-        df['precio_hora'] = df['tipos_cancha'].apply(lambda x: x['precio_por_hora'])
-        df['estado'] = df['disponible'].apply(lambda x: "🟢 Disponible" if x else "🔴 No Disponible")
-        
-        # Configuración de paginación
-        ITEMS_POR_PAGINA = 5
-        total_canchas = len(df)
-        total_paginas = (total_canchas + ITEMS_POR_PAGINA - 1) // ITEMS_POR_PAGINA
-        
-        col1, col2, col3 = st.columns([2, 3, 2])
-        with col2:
-            pagina_actual = st.number_input(
-                "Página",
-                min_value=1,
-                max_value=max(1, total_paginas),
-                value=1,
-                key="pagina_canchas"
-            )
-        
-        inicio = (pagina_actual - 1) * ITEMS_POR_PAGINA
-        fin = min(inicio + ITEMS_POR_PAGINA, total_canchas)
-        
-        # Información de paginación
-        st.markdown(f"Mostrando canchas {inicio + 1}-{fin} de {total_canchas}")
+        # Preparar datos para mostrar (tipo, precio_hora y estado)
+        df = normalizar_canchas(canchas)
         
         # Mostrar canchas de la página actual
-        for idx, cancha in df.iloc[inicio:fin].iterrows():
+        for idx, cancha in df.iterrows():
             with st.expander(f"🏟️ {cancha['nombre']} - {cancha['tipo']} - {cancha['estado']}"):
                 col1, col2, col3 = st.columns([3,2,1])
                 
@@ -290,7 +275,7 @@ with tab_lista:
                                 st.error(message)
                 
                 # Mostrar horarios disponibles
-                mostrar_horarios_disponibles(cancha['id'])
+                mostrar_horarios_disponibles(cancha['horarios_disponibles'])
 
 with tab_crear:
     st.subheader("Agregar Nueva Cancha")
@@ -369,4 +354,7 @@ with tab_crear:
                     else:
                         st.warning(f"{message}. Sin embargo, hubo un error con los horarios: {message_horarios}")
                 else:
-                    st.error(message)
\ No newline at end of file
+                    st.error(message)
+
+# Trazas de las llamadas al backend de este rerun (solo administradores)
+panel_trazas()
@@ -1,5 +1,7 @@
 import streamlit as st
-from components.database import supabase, registrar_auditoria
+from components.database import supabase, registrar_auditoria, como_usuario, auditar_en_aplicacion
+from components.utils import paginar, reiniciar_paginacion
+from components.trazas import panel_trazas
 import pandas as pd
 from datetime import datetime
 import re
@@ -15,6 +17,10 @@ if rol not in ['admin', 'operador_reservas']:
     st.error("⛔ No tiene permisos para acceder a esta página")
     st.stop()
 
+# Configuración de paginación (orden estable para los cursores)
+ITEMS_POR_PAGINA = 5
+ORDEN_CLIENTES = [('apellido', False), ('nombre', False), ('id', False)]
+
 # Funciones de validación
 def validar_email(email):
     """Valida el formato del email"""
@@ -28,18 +34,27 @@ def validar_telefono(telefono):
 
 # Funciones CRUD
 def obtener_clientes(busqueda="", mostrar_inactivos=False):
-    """Obtiene la lista de clientes según los filtros"""
-    try:
-        query = supabase.table('clientes').select('*')
+    """Obtiene la página actual de clientes según los filtros"""
+    def construir_consulta(conteo):
+        query = supabase.table('clientes').select('*', count=conteo)
         
         if not mostrar_inactivos:
             query = query.eq('activo', True)
             
         if busqueda:
             query = query.or_(f"nombre.ilike.%{busqueda}%,apellido.ilike.%{busqueda}%,documento.ilike.%{busqueda}%")
-            
-        response = query.execute()
-        return response.data
+        
+        return query
+    
+    try:
+        return paginar(
+            'clientes',
+            construir_consulta,
+            orden=ORDEN_CLIENTES,
+            filtros=(busqueda, mostrar_inactivos),
+            tamano=ITEMS_POR_PAGINA,
+            etiqueta='clientes'
+        )
     except Exception as e:
         st.error(f"Error al obtener clientes: {str(e)}")
         return []
@@ -56,18 +71,21 @@ def crear_cliente(datos):
         if existe.data:
             return False, "Ya existe un cliente con ese email o documento"
         
-        response = supabase.table('clientes').insert(datos).execute()
+        usuario = st.session_state['usuario']['email']
+        response = como_usuario(supabase.table('clientes').insert(datos), usuario).execute()
         
-        # Registrar en auditoría
-        registrar_auditoria(
-            st.session_state['usuario']['email'],
-            'clientes',
-            'INSERT',
-            f"Se creó el cliente: {datos['nombre']} {datos['apellido']}",
-            None,
-            datos
-        )
+        # Registrar en auditoría (si no lo hace el trigger de clientes)
+        if auditar_en_aplicacion('clientes'):
+            registrar_auditoria(
+                usuario,
+                'clientes',
+                'INSERT',
+                f"Se creó el cliente: {datos['nombre']} {datos['apellido']}",
+                None,
+                datos
+            )
         
+        reiniciar_paginacion('clientes')
         return True, "Cliente creado exitosamente"
     except Exception as e:
         return False, f"Error al crear cliente: {str(e)}"
@@ -75,17 +93,21 @@ def crear_cliente(datos):
 def actualizar_cliente(id_cliente, datos):
     """Actualiza un cliente existente"""
     try:
-        # Obtener datos anteriores para auditoría
-        cliente_anterior = supabase.table('clientes')\
-            .select('*')\
-            .eq('id', id_cliente)\
-            .execute()
+        usuario = st.session_state['usuario']['email']
+        auditar = auditar_en_aplicacion('clientes')
+        
+        # Obtener datos anteriores para auditoría (el trigger ya tiene OLD)
+        if auditar:
+            cliente_anterior = supabase.table('clientes')\
+                .select('*')\
+                .eq('id', id_cliente)\
+                .execute()
         
         # Verificar unicidad de email y documento
         if 'email' in datos or 'documento' in datos:
             existe = supabase.table('clientes')\
                 .select('id')\
-                .not_('id', 'eq', id_cliente)\
+                .neq('id', id_cliente)\
                 .or_(
                     f"email.eq.{datos.get('email', '')},"\
                     f"documento.eq.{datos.get('documento', '')}"
@@ -95,20 +117,20 @@ def actualizar_cliente(id_cliente, datos):
             if existe.data:
                 return False, "Ya existe otro cliente con ese email o documento"
         
-        response = supabase.table('clientes')\
-            .update(datos)\
+        response = como_usuario(supabase.table('clientes').update(datos), usuario)\
             .eq('id', id_cliente)\
             .execute()
         
         # Registrar en auditoría
-        registrar_auditoria(
-            st.session_state['usuario']['email'],
-            'clientes',
-            'UPDATE',
-            f"Se actualizó el cliente ID: {id_cliente}",
-            cliente_anterior.data[0],
-            datos
-        )
+        if auditar:
+            registrar_auditoria(
+                usuario,
+                'clientes',
+                'UPDATE',
+                f"Se actualizó el cliente ID: {id_cliente}",
+                cliente_anterior.data[0],
+                datos
+            )
         
         return True, "Cliente actualizado exitosamente"
     except Exception as e:
@@ -121,34 +143,39 @@ def eliminar_cliente(id_cliente):
         reservas = supabase.table('reservas')\
             .select('id')\
             .eq('id_cliente', id_cliente)\
-            .not_('estado', 'eq', 'completada')\
+            .neq('estado', 'completada')\
             .execute()
         
         if reservas.data:
             return False, "No se puede eliminar el cliente porque tiene reservas pendientes"
         
-        # Obtener datos para auditoría
-        cliente = supabase.table('clientes')\
-            .select('*')\
-            .eq('id', id_cliente)\
-            .execute()
+        usuario = st.session_state['usuario']['email']
+        auditar = auditar_en_aplicacion('clientes')
+        
+        # Obtener datos para auditoría (el trigger ya tiene OLD)
+        if auditar:
+            cliente = supabase.table('clientes')\
+                .select('*')\
+                .eq('id', id_cliente)\
+                .execute()
         
         # Eliminar cliente
-        response = supabase.table('clientes')\
-            .delete()\
+        response = como_usuario(supabase.table('clientes').delete(), usuario)\
             .eq('id', id_cliente)\
             .execute()
         
         # Registrar en auditoría
-        registrar_auditoria(
-            st.session_state['usuario']['email'],
-            'clientes',
-            'DELETE',
-            f"Se eliminó el cliente ID: {id_cliente}",
-            cliente.data[0],
-            None
-        )
+        if auditar:
+            registrar_auditoria(
+                usuario,
+                'clientes',
+                'DELETE',
+                f"Se eliminó el cliente ID: {id_cliente}",
+                cliente.data[0],
+                None
+            )
         
+        reiniciar_paginacion('clientes')
         return True, "Cliente eliminado exitosamente"
     except Exception as e:
         return False, f"Error al eliminar cliente: {str(e)}"
@@ -172,29 +199,8 @@ with tab1:
     # Obtener y mostrar clientes
     clientes = obtener_clientes(busqueda, mostrar_inactivos)
     if clientes:
-        # Configuración de paginación
-        ITEMS_POR_PAGINA = 5
-        total_clientes = len(clientes)
-        total_paginas = (total_clientes + ITEMS_POR_PAGINA - 1) // ITEMS_POR_PAGINA
-        
-        col1, col2, col3 = st.columns([2, 3, 2])
-        with col2:
-            pagina_actual = st.number_input(
-                "Página",
-                min_value=1,
-                max_value=max(1, total_paginas),
-                value=1,
-                key="pagina_clientes"
-            )
-        
-        inicio = (pagina_actual - 1) * ITEMS_POR_PAGINA
-        fin = min(inicio + ITEMS_POR_PAGINA, total_clientes)
-        
-        # Información de paginación
-        st.markdown(f"Mostrando clientes {inicio + 1}-{fin} de {total_clientes}")
-        
         # Mostrar clientes de la página actual
-        for cliente in clientes[inicio:fin]:
+        for cliente in clientes:
             with st.expander(
                 f"{'🟢' if cliente['activo'] else '🔴'} {cliente['nombre']} {cliente['apellido']} - {cliente['documento']}"
             ):
@@ -271,4 +277,7 @@ with tab2:
                     st.success(message)
                     st.rerun()
                 else:
-                    st.error(message)
\ No newline at end of file
+                    st.error(message)
+
+# Trazas de las llamadas al backend de este rerun (solo administradores)
+panel_trazas()
@@ -2,9 +2,18 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from datetime import datetime, timedelta, date
-from components.database import supabase, obtener_reservas_completas, obtener_estadisticas_canchas
+from datetime import datetime, timedelta
+from components.database import (
+    obtener_estadisticas_canchas,
+    obtener_ingresos_diarios,
+    obtener_reservas_por_estado,
+    obtener_top_clientes,
+    obtener_fidelizacion_clientes
+)
+from components.ocupacion import cargar_datos, calcular_ocupacion, mapa_calor, ocupacion_por_grupo
+from components.exportacion import selector_formato, boton_descarga
 from components.auth import verificar_autenticacion, verificar_rol
+from components.trazas import panel_trazas
 
 # Verificar autenticación y roles permitidos
 if not verificar_autenticacion():
@@ -19,37 +28,19 @@ st.title("📊 Reportes de Negocio")
 
 # Crear pestañas para los diferentes reportes
 tab_ingresos, tab_clientes = st.tabs([
-    "📈 Ingresos y Ocupación", 
+    "📈 Ingresos y Ocupación",
     "👥 Clientes y Fidelización"
 ])
 
+# Los reportes llegan ya agregados desde la base de datos (funciones reporte_*
+# sobre los resúmenes diarios): la página recibe pocas filas sin importar
+# cuántas reservas hay en el rango
+
 # === Pestaña de Ingresos y Ocupación ===
 with tab_ingresos:
     st.header("Ingresos y Ocupación de Canchas")
     
     try:
-        # Obtener datos de reservas
-        reservas_response = obtener_reservas_completas()
-        if not reservas_response or not hasattr(reservas_response, 'data'):
-            st.warning("No se pudieron obtener los datos de reservas")
-            st.stop()
-        
-        df_reservas = pd.DataFrame(reservas_response.data)
-        
-        # Procesar los datos para crear las columnas necesarias
-        df_reservas['nombre_cliente'] = df_reservas.apply(
-            lambda x: f"{x['clientes']['nombre']} {x['clientes']['apellido']}" 
-            if x.get('clientes') else "Cliente Desconocido", 
-            axis=1
-        )
-        df_reservas['nombre_cancha'] = df_reservas.apply(
-            lambda x: x['canchas']['nombre'] if x.get('canchas') else "Cancha Desconocida",
-            axis=1
-        )
-        
-        # Convertir columnas de fecha/hora
-        df_reservas['fecha'] = pd.to_datetime(df_reservas['fecha'])
-        
         # Filtros
         col1, col2 = st.columns(2)
         with col1:
@@ -63,126 +54,175 @@ with tab_ingresos:
                 value=datetime.now()
             )
         
-        # Filtrar por rango de fechas
-        mask = (df_reservas['fecha'].dt.date >= fecha_inicio) & (df_reservas['fecha'].dt.date <= fecha_fin)
-        df_filtrado = df_reservas[mask]
+        df_estados = pd.DataFrame(
+            obtener_reservas_por_estado(fecha_inicio, fecha_fin).data,
+            columns=['estado', 'total_reservas', 'ingresos_totales']
+        )
         
-        if len(df_filtrado) > 0:
+        if len(df_estados) > 0:
             # === Gráficos de Ingresos ===
             st.subheader("Análisis de Ingresos")
             
             # Gráfico de ingresos por día
-            ingresos_diarios = df_filtrado.groupby('fecha')['monto_total'].sum().reset_index()
+            ingresos_diarios = pd.DataFrame(
+                obtener_ingresos_diarios(fecha_inicio, fecha_fin).data,
+                columns=['fecha', 'total_reservas', 'ingresos_totales']
+            )
+            ingresos_diarios['fecha'] = pd.to_datetime(ingresos_diarios['fecha'])
             fig_ingresos = px.line(
-                ingresos_diarios, 
-                x='fecha', 
-                y='monto_total',
+                ingresos_diarios,
+                x='fecha',
+                y='ingresos_totales',
                 title='Ingresos Diarios',
-                labels={'fecha': 'Fecha', 'monto_total': 'Ingresos Totales ($)'}
+                labels={'fecha': 'Fecha', 'ingresos_totales': 'Ingresos Totales ($)'}
             )
             st.plotly_chart(fig_ingresos, use_container_width=True)
             
+            # Estadísticas por cancha: ingresos, horas y tipo (una fila por cancha)
+            df_stats = pd.DataFrame(
+                obtener_estadisticas_canchas(fecha_inicio, fecha_fin).data,
+                columns=['id', 'nombre_cancha', 'tipo_cancha', 'total_reservas', 'horas_reservadas', 'ingresos_totales']
+            )
+            df_stats = df_stats.fillna({'nombre_cancha': 'Sin nombre', 'tipo_cancha': 'Sin tipo'})
+            df_stats['horas_reservadas'] = df_stats['horas_reservadas'].astype(float).round(2)
+            df_stats['ingresos_totales'] = df_stats['ingresos_totales'].astype(float).round(2)
+            
             # Gráfico de ingresos por cancha
-            ingresos_cancha = df_filtrado.groupby('nombre_cancha')['monto_total'].sum().reset_index()
             fig_canchas = px.pie(
-                ingresos_cancha, 
-                values='monto_total', 
+                df_stats[df_stats['ingresos_totales'] > 0],
+                values='ingresos_totales',
                 names='nombre_cancha',
                 title='Distribución de Ingresos por Cancha'
             )
             st.plotly_chart(fig_canchas, use_container_width=True)
             
+            # Reservas por estado (incluye las canceladas)
+            fig_estados = px.bar(
+                df_estados,
+                x='estado',
+                y='total_reservas',
+                title='Reservas por Estado',
+                labels={'estado': 'Estado', 'total_reservas': 'Reservas'}
+            )
+            st.plotly_chart(fig_estados, use_container_width=True)
+            
             # === Gráficos de Ocupación ===
             st.subheader("Análisis de Ocupación")
             
+            if len(df_stats) > 0:
+                # Gráfico de horas reservadas por cancha
+                fig_ocupacion = px.bar(
+                    df_stats,
+                    x='nombre_cancha',
+                    y='horas_reservadas',
+                    title='Horas Reservadas por Cancha',
+                    labels={'nombre_cancha': 'Cancha', 'horas_reservadas': 'Horas Reservadas'},
+                    color='tipo_cancha'
+                )
+                st.plotly_chart(fig_ocupacion, use_container_width=True)
+                
+                # Tabla de resumen
+                st.subheader("Resumen por Cancha")
+                st.dataframe(
+                    df_stats[['nombre_cancha', 'horas_reservadas', 'tipo_cancha', 'ingresos_totales']].style.format({
+                        'horas_reservadas': '{:.1f}',
+                        'ingresos_totales': '${:,.2f}'
+                    })
+                )
+            else:
+                st.warning("No se pudieron obtener datos de las canchas")
+            
+            # === Ocupación contra el horario de funcionamiento ===
+            st.subheader("Ocupación por Día y Hora")
+            
             try:
-                # Obtener estadísticas de canchas
-                stats_response = obtener_estadisticas_canchas()
-                if stats_response and hasattr(stats_response, 'data') and stats_response.data:
-                    # Procesar los datos de estadísticas
-                    canchas_stats = []
-                    for cancha in stats_response.data:
-                        try:
-                            nombre_cancha = cancha.get('nombre', 'Sin nombre')
-                            tipo_cancha = cancha.get('tipos_cancha', {}).get('nombre', 'Sin tipo')
-                            
-                            horas_reservadas = 0
-                            total_ingresos = 0
-                            
-                            # Procesar reservas
-                            if cancha.get('reservas'):
-                                for reserva in cancha['reservas']:
-                                    try:
-                                        hora_inicio = datetime.strptime(reserva['hora_inicio'], '%H:%M:%S').time()
-                                        hora_fin = datetime.strptime(reserva['hora_fin'], '%H:%M:%S').time()
-                                        horas = (datetime.combine(date.today(), hora_fin) - 
-                                                datetime.combine(date.today(), hora_inicio)).seconds / 3600
-                                        horas_reservadas += horas
-                                        total_ingresos += float(reserva.get('monto_total', 0))
-                                    except (ValueError, TypeError, KeyError) as e:
-                                        st.warning(f"Error procesando reserva de la cancha {nombre_cancha}: {str(e)}")
-                                        continue
-
-                            canchas_stats.append({
-                                'nombre_cancha': nombre_cancha,
-                                'horas_reservadas': round(horas_reservadas, 2),
-                                'tipo_cancha': tipo_cancha,
-                                'ingresos_totales': round(total_ingresos, 2)
-                            })
-                        except Exception as e:
-                            st.warning(f"Error al procesar datos de la cancha: {str(e)}")
-                            continue
-                    
-                    if canchas_stats:
-                        # Crear DataFrame y mostrar gráficos
-                        df_stats = pd.DataFrame(canchas_stats)
-                        
-                        # Gráfico de horas reservadas por cancha
-                        fig_ocupacion = px.bar(
-                            df_stats,
-                            x='nombre_cancha',
-                            y='horas_reservadas',
-                            title='Horas Reservadas por Cancha',
-                            labels={'nombre_cancha': 'Cancha', 'horas_reservadas': 'Horas Reservadas'},
-                            color='tipo_cancha'
-                        )
-                        st.plotly_chart(fig_ocupacion, use_container_width=True)
-
-                        # Tabla de resumen
-                        st.subheader("Resumen por Cancha")
-                        st.dataframe(
-                            df_stats.style.format({
-                                'horas_reservadas': '{:.1f}',
-                                'ingresos_totales': '${:,.2f}'
-                            })
-                        )
-                    else:
-                        st.warning("No hay datos de reservas para mostrar")
+                datos = cargar_datos(fecha_inicio, fecha_fin)
+                df_info = datos['canchas']
+                ocupacion = calcular_ocupacion(
+                    df_info['id'].tolist(),
+                    datos['horarios'],
+                    datos['reservas'],
+                    fecha_inicio,
+                    fecha_fin
+                )
+                
+                nombres_canchas = dict(zip(df_info['id'], df_info['nombre']))
+                cancha_mapa = st.selectbox(
+                    "Cancha",
+                    options=[None] + df_info['id'].tolist(),
+                    format_func=lambda x: "Todas las canchas" if x is None else nombres_canchas[x]
+                )
+                mapa = mapa_calor(ocupacion, None if cancha_mapa is None else [cancha_mapa])
+                # Solo las horas en que alguna cancha funciona
+                mapa = mapa.loc[:, mapa.notna().any()]
+                
+                if mapa.empty:
+                    st.info("No hay horarios de funcionamiento definidos para las canchas")
                 else:
-                    st.warning("No se pudieron obtener datos de las canchas")
-
+                    fig_mapa = px.imshow(
+                        mapa,
+                        text_auto='.0f',
+                        aspect='auto',
+                        zmin=0,
+                        zmax=100,
+                        color_continuous_scale='Blues',
+                        title='Ocupación (%) por Día de la Semana y Hora',
+                        labels={'x': 'Hora', 'y': 'Día', 'color': 'Ocupación (%)'}
+                    )
+                    st.plotly_chart(fig_mapa, use_container_width=True)
+                    
+                    # Comparación por tipo de cancha
+                    df_tipos = ocupacion_por_grupo(ocupacion, dict(zip(df_info['id'], df_info['tipo'])))
+                    fig_tipos = px.bar(
+                        df_tipos,
+                        x='grupo',
+                        y='ocupacion',
+                        title='Ocupación por Tipo de Cancha',
+                        labels={'grupo': 'Tipo de Cancha', 'ocupacion': 'Ocupación (%)'},
+                        hover_data={'horas_disponibles': ':.1f', 'horas_reservadas': ':.1f'}
+                    )
+                    fig_tipos.update_yaxes(range=[0, 100])
+                    st.plotly_chart(fig_tipos, use_container_width=True)
             except Exception as e:
-                st.error(f"Error al procesar estadísticas de canchas: {str(e)}")
-                import traceback
-                st.error(f"Detalles del error: {traceback.format_exc()}")
+                st.error(f"Error al calcular la ocupación: {str(e)}")
             
-            # Tabla de métricas clave
-            col1, col2, col3 = st.columns(3)
+            # Tabla de métricas clave (los ingresos no cuentan las canceladas)
+            activas = df_estados[df_estados['estado'] != 'cancelada']
+            total_reservas = int(activas['total_reservas'].sum())
+            total_ingresos = float(activas['ingresos_totales'].astype(float).sum())
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric(
-                    "Ingresos Totales", 
-                    f"${df_filtrado['monto_total'].sum():,.2f}"
+                    "Ingresos Totales",
+                    f"${total_ingresos:,.2f}"
                 )
             with col2:
                 st.metric(
-                    "Reservas Totales", 
-                    len(df_filtrado)
+                    "Reservas Totales",
+                    total_reservas
                 )
             with col3:
                 st.metric(
-                    "Promedio por Reserva", 
-                    f"${df_filtrado['monto_total'].mean():,.2f}"
+                    "Promedio por Reserva",
+                    f"${total_ingresos / total_reservas:,.2f}" if total_reservas else "$0.00"
+                )
+            with col4:
+                st.metric(
+                    "Reservas Canceladas",
+                    int(df_estados.loc[df_estados['estado'] == 'cancelada', 'total_reservas'].sum())
                 )
+            
+            # Descarga de los reportes agregados del rango
+            with st.expander("⬇️ Exportar reportes"):
+                formato = selector_formato('reportes_ingresos')
+                rango = f"{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}"
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    boton_descarga('ingresos_diarios', "Ingresos diarios", f"ingresos_diarios_{rango}", ingresos_diarios, formato)
+                with col2:
+                    boton_descarga('estadisticas_canchas', "Resumen por cancha", f"resumen_canchas_{rango}", df_stats, formato)
+                with col3:
+                    boton_descarga('reservas_estado', "Reservas por estado", f"reservas_estado_{rango}", df_estados, formato)
         else:
             st.warning("No hay datos para el rango de fechas seleccionado")
     except Exception as e:
@@ -192,33 +232,40 @@ with tab_ingresos:
 with tab_clientes:
     st.header("Análisis de Clientes y Fidelización")
     
+    try:
+        df_top = pd.DataFrame(
+            obtener_top_clientes(fecha_inicio, fecha_fin).data,
+            columns=['id', 'nombre_cliente', 'total_reservas', 'gasto_total', 'posicion_reservas', 'posicion_gasto']
+        )
+    except Exception as e:
+        st.error(f"Error al cargar los clientes: {str(e)}")
+        df_top = pd.DataFrame()
+    
     # === Análisis de Clientes ===
-    if 'df_filtrado' in locals() and len(df_filtrado) > 0:
+    if len(df_top) > 0:
         st.subheader("Comportamiento de Clientes")
         
         # Frecuencia de reservas por cliente
-        frecuencia_clientes = df_filtrado.groupby('nombre_cliente').size().reset_index(name='reservas')
-        frecuencia_clientes = frecuencia_clientes.sort_values('reservas', ascending=False).head(10)
+        frecuencia_clientes = df_top[df_top['posicion_reservas'] <= 10].sort_values('posicion_reservas')
         
         fig_frecuencia = px.bar(
             frecuencia_clientes,
             x='nombre_cliente',
-            y='reservas',
+            y='total_reservas',
             title='Top 10 Clientes por Número de Reservas',
-            labels={'nombre_cliente': 'Cliente', 'reservas': 'Número de Reservas'}
+            labels={'nombre_cliente': 'Cliente', 'total_reservas': 'Número de Reservas'}
         )
         st.plotly_chart(fig_frecuencia, use_container_width=True)
         
         # Gasto total por cliente
-        gasto_clientes = df_filtrado.groupby('nombre_cliente')['monto_total'].sum().reset_index()
-        gasto_clientes = gasto_clientes.sort_values('monto_total', ascending=False).head(10)
+        gasto_clientes = df_top[df_top['posicion_gasto'] <= 10].sort_values('posicion_gasto')
         
         fig_gasto = px.bar(
             gasto_clientes,
             x='nombre_cliente',
-            y='monto_total',
+            y='gasto_total',
             title='Top 10 Clientes por Gasto Total',
-            labels={'nombre_cliente': 'Cliente', 'monto_total': 'Gasto Total ($)'}
+            labels={'nombre_cliente': 'Cliente', 'gasto_total': 'Gasto Total ($)'}
         )
         st.plotly_chart(fig_gasto, use_container_width=True)
         
@@ -226,8 +273,9 @@ with tab_clientes:
         st.subheader("Métricas de Fidelización")
         
         # Calcular métricas de fidelización
-        clientes_unicos = df_filtrado['id_cliente'].nunique()
-        clientes_frecuentes = len(frecuencia_clientes[frecuencia_clientes['reservas'] > 3])
+        fidelizacion = obtener_fidelizacion_clientes(fecha_inicio, fecha_fin)
+        clientes_unicos = fidelizacion['clientes_unicos']
+        clientes_frecuentes = fidelizacion['clientes_frecuentes']
         tasa_retencion = (clientes_frecuentes / clientes_unicos) * 100 if clientes_unicos > 0 else 0
         
         col1, col2, col3 = st.columns(3)
@@ -238,6 +286,19 @@ with tab_clientes:
         with col3:
             st.metric("Tasa de Retención", f"{tasa_retencion:.1f}%")
         
-        
+        with st.expander("⬇️ Exportar clientes"):
+            formato = selector_formato('reportes_clientes')
+            boton_descarga(
+                'top_clientes',
+                "Top clientes",
+                f"top_clientes_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}",
+                df_top,
+                formato
+            )
+    
+    
     else:
         st.warning("No hay datos disponibles para el análisis de clientes")
+
+# Trazas de las llamadas al backend de este rerun (solo administradores)
+panel_trazas()
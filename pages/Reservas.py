@@ -1,6 +1,12 @@
 import streamlit as st
-from components.database import supabase, registrar_auditoria, obtener_reservas_completas
-import pandas as pd
+from components.database import (
+    supabase, registrar_auditoria, consulta_reservas_completas, como_usuario, auditar_en_aplicacion,
+    crear_reserva as crear_reserva_bd, crear_reservas_serie, HorarioOcupadoError, es_solapamiento
+)
+from components.utils import paginar, reiniciar_paginacion
+from components.exportacion import panel_exportacion, exportar_reservas
+from components.disponibilidad import obtener_indice, fechas_sin_turnos, horas_libres, fechas_serie
+from components.trazas import panel_trazas
 from datetime import datetime, timedelta, time
 
 # Verificación de autenticación
@@ -14,6 +20,16 @@ if rol not in ['admin', 'operador_reservas']:
     st.error("⛔ No tiene permisos para acceder a esta página")
     st.stop()
 
+# Configuración de paginación (orden estable para los cursores)
+ITEMS_POR_PAGINA = 8
+ORDEN_RESERVAS = [('fecha', False), ('hora_inicio', False), ('id', False)]
+
+# Duraciones (minutos) ofrecidas al buscar turnos libres
+DURACIONES_TURNO = [30, 60, 90, 120, 180, 240]
+
+# Repetición de reservas recurrentes -> semanas entre ocurrencias
+REPETICIONES = {"No se repite": 0, "Semanal": 1, "Quincenal": 2}
+
 # Funciones auxiliares
 def obtener_clientes_activos(busqueda=""):
     """Obtiene la lista de clientes activos"""
@@ -46,72 +62,42 @@ def obtener_canchas_disponibles():
 def verificar_disponibilidad(id_cancha, fecha, hora_inicio, hora_fin):
     """Verifica si la cancha está disponible en el horario seleccionado"""
     try:
-        # Verificar horario de funcionamiento
-        dia_semana = fecha.weekday() + 1  # Python: 0-6, BD: 1-7
-        horario = supabase.table('horarios_disponibles')\
-            .select('*')\
-            .eq('id_cancha', id_cancha)\
-            .eq('dia_semana', dia_semana)\
-            .execute()
-        
-        if not horario.data:
-            return False, "No hay horario definido para este día"
-        
-        # Convertir strings de hora a objetos time
-        hora_inicio_permitida = datetime.strptime(horario.data[0]['hora_inicio'], '%H:%M:%S').time()
-        hora_fin_permitida = datetime.strptime(horario.data[0]['hora_fin'], '%H:%M:%S').time()
-        
-        if hora_inicio < hora_inicio_permitida or hora_fin > hora_fin_permitida:
-            return False, f"El horario está fuera del rango permitido ({hora_inicio_permitida.strftime('%H:%M')} - {hora_fin_permitida.strftime('%H:%M')})"
-        
-        # Verificar reservas existentes
-        reservas = supabase.table('reservas')\
-            .select('*')\
-            .eq('id_cancha', id_cancha)\
-            .eq('fecha', fecha.isoformat())\
-            .neq('estado', 'cancelada')\
-            .execute()
-        
-        for reserva in reservas.data:
-            hora_inicio_reserva = datetime.strptime(reserva['hora_inicio'], '%H:%M:%S').time()
-            hora_fin_reserva = datetime.strptime(reserva['hora_fin'], '%H:%M:%S').time()
-            
-            if (hora_inicio < hora_fin_reserva and hora_fin > hora_inicio_reserva):
-                return False, f"Ya existe una reserva en el horario {hora_inicio_reserva.strftime('%H:%M')} - {hora_fin_reserva.strftime('%H:%M')}"
-        
-        return True, "Horario disponible"
+        # Búsqueda en el índice en memoria (sin consultas salvo al recargar la ventana)
+        return obtener_indice().verificar(id_cancha, fecha, hora_inicio, hora_fin)
     except Exception as e:
         return False, f"Error al verificar disponibilidad: {str(e)}"
 
+def obtener_turnos_libres(canchas, duracion_minutos):
+    """Turnos libres de todas las canchas para los próximos 30 días"""
+    try:
+        return obtener_indice().turnos_libres(
+            [c['id'] for c in canchas],
+            datetime.now().date(),
+            31,
+            duracion_minutos
+        )
+    except Exception as e:
+        st.error(f"Error al calcular turnos libres: {str(e)}")
+        return None
+
 def obtener_reservas_filtradas(busqueda="", fecha_inicio=None, fecha_fin=None, estado=None):
-    """Obtiene las reservas con filtros aplicados"""
+    """Obtiene la página actual de reservas con los filtros aplicados en la base de datos"""
     try:
-        response = obtener_reservas_completas()
-        if not response.data:
-            return []
-        
-        df = pd.DataFrame(response.data)
-        
-        # Aplicar filtros
-        if busqueda:
-            busqueda = busqueda.lower()
-            df = df[
-                df['clientes'].apply(lambda x: 
-                    busqueda in x['nombre'].lower() or 
-                    busqueda in x['apellido'].lower()
-                )
-            ]
-        
-        if fecha_inicio:
-            df = df[df['fecha'] >= fecha_inicio.isoformat()]
-        
-        if fecha_fin:
-            df = df[df['fecha'] <= fecha_fin.isoformat()]
-            
-        if estado:
-            df = df[df['estado'] == estado]
-            
-        return df.to_dict('records')
+        return paginar(
+            'reservas',
+            lambda conteo: consulta_reservas_completas(
+                fecha_inicio=fecha_inicio,
+                fecha_fin=fecha_fin,
+                estado=estado,
+                busqueda=busqueda,
+                conteo=conteo
+            ),
+            orden=ORDEN_RESERVAS,
+            filtros=(busqueda, fecha_inicio, fecha_fin, estado),
+            tamano=ITEMS_POR_PAGINA,
+            conteo='estimated',
+            etiqueta='reservas'
+        )
     except Exception as e:
         st.error(f"Error al obtener reservas: {str(e)}")
         return []
@@ -119,82 +105,99 @@ def obtener_reservas_filtradas(busqueda="", fecha_inicio=None, fecha_fin=None, e
 def cambiar_estado_reserva(id_reserva, nuevo_estado):
     """Actualiza el estado de una reserva"""
     try:
-        # Obtener datos anteriores para auditoría
-        reserva_anterior = supabase.table('reservas')\
-            .select('*')\
-            .eq('id', id_reserva)\
-            .single()\
-            .execute()
+        usuario = st.session_state['usuario']['email']
+        auditar = auditar_en_aplicacion('reservas')
         
-        response = supabase.table('reservas')\
-            .update({'estado': nuevo_estado})\
+        # Obtener datos anteriores para auditoría (el trigger ya tiene OLD)
+        if auditar:
+            reserva_anterior = supabase.table('reservas')\
+                .select('*')\
+                .eq('id', id_reserva)\
+                .single()\
+                .execute()
+        
+        response = como_usuario(supabase.table('reservas').update({'estado': nuevo_estado}), usuario)\
             .eq('id', id_reserva)\
             .execute()
         
+        # Mantener el índice de disponibilidad (una cancelación libera el horario)
+        if response.data:
+            obtener_indice().registrar(response.data[0])
+        
         # Registrar en auditoría
-        registrar_auditoria(
-            st.session_state['usuario']['email'],
-            'reservas',
-            'UPDATE',
-            f"Se cambió el estado de la reserva ID: {id_reserva} a {nuevo_estado}",
-            reserva_anterior.data,
-            {'estado': nuevo_estado}
-        )
+        if auditar:
+            registrar_auditoria(
+                usuario,
+                'reservas',
+                'UPDATE',
+                f"Se cambió el estado de la reserva ID: {id_reserva} a {nuevo_estado}",
+                reserva_anterior.data,
+                {'estado': nuevo_estado}
+            )
         
+        reiniciar_paginacion('reservas')
         return True, "Estado actualizado exitosamente"
     except Exception as e:
+        if es_solapamiento(e):
+            # Reactivar una reserva cancelada cuyo horario ya fue ocupado
+            obtener_indice().invalidar()
+            return False, "No se puede cambiar el estado: el horario ya está ocupado por otra reserva"
         return False, f"Error al actualizar estado: {str(e)}"
 
 def crear_reserva(id_cliente, id_cancha, fecha, hora_inicio, hora_fin, observaciones=""):
     """Crea una nueva reserva"""
     try:
-        # Verificar disponibilidad
+        # Verificar disponibilidad (en memoria, para dar un mensaje claro)
         disponible, mensaje = verificar_disponibilidad(id_cancha, fecha, hora_inicio, hora_fin)
         if not disponible:
             return False, mensaje
         
-        # Calcular duración y monto
-        duracion = (datetime.combine(fecha, hora_fin) - 
-                   datetime.combine(fecha, hora_inicio)).seconds / 3600
-        
-        # Obtener precio por hora
-        cancha = supabase.table('canchas')\
-            .select('tipos_cancha(precio_por_hora)')\
-            .eq('id', id_cancha)\
-            .single()\
-            .execute()
-        
-        precio_hora = cancha.data['tipos_cancha']['precio_por_hora']
-        monto_total = precio_hora * duracion
-        
-        # Crear reserva
-        data = {
-            'id_cliente': id_cliente,
-            'id_cancha': id_cancha,
-            'fecha': fecha.isoformat(),
-            'hora_inicio': hora_inicio.isoformat(),
-            'hora_fin': hora_fin.isoformat(),
-            'estado': 'pendiente',
-            'monto_total': monto_total,
-            'observaciones': observaciones
-        }
-        
-        response = supabase.table('reservas').insert(data).execute()
-        
-        # Registrar en auditoría
-        registrar_auditoria(
-            st.session_state['usuario']['email'],
-            'reservas',
-            'INSERT',
-            f"Se creó una reserva para el cliente {id_cliente}",
-            None,
-            data
+        # Validación, monto, inserción y auditoría en una sola llamada atómica
+        reserva = crear_reserva_bd(
+            id_cliente,
+            id_cancha,
+            fecha,
+            hora_inicio,
+            hora_fin,
+            observaciones,
+            estado='pendiente',
+            nombre_usuario=st.session_state['usuario']['email']
         )
+        obtener_indice().registrar(reserva)
         
+        reiniciar_paginacion('reservas')
         return True, "Reserva creada exitosamente"
+    except HorarioOcupadoError as e:
+        # Otro operador ocupó el horario: la base de datos lo rechazó, recargar el índice
+        obtener_indice().invalidar()
+        return False, str(e)
     except Exception as e:
         return False, f"Error al crear reserva: {str(e)}"
 
+def crear_serie(id_cliente, id_cancha, fechas, hora_inicio, hora_fin, observaciones=""):
+    """Crea todas las ocurrencias aceptadas de una serie recurrente"""
+    try:
+        reservas = crear_reservas_serie(
+            id_cliente,
+            id_cancha,
+            fechas,
+            hora_inicio,
+            hora_fin,
+            observaciones,
+            estado='pendiente',
+            nombre_usuario=st.session_state['usuario']['email']
+        )
+        for reserva in reservas:
+            obtener_indice().registrar(reserva)
+        
+        reiniciar_paginacion('reservas')
+        return True, f"Se crearon {len(reservas)} reservas"
+    except HorarioOcupadoError:
+        obtener_indice().invalidar()
+        return False, "Otra reserva ocupó alguna de las fechas; verifique la serie nuevamente"
+    except Exception as e:
+        return False, f"Error al crear la serie: {str(e)}"
+
 # Interfaz de usuario
 st.title("📅 Gestión de Reservas")
 
@@ -228,34 +231,25 @@ with tab_lista:
     
     # Obtener y mostrar reservas
     estado = None if estado_filtro == "Todos" else estado_filtro
+    
+    # Exportación de todas las reservas filtradas (no solo la página actual)
+    with st.expander("⬇️ Exportar reservas"):
+        panel_exportacion(
+            'reservas',
+            f"reservas_{fecha_inicio:%Y%m%d}_{fecha_fin:%Y%m%d}",
+            lambda ruta, formato, progreso: exportar_reservas(
+                ruta, formato, fecha_inicio, fecha_fin, estado, busqueda, progreso
+            ),
+            filtros=(busqueda, fecha_inicio, fecha_fin, estado)
+        )
+    
     reservas = obtener_reservas_filtradas(busqueda, fecha_inicio, fecha_fin, estado)
     
     if not reservas:
         st.info("No se encontraron reservas que coincidan con los filtros seleccionados.")
     else:
-        # Configuración de paginación
-        ITEMS_POR_PAGINA = 8
-        total_reservas = len(reservas)
-        total_paginas = (total_reservas + ITEMS_POR_PAGINA - 1) // ITEMS_POR_PAGINA
-        
-        col1, col2, col3 = st.columns([2, 3, 2])
-        with col2:
-            pagina_actual = st.number_input(
-                "Página",
-                min_value=1,
-                max_value=max(1, total_paginas),
-                value=1,
-                key="pagina_reservas"
-            )
-        
-        inicio = (pagina_actual - 1) * ITEMS_POR_PAGINA
-        fin = min(inicio + ITEMS_POR_PAGINA, total_reservas)
-        
-        # Información de paginación
-        st.markdown(f"Mostrando reservas {inicio + 1}-{fin} de {total_reservas}")
-        
         # Mostrar reservas de la página actual
-        for reserva in reservas[inicio:fin]:
+        for reserva in reservas:
             with st.expander(
                 f"📍 {reserva['canchas']['nombre']} - "\
                 f"👤 {reserva['clientes']['nombre']} {reserva['clientes']['apellido']} - "\
@@ -338,6 +332,11 @@ with tab_crear:
 
     # Paso 3: Seleccionar Fecha y Hora
     st.subheader("3. Seleccionar Fecha y Hora")
+    modo_horario = st.radio(
+        "Modo de selección",
+        ["Turnos libres", "Horario manual"],
+        horizontal=True
+    )
     col1, col2 = st.columns(2)
 
     with col1:
@@ -347,9 +346,63 @@ with tab_crear:
             max_value=datetime.now().date() + timedelta(days=30)
         )
 
-    with col2:
-        hora_inicio = st.time_input("Hora de inicio", value=time(9, 0))
-        hora_fin = st.time_input("Hora de fin", value=time(10, 0))
+    if modo_horario == "Turnos libres":
+        with col1:
+            duracion_minutos = st.selectbox(
+                "Duración",
+                options=DURACIONES_TURNO,
+                index=1,
+                format_func=lambda m: f"{m // 60}:{m % 60:02d} h"
+            )
+        turnos = obtener_turnos_libres(canchas, duracion_minutos)
+        horas = horas_libres(turnos, cancha_seleccionada['id'], fecha) if turnos else []
+
+        with col2:
+            if horas:
+                hora_inicio = st.selectbox(
+                    "Hora de inicio",
+                    options=horas,
+                    format_func=lambda h: h.strftime('%H:%M')
+                )
+                hora_fin = (datetime.combine(fecha, hora_inicio) + timedelta(minutes=duracion_minutos)).time()
+                st.write("Hora de fin:", hora_fin.strftime('%H:%M'))
+            else:
+                st.warning("No hay turnos libres de esa duración en la fecha elegida")
+                st.stop()
+
+        if turnos:
+            completas = fechas_sin_turnos(turnos, cancha_seleccionada['id'])
+            if completas:
+                st.caption("📅 Días sin turnos libres para esta cancha: " +
+                           ", ".join(f.strftime('%d/%m') for f in completas))
+
+            with st.expander("Turnos libres en todas las canchas para la fecha"):
+                for cancha in canchas:
+                    horas_cancha = horas_libres(turnos, cancha['id'], fecha)
+                    if horas_cancha:
+                        st.write(f"**{cancha['nombre']}:** " +
+                                 ", ".join(h.strftime('%H:%M') for h in horas_cancha))
+                    else:
+                        st.write(f"**{cancha['nombre']}:** sin turnos libres")
+    else:
+        with col2:
+            hora_inicio = st.time_input("Hora de inicio", value=time(9, 0))
+            hora_fin = st.time_input("Hora de fin", value=time(10, 0))
+
+    # Repetición (reserva recurrente)
+    col1, col2 = st.columns(2)
+    with col1:
+        repeticion = st.radio("Repetición", list(REPETICIONES), horizontal=True)
+    fechas_ocurrencias = None
+    if REPETICIONES[repeticion]:
+        with col2:
+            repetir_hasta = st.date_input(
+                "Repetir hasta",
+                value=fecha + timedelta(weeks=8),
+                min_value=fecha,
+                max_value=fecha + timedelta(days=365)
+            )
+        fechas_ocurrencias = fechas_serie(fecha, repetir_hasta, REPETICIONES[repeticion])
 
     # Validaciones mejoradas
     validaciones_ok = True
@@ -370,7 +423,32 @@ with tab_crear:
             st.warning("⚠️ La duración excede 4 horas. ¿Está seguro?")
     
     # Verificar disponibilidad
-    if validaciones_ok:
+    if validaciones_ok and fechas_ocurrencias:
+        # Toda la serie se verifica con una sola consulta
+        try:
+            resultados = obtener_indice().verificar_serie(
+                cancha_seleccionada['id'],
+                fechas_ocurrencias,
+                hora_inicio,
+                hora_fin
+            )
+        except Exception as e:
+            st.error(f"Error al verificar la serie: {str(e)}")
+            st.stop()
+        
+        fechas_ocurrencias = [f for f, disponible, _ in resultados if disponible]
+        conflictos = len(resultados) - len(fechas_ocurrencias)
+        st.write(f"**Ocurrencias:** {len(resultados)} — ✅ {len(fechas_ocurrencias)} disponibles, ❌ {conflictos} con conflicto")
+        with st.expander("Detalle de la serie", expanded=conflictos > 0):
+            for f, disponible, mensaje in resultados:
+                st.write(f"{'✅' if disponible else '❌'} {f.strftime('%d/%m/%Y')} — {mensaje}")
+        
+        if not fechas_ocurrencias:
+            st.error("Ninguna fecha de la serie está disponible")
+            validaciones_ok = False
+        elif conflictos:
+            st.warning("Solo se crearán las fechas disponibles")
+    elif validaciones_ok:
         disponible, mensaje = verificar_disponibilidad(
             cancha_seleccionada['id'],
             fecha,
@@ -400,7 +478,12 @@ with tab_crear:
                 st.write("**Tipo:**", cancha_seleccionada['tipos_cancha']['nombre'])
             
             with col2:
-                st.write("**Fecha:**", fecha.strftime("%d/%m/%Y"))
+                if fechas_ocurrencias:
+                    st.write("**Fechas:**", f"{len(fechas_ocurrencias)} reservas ({repeticion.lower()}), "
+                             f"{fechas_ocurrencias[0].strftime('%d/%m/%Y')} a {fechas_ocurrencias[-1].strftime('%d/%m/%Y')}")
+                    monto = monto * len(fechas_ocurrencias)
+                else:
+                    st.write("**Fecha:**", fecha.strftime("%d/%m/%Y"))
                 st.write("**Horario:**", f"{hora_inicio.strftime('%H:%M')} - {hora_fin.strftime('%H:%M')}")
                 st.write("**Duración:**", f"{duracion:.1f} horas")
                 st.write("**Monto Total:** $", f"{monto:.2f}")
@@ -418,14 +501,24 @@ with tab_crear:
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✅ Sí, Confirmar", type="primary"):
-                    success, message = crear_reserva(
-                        cliente_seleccionado['id'],
-                        cancha_seleccionada['id'],
-                        fecha,
-                        hora_inicio,
-                        hora_fin,
-                        observaciones
-                    )
+                    if fechas_ocurrencias:
+                        success, message = crear_serie(
+                            cliente_seleccionado['id'],
+                            cancha_seleccionada['id'],
+                            fechas_ocurrencias,
+                            hora_inicio,
+                            hora_fin,
+                            observaciones
+                        )
+                    else:
+                        success, message = crear_reserva(
+                            cliente_seleccionado['id'],
+                            cancha_seleccionada['id'],
+                            fecha,
+                            hora_inicio,
+                            hora_fin,
+                            observaciones
+                        )
                     
                     if success:
                         st.success(message)
@@ -437,4 +530,7 @@ with tab_crear:
             with col2:
                 if st.button("❌ Cancelar"):
                     st.session_state.confirmar_reserva = False
-                    st.rerun()
\ No newline at end of file
+                    st.rerun()
+
+# Trazas de las llamadas al backend de este rerun (solo administradores)
+panel_trazas()
@@ -0,0 +1,119 @@
+"""
+Retención de la bitácora: archivo Parquet por mes y lectura del archivo.
+"""
+from datetime import date
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from components import archivo_auditoria, database
+from components.backend_local import ClienteLocal
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUDITORIA_ARCHIVO', str(tmp_path / 'archivo_auditoria'))
+    monkeypatch.setenv('AUDITORIA_MESES_CALIENTES', '3')
+    cliente = ClienteLocal(str(tmp_path / 'reservas.db'))
+    database.usar_cliente(cliente)
+    yield cliente
+    database.usar_cliente(None)
+
+
+def registrar(cliente, meses):
+    """Dos entradas de bitácora por cada mes indicado."""
+    cliente.table('auditoria_bitacora').insert([
+        {
+            'nombre_usuario': 'admin@test.com',
+            'tabla_afectada': 'clientes',
+            'tipo_accion': 'SELECT',
+            'descripcion_detallada': f'Consulta {dia}',
+            'created_at': f'{mes:%Y-%m}-{dia:02d}T09:00:00'
+        }
+        for mes in meses for dia in (5, 20)
+    ]).execute()
+
+
+def meses_en_base(cliente):
+    filas = cliente.table('auditoria_bitacora').select('created_at').execute().data
+    return sorted({f['created_at'][:7] for f in filas})
+
+
+def test_un_mes_con_error_no_detiene_la_retencion(cliente, monkeypatch):
+    registrar(cliente, [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)])
+    archivar_mes = archivo_auditoria.archivar_mes
+
+    def archivar_con_falla(mes):
+        if mes == date(2026, 2, 1):
+            raise Exception('Disco lleno')
+        return archivar_mes(mes)
+
+    monkeypatch.setattr(archivo_auditoria, 'archivar_mes', archivar_con_falla)
+
+    with pytest.raises(Exception, match='2026-02: Disco lleno'):
+        archivo_auditoria.ejecutar_retencion(hoy=date(2026, 7, 15))
+
+    assert archivo_auditoria.meses_archivados() == [date(2026, 1, 1), date(2026, 3, 1)]
+    # Los datos de prueba agregan entradas del mes actual
+    assert [m for m in meses_en_base(cliente) if m < '2026-04'] == ['2026-02']
+
+
+def listado_bitacora():
+    from datetime import date
+    import streamlit as st
+    from components.database import obtener_cliente
+    from components.archivo_auditoria import pagina_archivo, contar_archivo
+    from components.utils import paginar
+
+    desde, hasta = date(2026, 1, 1), date(2026, 4, 30)
+
+    def complemento(cursor, limite, contar):
+        filas = pagina_archivo(desde, hasta, None, 'SELECT', ['id', 'created_at'], cursor, limite)
+        return filas, contar_archivo(desde, hasta, None, 'SELECT') if contar else None
+
+    filas = paginar(
+        'bitacora',
+        lambda conteo: obtener_cliente().table('auditoria_bitacora').select('id, created_at', count=conteo)
+            .eq('tipo_accion', 'SELECT').gte('created_at', desde.isoformat()).lt('created_at', '2026-05-01'),
+        [('created_at', True), ('id', True)],
+        tamano=3,
+        complemento=complemento
+    )
+    st.write(f"filas: {[f['id'] for f in filas]}")
+
+
+def test_meses_archivados_se_paginan_con_la_tabla(cliente):
+    registrar(cliente, [date(2026, m, 1) for m in (1, 2, 3, 4)])
+    esperados = [
+        f['id'] for f in cliente.table('auditoria_bitacora').select('id')
+        .eq('tipo_accion', 'SELECT').gte('created_at', '2026-01-01').lt('created_at', '2026-05-01')
+        .order('created_at', desc=True).order('id', desc=True).execute().data
+    ]
+    # Enero y febrero salen de la tabla; marzo queda en ambos lugares
+    archivo_auditoria.ejecutar_retencion(hoy=date(2026, 5, 15))
+    archivo_auditoria.archivar_mes(date(2026, 3, 1))
+
+    at = AppTest.from_function(listado_bitacora).run()
+    vistos = []
+    while True:
+        vistos += [int(i) for i in at.markdown[-1].value.split('[')[1].rstrip(']').split(', ')]
+        if at.button(key='siguiente_bitacora').disabled:
+            break
+        at.button(key='siguiente_bitacora').click().run()
+
+    assert [m for m in meses_en_base(cliente) if m < '2026-05'] == ['2026-03', '2026-04']
+    assert vistos == esperados
+
+
+def test_detalle_archivado_lee_solo_la_fila(cliente):
+    registrar(cliente, [date(2026, 1, 1)])
+    fila = cliente.table('auditoria_bitacora').select('id, created_at')\
+        .gte('created_at', '2026-01-01').lt('created_at', '2026-02-01').limit(1).execute().data[0]
+    cliente.table('auditoria_bitacora').update({'datos_nuevos': {'telefono': '2'}}).eq('id', fila['id']).execute()
+    archivo_auditoria.archivar_mes(date(2026, 1, 1))
+
+    detalle = archivo_auditoria.detalle_archivado(fila['id'], fila['created_at'])
+
+    assert detalle['id'] == fila['id']
+    assert detalle['datos_nuevos'] == {'telefono': '2'}
+    assert archivo_auditoria.detalle_archivado(fila['id'] + 1000, fila['created_at']) is None
@@ -0,0 +1,88 @@
+"""
+Auditoría de la creación de reservas según la fuente configurada.
+
+Con cualquier valor de auditoria_fuentes cada reserva creada debe quedar en
+la bitácora exactamente una vez: como fila propia (reserva individual) o
+dentro de los ids del resumen de su serie.
+"""
+import json
+from datetime import date, time, timedelta
+
+import pytest
+
+from components import database
+from components.auditoria import obtener_escritor
+from components.backend_local import ClienteLocal
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUDITORIA_SPOOL', str(tmp_path / 'auditoria_pendiente.jsonl'))
+    cliente = ClienteLocal(str(tmp_path / 'reservas.db'))
+    database.usar_cliente(cliente)
+    database._fuentes_auditoria = None
+    yield cliente
+    obtener_escritor().vaciar()
+    database.usar_cliente(None)
+    database._fuentes_auditoria = None
+
+
+def entradas_por_reserva(cliente):
+    """Cuenta las entradas INSERT de la bitácora que cubren cada reserva."""
+    conteo = {}
+    with cliente._lock:
+        filas = cliente._con.execute(
+            """SELECT id_registro, datos_nuevos FROM auditoria_bitacora
+               WHERE tabla_afectada = 'reservas' AND tipo_accion = 'INSERT'"""
+        ).fetchall()
+    for id_registro, datos_nuevos in filas:
+        datos = json.loads(datos_nuevos) if datos_nuevos else {}
+        for id_reserva in datos.get('ids') or [id_registro]:
+            conteo[id_reserva] = conteo.get(id_reserva, 0) + 1
+    return conteo
+
+
+@pytest.mark.parametrize('fuente', ['trigger', 'aplicacion'])
+def test_cada_reserva_se_audita_una_vez(cliente, fuente):
+    cliente.table('auditoria_fuentes').update({'fuente': fuente}).eq('tabla', 'reservas').execute()
+    id_cancha = cliente.table('canchas').select('id').eq('disponible', True).limit(1).execute().data[0]['id']
+    id_cliente = cliente.table('clientes').select('id').limit(1).execute().data[0]['id']
+    inicio = date.today() + timedelta(days=400)
+
+    individual = database.crear_reserva(
+        id_cliente, id_cancha, inicio, time(10, 0), time(11, 0), nombre_usuario='admin@test.com'
+    )
+    serie = database.crear_reservas_serie(
+        id_cliente, id_cancha, [inicio + timedelta(weeks=s) for s in range(1, 4)],
+        time(12, 0), time(13, 0), nombre_usuario='admin@test.com'
+    )
+    assert obtener_escritor().vaciar()
+
+    ids = [individual['id']] + [r['id'] for r in serie]
+    conteo = entradas_por_reserva(cliente)
+    assert {i: conteo.get(i, 0) for i in ids} == {i: 1 for i in ids}
+
+
+class ClienteSinFuentes:
+    """Cliente cuya lectura de auditoria_fuentes falla (y cuenta los intentos)."""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.intentos = 0
+
+    def table(self, tabla):
+        if tabla == 'auditoria_fuentes':
+            self.intentos += 1
+            raise Exception('Tiempo de espera agotado')
+        return self.cliente.table(tabla)
+
+
+def test_fuente_por_defecto_queda_fija_si_falla_la_lectura(cliente):
+    sin_fuentes = ClienteSinFuentes(cliente)
+    database.usar_cliente(sin_fuentes)
+
+    fuentes = [database.fuente_auditoria('reservas') for _ in range(3)]
+
+    # Tras el primer fallo no se reintenta: todas las escrituras usan la misma fuente
+    assert fuentes == [database.FUENTES_AUDITORIA['reservas']] * 3
+    assert sin_fuentes.intentos == 1
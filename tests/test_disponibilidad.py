@@ -0,0 +1,51 @@
+"""
+Índice de disponibilidad con respuestas truncadas como max-rows de PostgREST.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from components import database
+from components.backend_local import ClienteLocal
+from components.disponibilidad import IndiceDisponibilidad
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    cliente = ClienteLocal(str(tmp_path / 'reservas.db'))
+    database.usar_cliente(cliente)
+    yield cliente
+    database.usar_cliente(None)
+
+
+def test_la_ventana_no_se_trunca_en_max_rows(cliente):
+    tipo = cliente.table('tipos_cancha').select('id').limit(1).execute().data[0]['id']
+    id_cancha = cliente.table('canchas').insert({
+        'nombre': 'Cancha índice', 'id_tipo': tipo, 'ubicacion': 'Norte', 'capacidad_maxima': 10
+    }).execute().data[0]['id']
+    cliente.table('horarios_disponibles').insert([
+        {'id_cancha': id_cancha, 'dia_semana': dia, 'hora_inicio': '08:00', 'hora_fin': '22:00'}
+        for dia in range(1, 8)
+    ]).execute()
+    id_cliente = cliente.table('clientes').select('id').limit(1).execute().data[0]['id']
+
+    # Tope (max-rows) apenas mayor que las canchas y menor que las reservas de la ventana
+    filas_maximas = len(cliente.table('canchas').select('id').execute().data) + 1
+    fechas = [date.today() + timedelta(days=d) for d in range(1, 2 * filas_maximas)]
+    cliente.table('reservas').insert([
+        {
+            'id_cliente': id_cliente, 'id_cancha': id_cancha, 'fecha': f.isoformat(),
+            'hora_inicio': '10:00', 'hora_fin': '11:00', 'estado': 'confirmada', 'monto_total': 35
+        }
+        for f in fechas
+    ]).execute()
+    cliente.filas_maximas = filas_maximas
+
+    indice = IndiceDisponibilidad()
+    for fecha in fechas:
+        disponible, mensaje = indice.verificar(id_cancha, fecha, time(10, 0), time(11, 0))
+        assert not disponible and 'Ya existe una reserva' in mensaje, fecha
+
+    turnos = indice.turnos_libres([id_cancha], fechas[0], len(fechas), 60)
+    inicio_diez = 10 * 60 // turnos['granularidad']
+    assert not turnos['inicios'][0, :, inicio_diez].any()
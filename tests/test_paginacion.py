@@ -0,0 +1,37 @@
+"""
+Paginación por cursor de components.utils.paginar.
+"""
+from streamlit.testing.v1 import AppTest
+
+
+def listado():
+    import streamlit as st
+    from components.backend_local import ClienteLocal
+    from components.utils import paginar
+
+    if 'cliente' not in st.session_state:
+        st.session_state['cliente'] = ClienteLocal()
+    cliente = st.session_state['cliente']
+    filas = paginar(
+        'clientes',
+        lambda conteo: cliente.table('clientes').select('id, nombre', count=conteo),
+        [('id', False)],
+        tamano=2
+    )
+    st.write(f"filas: {[f['id'] for f in filas]}")
+
+
+def test_pagina_vacia_vuelve_a_la_primera():
+    at = AppTest.from_function(listado).run()
+    primera = at.markdown[-1].value
+    at.button(key='siguiente_clientes').click().run()
+
+    # Se borran todas las filas desde la segunda página en adelante
+    cliente = at.session_state['cliente']
+    cursor = at.session_state['paginacion_clientes']['cursores'][1]
+    cliente.table('clientes').delete().gt('id', cursor['id']).execute()
+    at.run()
+
+    assert at.markdown[-1].value == primera
+    assert at.session_state['paginacion_clientes']['pagina'] == 0
+    assert at.button(key='siguiente_clientes').disabled
@@ -0,0 +1,62 @@
+"""
+Presupuestos de llamadas al backend (benchmarks.consultas) con pytest.
+
+Cada operación y cada paso de benchmarks.reruns se ejecuta sobre bases
+sintéticas de varios tamaños. Se cuentan las llamadas reales (cada
+execute(), incluidas las páginas siguientes de una lectura paginada): no
+pueden superar su presupuesto ni crecer con los datos.
+"""
+import os
+
+import pytest
+
+from benchmarks.consultas import PRESUPUESTO_OPERACIONES, PRESUPUESTO_PAGINAS, contar_operaciones, contar_paginas
+from benchmarks.datos import generar_base
+
+# Bases a comparar: (reservas, clientes, canchas)
+TAMANOS = [(2000, 300, 12), (20000, 3000, 80)]
+
+PRESUPUESTOS = {
+    **PRESUPUESTO_OPERACIONES,
+    **{f"{pagina}: {paso}": n for pagina, pasos in PRESUPUESTO_PAGINAS.items() for paso, n in pasos.items()}
+}
+
+
+@pytest.fixture(scope='session')
+def contados(request):
+    """Llamadas de cada caso por tamaño (las bases quedan en la caché de pytest)."""
+    directorio = request.config.cache.mkdir('datos_benchmark')
+    resultados = {}
+    for reservas, clientes, canchas in TAMANOS:
+        base = os.path.join(directorio, f"consultas_{reservas}_canchas_{canchas}_clientes_{clientes}.db")
+        if not os.path.exists(base):
+            generar_base(base, reservas, clientes, canchas, meses=6, auditoria=2000)
+        resultados[reservas] = {**contar_operaciones(base), **contar_paginas(base, list(PRESUPUESTO_PAGINAS))}
+    return resultados
+
+
+def _medido(contados, reservas, caso):
+    medido = contados[reservas][caso]
+    if medido.get('omitido'):
+        pytest.skip(f"{caso}: el paso no aplica con {reservas:,} reservas")
+    assert not medido['errores'], medido['errores'][0]
+    return medido
+
+
+@pytest.mark.parametrize('reservas', [t[0] for t in TAMANOS])
+@pytest.mark.parametrize('caso', list(PRESUPUESTOS))
+def test_llamadas_dentro_del_presupuesto(contados, caso, reservas):
+    medido = _medido(contados, reservas, caso)
+    assert medido['llamadas'] <= PRESUPUESTOS[caso], '\n'.join(medido.get('detalle', []))
+
+
+@pytest.mark.parametrize('caso', list(PRESUPUESTOS))
+def test_llamadas_no_crecen_con_los_datos(contados, caso):
+    llamadas = [
+        contados[reservas][caso]['llamadas']
+        for reservas, _, _ in TAMANOS
+        if not contados[reservas][caso].get('omitido')
+    ]
+    assert all(mayor <= menor for menor, mayor in zip(llamadas, llamadas[1:])), (
+        f"{caso}: {llamadas} llamadas con {[t[0] for t in TAMANOS]} reservas"
+    )
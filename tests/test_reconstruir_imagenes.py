@@ -0,0 +1,69 @@
+"""
+Reconstrucción de las filas completas de un UPDATE de la bitácora.
+
+Los UPDATE posteriores a la entrada se deshacen en el orden de la bitácora
+(created_at, id), estén todavía en la tabla o ya archivados en Parquet.
+"""
+from datetime import date
+
+import pytest
+
+from components import database
+from components.archivo_auditoria import archivar_mes
+from components.auditoria import reconstruir_imagenes
+from components.backend_local import ClienteLocal
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUDITORIA_ARCHIVO', str(tmp_path / 'archivo_auditoria'))
+    cliente = ClienteLocal(str(tmp_path / 'reservas.db'))
+    database.usar_cliente(cliente)
+    # Sin trigger de clientes: la bitácora tiene solo las entradas del test
+    cliente.table('auditoria_fuentes').update({'fuente': 'aplicacion'}).eq('tabla', 'clientes').execute()
+    yield cliente
+    database.usar_cliente(None)
+
+
+def preparar(cliente):
+    """Cliente con dos UPDATE: teléfono '1' -> '2' (enero) y email (febrero)."""
+    id_cliente = cliente.table('clientes').insert({
+        'nombre': 'Ana', 'apellido': 'Pérez', 'telefono': '2', 'email': 'nueva@test.com', 'documento': '999'
+    }).execute().data[0]['id']
+
+    def entrada(creado, antes, despues):
+        return cliente.table('auditoria_bitacora').insert({
+            'nombre_usuario': 'admin@test.com',
+            'tabla_afectada': 'clientes',
+            'id_registro': id_cliente,
+            'tipo_accion': 'UPDATE',
+            'descripcion_detallada': 'Cambio de datos de contacto',
+            'datos_anteriores': {'id': id_cliente, **antes},
+            'datos_nuevos': {'id': id_cliente, **despues},
+            'created_at': creado
+        }).execute().data[0]
+
+    # La entrada de febrero se inserta primero: tiene el id menor
+    febrero = entrada('2026-02-10 09:00:00', {'email': 'ana@test.com'}, {'email': 'nueva@test.com'})
+    enero = entrada('2026-01-10 09:00:00', {'telefono': '1'}, {'telefono': '2'})
+    return enero, febrero
+
+
+def test_deshace_en_orden_de_bitacora(cliente):
+    enero, _ = preparar(cliente)
+
+    imagenes = reconstruir_imagenes(enero)
+
+    assert (imagenes['antes']['telefono'], imagenes['antes']['email']) == ('1', 'ana@test.com')
+    assert (imagenes['despues']['telefono'], imagenes['despues']['email']) == ('2', 'ana@test.com')
+
+
+def test_deshace_cambios_archivados(cliente):
+    enero, febrero = preparar(cliente)
+    archivar_mes(date(2026, 2, 1))
+    cliente.table('auditoria_bitacora').delete().eq('id', febrero['id']).execute()
+
+    imagenes = reconstruir_imagenes(enero)
+
+    assert (imagenes['antes']['telefono'], imagenes['antes']['email']) == ('1', 'ana@test.com')
+    assert (imagenes['despues']['telefono'], imagenes['despues']['email']) == ('2', 'ana@test.com')